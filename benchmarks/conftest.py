@@ -0,0 +1,143 @@
+"""
+Fixtures for benchmarking galsynthspec, using catalog responses and a
+prospector output file saved in the fixtures directory.
+
+The shipped fixtures are synthetic (see record_fixtures.py), so the benchmarks
+run without network access. Benchmarks of the chain, the HDF5 file and the
+corner plot run everywhere, while those which evaluate the model need FSPS,
+and those which correct for extinction need the SFD dust maps.
+"""
+
+import importlib.util
+import os
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+import pytest
+from astropy.table import Table
+from astroquery.ipac.irsa import Irsa
+from astroquery.mast import Catalogs
+from astroquery.sdss import SDSS
+
+from galsynthspec import paths
+from galsynthspec.datamodels.fitresult import FitResult
+from galsynthspec.datamodels.galaxy import Galaxy
+from galsynthspec.utils.hdf5 import read_fit_hdf5
+
+FIXTURE_DIR = Path(__file__).parent / "fixtures"
+CATALOG_DIR = FIXTURE_DIR / "catalogs"
+PHOTOMETRY_PATH = FIXTURE_DIR / "photometry.json"
+FIT_RESULT_PATH = FIXTURE_DIR / "fit_result.h5"
+
+TEST_RA, TEST_DEC, TEST_REDSHIFT = 314.262256, 14.204368, 0.0512
+
+# Datasets read by FitResult.from_file
+FIT_DATASETS = {"sampling": ["chain", "weights"], "obs": None, "bestfit": None}
+
+# Map from the catalog argument of the archive query to the recorded response
+RECORDED_CATALOGS = {
+    "Panstarrs": "ps1",
+    "Galex": "galex",
+    "ext_src_cat": "twomass_ext",
+    "allwise_p3as_psd": "wise",
+}
+
+requires_sfd = pytest.mark.skipif(
+    not paths.sfd_path.exists(),
+    reason=f"SFD dust maps not found at {paths.sfd_path}",
+)
+
+
+requires_fsps = pytest.mark.skipif(
+    importlib.util.find_spec("fsps") is None or os.getenv("SPS_HOME") is None,
+    reason="FSPS is not installed, or SPS_HOME is not set",
+)
+
+
+def load_recorded_catalog(name: str) -> Table:
+    """
+    Load a recorded catalog response.
+    A missing file corresponds to a query with no matches.
+
+    :param name: Name of the recorded response
+    :return: Table of the recorded response
+    """
+    path = CATALOG_DIR / f"{name}.ecsv"
+    if not path.exists():
+        return Table()
+    return Table.read(path, format="ascii.ecsv")
+
+
+def query_recorded_catalog(*_, catalog: str, **__) -> Table:
+    """
+    Replacement for astroquery region queries, returning the recorded response
+
+    :param catalog: Name of the catalog being queried
+    :return: Table of the recorded response
+    """
+    return load_recorded_catalog(RECORDED_CATALOGS[catalog])
+
+
+@pytest.fixture
+def recorded_archives():
+    """
+    Patch the archive queries to return the recorded responses
+    """
+    with (
+        mock.patch.object(SDSS, "query_crossid", return_value=None),
+        mock.patch.object(Catalogs, "query_region", new=query_recorded_catalog),
+        mock.patch.object(Irsa, "query_region", new=query_recorded_catalog),
+    ):
+        yield
+
+
+@pytest.fixture
+def photometry_records() -> list[dict]:
+    """
+    Photometry records, as saved in the photometry cache
+    """
+    return pd.read_json(PHOTOMETRY_PATH).to_dict(orient="records")
+
+
+@pytest.fixture
+def galaxy(tmp_path, monkeypatch) -> Galaxy:
+    """
+    Galaxy with cached photometry, in a temporary data directory
+    """
+    monkeypatch.setattr(paths, "data_dir", tmp_path)
+    gal = Galaxy(ra_deg=TEST_RA, dec_deg=TEST_DEC, redshift=TEST_REDSHIFT)
+    gal.photometry_cache_file.write_bytes(PHOTOMETRY_PATH.read_bytes())
+    return gal
+
+
+@pytest.fixture(scope="session")
+def fit_samples() -> FitResult:
+    """
+    FitResult with the chain and weights of the saved fit,
+    without the model, so that it can be built without FSPS
+    """
+    out = read_fit_hdf5(FIT_RESULT_PATH, FIT_DATASETS)
+    return FitResult.model_construct(
+        input_path=FIT_RESULT_PATH,
+        fit_parameters=out["sampling"]["theta_labels"],
+        chain=out["sampling"]["chain"],
+        weights=out["sampling"]["weights"],
+        redshift=out["obs"]["redshift"],
+    )
+
+
+@pytest.fixture(scope="session")
+def fit_result() -> FitResult:
+    """
+    FitResult loaded from the saved prospector output file
+    """
+    return FitResult.from_file(FIT_RESULT_PATH)
+
+
+@pytest.fixture(scope="session")
+def sed_samples(fit_result) -> pd.DataFrame:  # pylint: disable=redefined-outer-name
+    """
+    SEDs sampled from the posterior of the saved fit
+    """
+    return fit_result.sample_sed_from_posterior(n_sample=100)
@@ -0,0 +1,217 @@
+"""
+Script to (re-)record the fixtures used by the benchmarks,
+from live archive queries and a prospector fit of the benchmark galaxy.
+
+The shipped fixtures are synthetic: the catalog responses were built from
+reference photometry of the benchmark galaxy, and the fit file was generated
+with --synthetic-fit, which needs neither FSPS nor the archives.
+Run with --catalogs and --fit to replace them with recorded responses
+and a real fit.
+"""
+
+import logging
+import shutil
+import tempfile
+from pathlib import Path
+
+import click
+import h5py
+import numpy as np
+import pandas as pd
+from astropy import units as u
+from astropy.coordinates import SkyCoord
+from astroquery.ipac.irsa import Irsa
+from astroquery.mast import Catalogs
+from conftest import (
+    CATALOG_DIR,
+    FIT_RESULT_PATH,
+    PHOTOMETRY_PATH,
+    RECORDED_CATALOGS,
+    TEST_DEC,
+    TEST_RA,
+    TEST_REDSHIFT,
+)
+from prospect.io.write_results import write_obs_to_h5
+from prospect.utils.obsutils import fix_obs
+
+from galsynthspec import paths
+from galsynthspec.datamodels.galaxy import Galaxy
+from galsynthspec.datamodels.output import OutputConfig
+from galsynthspec.datamodels.photometry import PhotometrySet
+from galsynthspec.run.fit import fit_galaxy
+from galsynthspec.utils.hdf5 import write_group
+
+logger = logging.getLogger(__name__)
+
+logging.basicConfig(level=logging.INFO)
+
+RADIUS_ARCSEC = 3.0
+
+# Free parameters of the model with a fixed redshift, in the order of
+# SpecModel.theta_labels(), with the mean and standard deviation of the
+# synthetic posterior and the bounds of the prior
+SYNTHETIC_POSTERIOR = {
+    "mass": (3.0e10, 5.0e9, 1.0e6, 1.0e12),
+    "logzsol": (-0.3, 0.2, -1.8, 0.2),
+    "dust2": (0.3, 0.1, 0.0, 1.0),
+    "tage": (6.0, 1.5, 0.1, 10.1),
+    "tau": (2.0, 0.8, 0.1, 10.0),
+}
+N_SYNTHETIC_SAMPLES = 5000
+N_SYNTHETIC_WAVELENGTHS = 5994
+
+
+def record_catalogs():
+    """
+    Record the archive responses for the benchmark galaxy
+
+    :return: None
+    """
+    src_position = SkyCoord(TEST_RA, TEST_DEC, unit="deg")
+    radius = RADIUS_ARCSEC * u.arcsec  # pylint: disable=no-member
+
+    CATALOG_DIR.mkdir(parents=True, exist_ok=True)
+
+    for catalog, name in RECORDED_CATALOGS.items():
+        if catalog in ["Panstarrs", "Galex"]:
+            res = Catalogs.query_region(  # pylint: disable=no-member
+                src_position, radius=radius, catalog=catalog
+            )
+        else:
+            res = Irsa.query_region(src_position, catalog=catalog, radius=radius)
+
+        out_path = CATALOG_DIR / f"{name}.ecsv"
+        if len(res) == 0:
+            logger.info(f"No match in {catalog}, removing {out_path}")
+            out_path.unlink(missing_ok=True)
+            continue
+
+        logger.info(f"Saving {catalog} response to {out_path}")
+        res.write(out_path, format="ascii.ecsv", overwrite=True)
+
+
+def record_fit():
+    """
+    Run a prospector fit of the benchmark galaxy, using the recorded photometry,
+    and save the output file
+
+    :return: None
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths.data_dir = Path(tmp_dir)
+        gal = Galaxy(ra_deg=TEST_RA, dec_deg=TEST_DEC, redshift=TEST_REDSHIFT)
+        shutil.copy(PHOTOMETRY_PATH, gal.photometry_cache_file)
+        fit_galaxy(gal)
+        logger.info(f"Saving fit to {FIT_RESULT_PATH}")
+        shutil.copy(gal.mcmc_cache_file, FIT_RESULT_PATH)
+
+
+def get_synthetic_posterior(n_samples: int, rng: np.random.Generator) -> dict:
+    """
+    Draw a synthetic posterior for the benchmark galaxy,
+    with nested sampling weights
+
+    :param n_samples: Number of samples in the chain
+    :param rng: Random number generator
+    :return: Dictionary of the sampling datasets
+    """
+    mean, std, low, high = np.array(list(SYNTHETIC_POSTERIOR.values())).T
+    chain = np.clip(rng.normal(mean, std, size=(n_samples, len(mean))), low, high)
+
+    # Nested sampling weights rise as the likelihood increases, then fall with
+    # the prior volume
+    lnlikelihood = -0.5 * np.sum(((chain - mean) / std) ** 2, axis=1)
+    chain, lnlikelihood = chain[np.argsort(lnlikelihood)], np.sort(lnlikelihood)
+    logvol = -np.arange(1, n_samples + 1) / (n_samples / 10.0)
+    logwt = lnlikelihood + logvol
+
+    return {
+        "chain": chain,
+        "weights": np.exp(logwt - np.logaddexp.reduce(logwt)),
+        "lnlikelihood": lnlikelihood,
+        "lnprobability": lnlikelihood,
+        "logvol": logvol,
+    }
+
+
+def get_synthetic_best_fit(obs: dict, sampling: dict, rng: np.random.Generator) -> dict:
+    """
+    Get a synthetic best fit for the benchmark galaxy, from the sample with
+    the highest likelihood and a power-law spectrum
+
+    :param obs: Observation data
+    :param sampling: Dictionary of the sampling datasets
+    :param rng: Random number generator
+    :return: Dictionary of the best fit datasets
+    """
+    wavelengths = np.geomspace(91.0, 1.0e8, N_SYNTHETIC_WAVELENGTHS)
+    return {
+        "spectrum": obs["maggies"].mean() * (wavelengths / 5000.0) ** -0.5,
+        "photometry": obs["maggies"] * rng.normal(1.0, 0.05, len(obs["maggies"])),
+        "parameter": sampling["chain"][np.argmax(sampling["lnlikelihood"])],
+        "restframe_wavelengths": wavelengths,
+    }
+
+
+def write_synthetic_fit(
+    out_path: Path, n_samples: int = N_SYNTHETIC_SAMPLES, seed: int = 42
+):
+    """
+    Write a fit file in the prospector layout, with a synthetic posterior
+    for the benchmark galaxy, without running FSPS
+
+    :param out_path: Output path
+    :param n_samples: Number of samples in the chain
+    :param seed: Random seed
+    :return: None
+    """
+    rng = np.random.default_rng(seed)
+
+    obs = fix_obs(
+        PhotometrySet.from_dataframe(pd.read_json(PHOTOMETRY_PATH)).to_obs(
+            redshift=TEST_REDSHIFT
+        )
+    )
+    sampling = get_synthetic_posterior(n_samples, rng)
+    best_fit = get_synthetic_best_fit(obs, sampling, rng)
+
+    config = OutputConfig(compression="gzip")
+    logger.info(f"Saving synthetic fit to {out_path}")
+    with h5py.File(out_path, "w") as hf:
+        write_obs_to_h5(hf, obs)
+        write_group(
+            hf,
+            "sampling",
+            sampling,
+            attrs={
+                "theta_labels": list(SYNTHETIC_POSTERIOR),
+                "sampler": "dynesty",
+                "synthetic": True,
+            },
+            config=config,
+        )
+        write_group(hf, "bestfit", best_fit, attrs={"mfrac": 0.6}, config=config)
+
+
+@click.command()
+@click.option("--catalogs/--no-catalogs", default=True, help="Record catalogs")
+@click.option("--fit/--no-fit", default=False, help="Run and save a fit")
+@click.option(
+    "--synthetic-fit",
+    is_flag=True,
+    help="Save a fit with a synthetic posterior, without running FSPS",
+)
+def main(catalogs: bool, fit: bool, synthetic_fit: bool):
+    """
+    Record the fixtures used by the benchmarks
+    """
+    if catalogs:
+        record_catalogs()
+    if fit:
+        record_fit()
+    elif synthetic_fit:
+        write_synthetic_fit(FIT_RESULT_PATH)
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,170 @@
+"""
+Benchmarks for the hot paths of the galsynthspec pipeline
+"""
+
+# pylint: disable=redefined-outer-name,unused-argument
+
+import pandas as pd
+from astropy.coordinates import SkyCoord
+from conftest import (
+    FIT_DATASETS,
+    FIT_RESULT_PATH,
+    TEST_DEC,
+    TEST_RA,
+    requires_fsps,
+    requires_sfd,
+)
+from prospect.fitting import lnprobfn
+
+from galsynthspec.datamodels.fitresult import FitResult, get_posterior_samples
+from galsynthspec.datamodels.photometry import Photometry
+from galsynthspec.download import download_all_data
+from galsynthspec.plotting.corner import plot_corner
+from galsynthspec.plotting.sed import generate_sed_plot
+from galsynthspec.utils.extinction import get_extinction_for_filter
+from galsynthspec.utils.hdf5 import read_fit_hdf5
+from galsynthspec.utils.predict import get_predicted_photometry
+from galsynthspec.utils.summary import SUMMARY_QUANTILES, get_summary_quantiles
+
+SRC_POSITION = SkyCoord(TEST_RA, TEST_DEC, unit="deg")
+
+
+def test_photometry_validation(benchmark, photometry_records):
+    """
+    Benchmark constructing and validating Photometry objects
+    """
+    res = benchmark(lambda: [Photometry.model_validate(p) for p in photometry_records])
+    assert len(res) == len(photometry_records)
+
+
+@requires_sfd
+def test_extinction_for_filter(benchmark):
+    """
+    Benchmark the extinction correction for a single filter
+    """
+    res = benchmark(get_extinction_for_filter, SRC_POSITION, "sdss_r0")
+    assert res > 0.0
+
+
+@requires_sfd
+def test_download_all_data(benchmark, recorded_archives):
+    """
+    Benchmark the photometry download, using the recorded catalog responses
+    """
+    res = benchmark(download_all_data, SRC_POSITION, radius_arcsec=3.0)
+    assert len(res) > 0
+
+
+def test_read_fit_hdf5(benchmark):
+    """
+    Benchmark reading the chain, observations and best fit from the HDF5 file
+    """
+    res = benchmark(read_fit_hdf5, FIT_RESULT_PATH, FIT_DATASETS)
+    assert res["sampling"]["chain"].shape[0] == len(res["sampling"]["weights"])
+
+
+def test_posterior_samples(benchmark, fit_samples):
+    """
+    Benchmark resampling the posterior to equally-weighted samples
+    """
+    chain, _ = benchmark(
+        get_posterior_samples, fit_samples.chain, fit_samples.weights, n_resample=1000
+    )
+    assert len(chain) == 1000
+
+
+def test_summary_quantiles(benchmark, fit_samples):
+    """
+    Benchmark the weighted quantiles of every parameter, without the cache
+    """
+
+    def get_quantiles():
+        res = fit_samples.model_copy()
+        res._quantile_cache = {}  # pylint: disable=protected-access
+        res._chain_cdf = None  # pylint: disable=protected-access
+        return get_summary_quantiles(res, SUMMARY_QUANTILES)
+
+    res = benchmark(get_quantiles)
+    assert res.shape == (len(SUMMARY_QUANTILES), len(fit_samples.fit_parameters))
+
+
+def test_plot_fast_corner(benchmark, fit_samples, tmp_path):
+    """
+    Benchmark generating the fast corner plot
+    """
+    out_path = tmp_path / "corner.png"
+    benchmark.pedantic(
+        plot_corner,
+        kwargs={"res": fit_samples, "out_path": out_path, "fast": True},
+        rounds=3,
+    )
+    assert out_path.exists()
+
+
+@requires_fsps
+def test_fitresult_from_file(benchmark, fit_result):
+    """
+    Benchmark loading the fit result from the HDF5 file
+    """
+    res = benchmark.pedantic(FitResult.from_file, args=(fit_result.input_path,))
+    assert res.chain.shape == fit_result.chain.shape
+
+
+@requires_fsps
+def test_likelihood(benchmark, fit_result):
+    """
+    Benchmark a single likelihood evaluation at the best fit parameters
+    """
+    res = benchmark(
+        lnprobfn,
+        fit_result.best_fit.parameter,
+        model=fit_result.model,
+        obs=fit_result.obs,
+        sps=fit_result.sps,
+        nested=True,
+    )
+    assert res > -float("inf")
+
+
+@requires_fsps
+def test_sample_sed_from_posterior(benchmark, fit_result):
+    """
+    Benchmark sampling SEDs from the posterior
+    """
+    res = benchmark.pedantic(
+        fit_result.sample_sed_from_posterior, kwargs={"n_sample": 100}, rounds=3
+    )
+    assert len(res) == 100
+
+
+@requires_fsps
+def test_generate_sed_plot(benchmark, fit_result, tmp_path):
+    """
+    Benchmark generating the SED plot
+    """
+    res = benchmark.pedantic(
+        generate_sed_plot, kwargs={"res": fit_result, "out_dir": tmp_path}, rounds=3
+    )
+    assert isinstance(res, pd.DataFrame)
+
+
+@requires_fsps
+def test_plot_corner(benchmark, fit_result, tmp_path):
+    """
+    Benchmark generating the corner plot
+    """
+    out_path = tmp_path / "corner.pdf"
+    benchmark.pedantic(
+        plot_corner, kwargs={"res": fit_result, "out_path": out_path}, rounds=3
+    )
+    assert out_path.exists()
+
+
+@requires_fsps
+@requires_sfd
+def test_get_predicted_photometry(benchmark, fit_result, galaxy, sed_samples):
+    """
+    Benchmark predicting photometry from sampled SEDs
+    """
+    res = benchmark(get_predicted_photometry, galaxy, fit_result, sample_df=sed_samples)
+    assert len(res) > 0
@@ -2,18 +2,214 @@
 CLI wrapper for galaxy synthetic spectra
 """
 
+import functools
 import logging
+from pathlib import Path
 
 import click
+import pandas as pd
 
+from galsynthspec.datamodels.analysis import AnalysisConfig
 from galsynthspec.datamodels.galaxy import Galaxy
-from galsynthspec.run import run_on_galaxy
+from galsynthspec.datamodels.output import OutputConfig
+from galsynthspec.datamodels.sed import SEDConfig
+from galsynthspec.paths import data_dir
+from galsynthspec.run import run_batch, run_on_galaxy
+from galsynthspec.run.batch import load_batch_file
+from galsynthspec.run.config import DEFAULT_MIN_ESS, FitConfig
+from galsynthspec.run.samplers import DEFAULT_SAMPLER, SAMPLER_BACKENDS
+from galsynthspec.run.serve import (
+    DEFAULT_HOST,
+    DEFAULT_N_WORKERS,
+    DEFAULT_PORT,
+    serve,
+)
+from galsynthspec.run.watch import DEFAULT_LEDGER_PATH, DEFAULT_POLL_S, watch
+from galsynthspec.run.workqueue import DEFAULT_QUEUE_PATH, WorkQueue, run_worker
+from galsynthspec.utils.profiling import PROFILE_STAGES
+from galsynthspec.utils.progress import (
+    find_status_files,
+    get_progress_table,
+    read_last_status,
+    summarise_progress,
+)
 from galsynthspec.utils.query import query_by_name
 
 logger = logging.getLogger(__name__)
 
 logging.basicConfig(level=logging.INFO)
 
+profile_option = click.option(
+    "--profile",
+    type=click.Choice(PROFILE_STAGES),
+    default=None,
+    is_flag=False,
+    flag_value="all",
+    help="Profile the pipeline, or only the 'fit' or 'analyse' stage. "
+    "Profiles are saved to the galaxy output directory.",
+)
+
+
+def analysis_options(func):
+    """
+    Decorator adding the options for analysing a fit to a command
+
+    :param func: Command function
+    :return: Decorated function
+    """
+    func = click.option(
+        "--n-wavelength",
+        type=click.IntRange(min=1),
+        default=None,
+        help="Rebin SEDs onto this many log-spaced wavelengths, conserving flux",
+    )(func)
+    func = click.option(
+        "--max-wavelength",
+        type=click.FloatRange(min=0.0, min_open=True),
+        default=None,
+        help="Maximum observed-frame wavelength of the SEDs, in Angstrom",
+    )(func)
+    func = click.option(
+        "--min-wavelength",
+        type=click.FloatRange(min=0.0, min_open=True),
+        default=None,
+        help="Minimum observed-frame wavelength of the SEDs, in Angstrom",
+    )(func)
+    func = click.option(
+        "--float32", is_flag=True, help="Sample SEDs in single precision"
+    )(func)
+    func = click.option(
+        "--chunk-size",
+        type=click.IntRange(min=1),
+        default=None,
+        help="Sample SEDs in chunks of this size, estimating quantiles "
+        "with a sketch so memory does not grow with the number of samples",
+    )(func)
+    func = click.option(
+        "--n-sample",
+        type=click.IntRange(min=1),
+        default=1000,
+        show_default=True,
+        help="Number of SEDs to sample from the posterior",
+    )(func)
+    func = click.option(
+        "--min-weight",
+        type=click.FloatRange(min=0.0, max=1.0, max_open=True),
+        default=None,
+        help="Drop posterior samples with a weight below this fraction "
+        "of the maximum weight",
+    )(func)
+    func = click.option(
+        "--n-resample",
+        type=click.IntRange(min=1),
+        default=None,
+        help="Resample the posterior to this many equally-weighted samples",
+    )(func)
+    func = click.option(
+        "--fast-corner",
+        is_flag=True,
+        help="Plot a fast corner plot from pre-binned histograms, "
+        "saved as a rasterized corner.png",
+    )(func)
+    func = click.option(
+        "--plots/--no-plots",
+        default=True,
+        help="Make the corner and SED plots. With --no-plots, only the fit summary, "
+        "synthetic SED and predicted photometry are written",
+    )(func)
+    return func
+
+
+def get_analysis_config(
+    plots: bool,
+    fast_corner: bool,
+    n_resample: int | None = None,
+    min_weight: float | None = None,
+    **sed_kwargs,
+) -> AnalysisConfig:
+    """
+    Get the analysis config from the options added by analysis_options
+
+    :param plots: Whether to make plots
+    :param fast_corner: Whether to plot a fast corner plot
+    :param n_resample: Number of equally-weighted posterior samples, or None
+    :param min_weight: Minimum fractional weight of posterior samples, or None
+    :param sed_kwargs: Options for sampling SEDs
+    :return: AnalysisConfig
+    """
+    return AnalysisConfig(
+        plots=plots,
+        fast_corner=fast_corner,
+        n_resample=n_resample,
+        min_weight=min_weight,
+        sed=SEDConfig(**sed_kwargs),
+    )
+
+
+def fit_options(func):
+    """
+    Decorator adding the options for running a fit to a command,
+    which is passed them as a FitConfig in the fit_config argument
+
+    :param func: Command function
+    :return: Decorated function
+    """
+
+    @functools.wraps(func)
+    def wrapper(
+        *args,
+        sampler: str,
+        compression: str | None,
+        float32_spectrum: bool,
+        reweight: bool,
+        min_ess: float,
+        **kwargs,
+    ):
+        fit_config = FitConfig(
+            sampler=sampler,
+            output=OutputConfig(
+                compression=compression, float32_spectrum=float32_spectrum
+            ),
+            reweight=reweight,
+            min_ess=min_ess,
+        )
+        return func(*args, fit_config=fit_config, **kwargs)
+
+    wrapper = click.option(
+        "--min-ess",
+        type=click.FloatRange(min=0.0, min_open=True),
+        default=DEFAULT_MIN_ESS,
+        show_default=True,
+        help="Refit instead of reweighting if the effective sample size "
+        "falls below this value",
+    )(wrapper)
+    wrapper = click.option(
+        "--reweight",
+        is_flag=True,
+        help="Update an existing fit to the current photometry by reweighting "
+        "its posterior, instead of loading it unchanged or refitting",
+    )(wrapper)
+    wrapper = click.option(
+        "--sampler",
+        type=click.Choice(list(SAMPLER_BACKENDS)),
+        default=DEFAULT_SAMPLER,
+        show_default=True,
+        help="Sampler backend used for a new fit",
+    )(wrapper)
+    wrapper = click.option(
+        "--float32-spectrum",
+        is_flag=True,
+        help="Store the best fit spectrum of a new fit in single precision",
+    )(wrapper)
+    wrapper = click.option(
+        "--compression",
+        type=click.Choice(["gzip", "lzf"]),
+        default=None,
+        help="Write the chain, weights, likelihoods and best fit spectrum "
+        "of a new fit chunked and compressed",
+    )(wrapper)
+    return wrapper
+
 
 @click.group()
 def cli():
@@ -28,7 +224,17 @@ def cli():
     "--use-cache/--no-cache", default=True, help="Enable using cached results"
 )
 @click.option("-z", "--redshift", type=float, default=None)
-def run_by_name(name, use_cache: bool, redshift: float = None):
+@profile_option
+@analysis_options
+@fit_options
+def run_by_name(
+    name,
+    use_cache: bool,
+    redshift: float = None,
+    profile=None,
+    fit_config: FitConfig = None,
+    **analysis_kwargs,
+):
     """
     Run the galaxy synthetic spectra pipeline for a given galaxy name.
     """
@@ -36,7 +242,13 @@ def run_by_name(name, use_cache: bool, redshift: float = None):
     gal = query_by_name(name)
     if gal.redshift is None:
         gal.redshift = redshift
-    run_on_galaxy(gal, use_cache=use_cache)
+    run_on_galaxy(
+        gal,
+        use_cache=use_cache,
+        profile=profile,
+        analysis_config=get_analysis_config(**analysis_kwargs),
+        fit_config=fit_config,
+    )
 
 
 @cli.command("by-ra-dec")
@@ -44,7 +256,18 @@ def run_by_name(name, use_cache: bool, redshift: float = None):
 @click.argument("dec_deg", type=float)
 @click.option("-n", "--name", type=str, default=None)
 @click.option("-z", "--redshift", type=float, default=None)
-def run_by_ra_dec(ra_deg: float, dec_deg: float, name=None, redshift=None):
+@profile_option
+@analysis_options
+@fit_options
+def run_by_ra_dec(
+    ra_deg: float,
+    dec_deg: float,
+    name=None,
+    redshift=None,
+    profile=None,
+    fit_config: FitConfig = None,
+    **analysis_kwargs,
+):  # pylint: disable=too-many-arguments,too-many-positional-arguments
     """
     Run the galaxy synthetic spectra pipeline for a given galaxy name.
     """
@@ -52,4 +275,235 @@ def run_by_ra_dec(ra_deg: float, dec_deg: float, name=None, redshift=None):
 
     gal = Galaxy(source_name=name, ra_deg=ra_deg, dec_deg=dec_deg, redshift=redshift)
 
-    run_on_galaxy(gal)
+    run_on_galaxy(
+        gal,
+        profile=profile,
+        analysis_config=get_analysis_config(**analysis_kwargs),
+        fit_config=fit_config,
+    )
+
+
+@cli.command("batch")
+@click.argument("batch_file", type=click.Path(exists=True, path_type=Path))
+@click.option(
+    "--use-cache/--no-cache", default=True, help="Enable using cached results"
+)
+@click.option(
+    "-o",
+    "--report",
+    type=click.Path(path_type=Path),
+    default=None,
+    help="Path for the aggregated run report",
+)
+@analysis_options
+@fit_options
+def run_batch_file(
+    batch_file: Path,
+    use_cache: bool,
+    report: Path | None = None,
+    fit_config: FitConfig = None,
+    **analysis_kwargs,
+):
+    """
+    Run the galaxy synthetic spectra pipeline for every galaxy in a CSV file,
+    with columns 'name' and/or 'ra_deg', 'dec_deg' and optionally 'redshift'.
+    """
+    logger.info(f"Running pipeline for batch file {batch_file}")
+    failed = []
+    galaxies = load_batch_file(batch_file, failed=failed)
+    run_batch(
+        galaxies,
+        use_cache=use_cache,
+        report_path=report,
+        analysis_config=get_analysis_config(**analysis_kwargs),
+        fit_config=fit_config,
+        failed=failed,
+    )
+
+
+@cli.command("status")
+@click.argument(
+    "base_dir",
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+    default=data_dir,
+)
+@click.option(
+    "-n",
+    "--n-total",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Total number of galaxies in the batch, if not all have started",
+)
+def status(base_dir: Path, n_total: int | None = None):
+    """
+    Show the progress of the fits in a directory of galaxy outputs,
+    with the throughput and estimated time until the batch finishes.
+    """
+    statuses = [read_last_status(path) for path in find_status_files(base_dir)]
+    statuses = [s for s in statuses if s is not None]
+    if not statuses:
+        click.echo(f"No progress files found in {base_dir}")
+        return
+
+    with pd.option_context("display.max_rows", None, "display.width", None):
+        click.echo(get_progress_table(statuses).round(3).to_string(index=False))
+
+    summary = summarise_progress(statuses, n_total=n_total)
+    click.echo(
+        f"{summary['n_done']}/{summary['n_total']} done, "
+        f"{summary['n_running']} running"
+    )
+    if summary["fits_per_hour"] is not None:
+        click.echo(
+            f"Throughput: {summary['fits_per_hour']:.1f} fits/hour, "
+            f"ETA: {summary['eta_seconds'] / 60.0:.1f} minutes"
+        )
+
+
+@cli.group("queue")
+@click.option(
+    "--db",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=DEFAULT_QUEUE_PATH,
+    show_default=True,
+    help="Path to the queue database, on a filesystem shared by all workers",
+)
+@click.pass_context
+def queue_group(ctx, db: Path):
+    """
+    Run the pipeline from a work queue shared between many workers.
+    """
+    ctx.obj = WorkQueue(db)
+
+
+@queue_group.command("add")
+@click.argument("batch_file", type=click.Path(exists=True, path_type=Path))
+@click.pass_obj
+def queue_add(queue: WorkQueue, batch_file: Path):
+    """
+    Add the galaxies in a CSV file to the queue,
+    with columns 'name' and/or 'ra_deg', 'dec_deg' and optionally 'redshift'.
+    """
+    queue.add(load_batch_file(batch_file))
+
+
+@queue_group.command("work")
+@click.option(
+    "--use-cache/--no-cache", default=True, help="Enable using cached results"
+)
+@click.option("--max-jobs", type=int, default=None, help="Maximum jobs to run")
+@analysis_options
+@fit_options
+@click.pass_obj
+def queue_work(
+    queue: WorkQueue,
+    use_cache: bool,
+    max_jobs: int | None = None,
+    fit_config: FitConfig = None,
+    **analysis_kwargs,
+):
+    """
+    Claim and run jobs from the queue until none remain.
+    """
+    run_worker(
+        queue,
+        use_cache=use_cache,
+        max_jobs=max_jobs,
+        analysis_config=get_analysis_config(**analysis_kwargs),
+        fit_config=fit_config,
+    )
+
+
+@queue_group.command("status")
+@click.pass_obj
+def queue_status(queue: WorkQueue):
+    """
+    Print the number of jobs with each status.
+    """
+    for status, count in queue.counts().items():
+        click.echo(f"{status}: {count}")
+
+
+@cli.command("serve")
+@click.option("--host", type=str, default=DEFAULT_HOST, show_default=True)
+@click.option("--port", type=int, default=DEFAULT_PORT, show_default=True)
+@click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Listen on a Unix socket at this path, instead of a port",
+)
+@click.option(
+    "-w",
+    "--workers",
+    type=click.IntRange(min=1),
+    default=DEFAULT_N_WORKERS,
+    show_default=True,
+    help="Number of worker processes, each with its own warm SPS model",
+)
+def serve_command(host: str, port: int, socket_path: Path | None, workers: int):
+    """
+    Serve fit, analyse and predict requests from warm worker processes,
+    as JSON over HTTP on localhost or a Unix socket.
+    """
+    serve(host=host, port=port, socket_path=socket_path, n_workers=workers)
+
+
+@cli.command("watch")
+@click.argument("source", type=click.Path(path_type=Path))
+@click.option(
+    "--use-cache/--no-cache", default=True, help="Enable using cached results"
+)
+@click.option(
+    "--ledger",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=DEFAULT_LEDGER_PATH,
+    show_default=True,
+    help="Path to the ledger of processed items",
+)
+@click.option(
+    "-w",
+    "--workers",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of worker processes. Defaults to the number of CPUs",
+)
+@click.option(
+    "--poll",
+    type=click.FloatRange(min=0.0),
+    default=DEFAULT_POLL_S,
+    show_default=True,
+    help="Interval between polls of the source, in seconds",
+)
+@click.option(
+    "--once", is_flag=True, help="Stop once the items available now are processed"
+)
+@analysis_options
+@fit_options
+def watch_command(  # pylint: disable=too-many-arguments
+    source: Path,
+    use_cache: bool,
+    ledger: Path,
+    workers: int | None,
+    poll: float,
+    once: bool,
+    fit_config: FitConfig,
+    **analysis_kwargs,
+):
+    """
+    Watch a spool directory, or a JSON-lines file, for new transients
+    and fit their hosts as they arrive.
+    """
+    summary = watch(
+        source,
+        ledger_path=ledger,
+        use_cache=use_cache,
+        analysis_config=get_analysis_config(**analysis_kwargs),
+        fit_config=fit_config,
+        n_workers=workers,
+        poll_s=poll,
+        once=once,
+    )
+    for key, value in summary.items():
+        click.echo(f"{key}: {value}")
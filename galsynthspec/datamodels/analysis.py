@@ -0,0 +1,39 @@
+"""
+Base Model for the options used to analyse a fit
+"""
+
+from pydantic import BaseModel, Field
+
+from galsynthspec.datamodels.sed import SEDConfig
+
+
+class AnalysisConfig(BaseModel):
+    """
+    Base model for the options used to analyse the result of a fit
+    """
+
+    plots: bool = Field(
+        description="Plot the corner plot and SED. If False, only the "
+        "fit summary, synthetic SED and predicted photometry are written",
+        default=True,
+    )
+    fast_corner: bool = Field(
+        description="Plot a fast, rasterized PNG corner plot", default=False
+    )
+    n_resample: int | None = Field(
+        description="If set, resample the posterior to this many "
+        "equally-weighted samples when loading the fit",
+        default=None,
+        gt=0,
+    )
+    min_weight: float | None = Field(
+        description="If set, drop posterior samples with a weight below this "
+        "fraction of the maximum weight when loading the fit",
+        default=None,
+        ge=0.0,
+        lt=1.0,
+    )
+    sed: SEDConfig = Field(
+        description="Options for sampling SEDs from the posterior",
+        default_factory=SEDConfig,
+    )
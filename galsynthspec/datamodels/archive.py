@@ -0,0 +1,214 @@
+"""
+Base Model for the options used to query the photometry and transient archives
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Literal
+
+from pydantic import BaseModel, Field, model_validator
+
+ARCHIVE_SERVICES = ["mast", "irsa", "sdss", "gaia", "tns", "skyportal"]
+
+# Sustained queries per second to each service, well below the published limits
+DEFAULT_SERVICE_RATES = {
+    "mast": 5.0,
+    "irsa": 2.0,
+    "sdss": 2.0,
+    "gaia": 1.0,
+    "tns": 0.5,
+    "skyportal": 5.0,
+}
+
+LIVE = "live"
+RECORD = "record"
+REPLAY = "replay"
+
+ARCHIVE_CONFIG_ENV = "GALSYNTHSPEC_ARCHIVE_CONFIG"
+ARCHIVE_MODE_ENV = "GALSYNTHSPEC_ARCHIVE_MODE"
+ARCHIVE_DIR_ENV = "GALSYNTHSPEC_ARCHIVE_DIR"
+SNAPSHOT_DIR_ENV = "GALSYNTHSPEC_SNAPSHOT_DIR"
+
+
+def validate_services(services: dict):
+    """
+    Validate that a dictionary is keyed by known services
+
+    :param services: Dictionary keyed by service name
+    :return: None
+    """
+    unknown = set(services) - set(ARCHIVE_SERVICES)
+    if unknown:
+        raise ValueError(
+            f"Unknown archive services {sorted(unknown)}. "
+            f"Available services are {ARCHIVE_SERVICES}"
+        )
+
+
+class ServicePolicy(BaseModel):
+    """
+    Base model for the rate limit, retries and circuit breaker of one service
+    """
+
+    rate: float = Field(
+        description="Maximum sustained number of queries per second",
+        default=2.0,
+        gt=0.0,
+    )
+    burst: int = Field(
+        description="Maximum number of queries sent at once after an idle period",
+        default=5,
+        ge=1,
+    )
+    max_retries: int = Field(
+        description="Maximum number of retries of a failed query", default=3, ge=0
+    )
+    retry_ratio: float = Field(
+        description="Maximum number of retries as a fraction of the queries "
+        "in the budget window",
+        default=0.2,
+        ge=0.0,
+    )
+    min_retries: int = Field(
+        description="Number of retries always allowed in the budget window",
+        default=5,
+        ge=0,
+    )
+    budget_window: float = Field(
+        description="Length of the retry budget window, in seconds",
+        default=60.0,
+        gt=0.0,
+    )
+    backoff: float = Field(
+        description="Initial backoff before a retry, in seconds", default=1.0, ge=0.0
+    )
+    max_backoff: float = Field(
+        description="Maximum backoff before a retry, in seconds", default=30.0, ge=0.0
+    )
+    failure_threshold: int = Field(
+        description="Number of consecutive failures after which "
+        "the circuit breaker opens",
+        default=5,
+        ge=1,
+    )
+    reset_timeout: float = Field(
+        description="Time for which an open circuit breaker rejects queries, "
+        "before letting one through to test the service, in seconds",
+        default=60.0,
+        ge=0.0,
+    )
+
+
+class ArchiveConfig(BaseModel):
+    """
+    Base model for the archive transport. In 'record' mode, the result of every
+    archive query is saved as a fixture, and in 'replay' mode results are served
+    from the fixtures instead of the network, with simulated latency,
+    errors and throttling.
+    """
+
+    mode: Literal["live", "record", "replay"] = Field(
+        description="Whether to query the archives, also record the results, "
+        "or replay recorded results",
+        default=LIVE,
+    )
+    fixture_dir: Path | None = Field(
+        description="Directory of recorded fixtures. "
+        "If None, 'archive_fixtures' in the data directory is used",
+        default=None,
+    )
+    latency: float = Field(
+        description="Mean simulated latency of a replayed query, in seconds",
+        default=0.0,
+        ge=0.0,
+    )
+    latency_jitter: float = Field(
+        description="Standard deviation of the simulated latency, in seconds",
+        default=0.0,
+        ge=0.0,
+    )
+    error_rate: float = Field(
+        description="Fraction of replayed queries which fail with a server error",
+        default=0.0,
+        ge=0.0,
+        le=1.0,
+    )
+    max_rate: float | None = Field(
+        description="Maximum number of replayed queries per second to each service, "
+        "above which queries are throttled. If None, there is no limit",
+        default=None,
+        gt=0.0,
+    )
+    services: dict[str, "ArchiveConfig"] = Field(
+        description="Overrides of the simulation options for individual services",
+        default_factory=dict,
+    )
+    seed: int | None = Field(
+        description="Seed for the simulated latency and errors", default=None
+    )
+    snapshot_dir: Path | None = Field(
+        description="Directory of HEALPix-partitioned catalogue snapshots, which "
+        "answer the cone searches they cover instead of the archives",
+        default=None,
+    )
+    policies: dict[str, ServicePolicy] = Field(
+        description="Rate limit, retries and circuit breaker of each service. "
+        "Services without a policy use the defaults, "
+        "with the rate in DEFAULT_SERVICE_RATES",
+        default_factory=dict,
+    )
+
+    @model_validator(mode="after")
+    def validate_service_names(self):
+        """
+        Validate that the overrides and policies are for known services
+        """
+        validate_services(self.services)
+        validate_services(self.policies)
+        return self
+
+    def get_policy(self, service: str) -> ServicePolicy:
+        """
+        Get the rate limit, retries and circuit breaker of a service
+
+        :param service: Name of the service
+        :return: ServicePolicy
+        """
+        if service in self.policies:
+            return self.policies[service]
+        return ServicePolicy(rate=DEFAULT_SERVICE_RATES[service])
+
+    def for_service(self, service: str) -> "ArchiveConfig":
+        """
+        Get the options for one service, including any overrides
+
+        :param service: Name of the service
+        :return: ArchiveConfig
+        """
+        if service not in self.services:
+            return self
+        override = self.services[service].model_dump(exclude_unset=True)
+        return self.model_copy(update={**override, "services": {}})
+
+    @classmethod
+    def from_env(cls) -> "ArchiveConfig":
+        """
+        Load the options from the JSON file named by GALSYNTHSPEC_ARCHIVE_CONFIG,
+        with the mode, fixture directory and snapshot directory optionally
+        overridden by GALSYNTHSPEC_ARCHIVE_MODE, GALSYNTHSPEC_ARCHIVE_DIR
+        and GALSYNTHSPEC_SNAPSHOT_DIR
+
+        :return: ArchiveConfig
+        """
+        config_path = os.getenv(ARCHIVE_CONFIG_ENV)
+        kwargs = {}
+        if config_path is not None:
+            kwargs = json.loads(Path(config_path).read_text(encoding="utf-8"))
+        if os.getenv(ARCHIVE_MODE_ENV) is not None:
+            kwargs["mode"] = os.getenv(ARCHIVE_MODE_ENV)
+        if os.getenv(ARCHIVE_DIR_ENV) is not None:
+            kwargs["fixture_dir"] = os.getenv(ARCHIVE_DIR_ENV)
+        if os.getenv(SNAPSHOT_DIR_ENV) is not None:
+            kwargs["snapshot_dir"] = os.getenv(SNAPSHOT_DIR_ENV)
+        return cls(**kwargs)
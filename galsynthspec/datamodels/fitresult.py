@@ -3,22 +3,36 @@ Base Model for source
 """
 
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
 from numpydantic import NDArray, Shape
-from prospect.io import read_results as reader
 from prospect.models import SpecModel
 from prospect.plotting.utils import sample_posterior
 from prospect.sources import CSPSpecBasis
-from pydantic import BaseModel, ConfigDict, Field, model_validator
-from sedpy.observate import Filter
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, model_validator
+from sedpy.observate import Filter, load_filters
 
+from galsynthspec.datamodels.sed import SEDConfig
 from galsynthspec.model import get_model, get_sps
+from galsynthspec.utils.hdf5 import read_fit_hdf5
+from galsynthspec.utils.instrumentation import track_stage
+from galsynthspec.utils.rebin import SEDRebinner
+from galsynthspec.utils.shared import SharedArray, SharedArrays, save_memmap
+from galsynthspec.utils.sketch import DEFAULT_N_BINS, SEDQuantileSketch
 
 logger = logging.getLogger(__name__)
 
+# Number of initial samples of a nested sampling run discarded when loading
+# without resampling. MCMC backends already discard their own burn-in.
+BURN_IN = 500
+NESTED_SAMPLERS = ["dynesty"]
+
+# Model and SPS objects of an SED worker process, built once per worker
+_worker_state: dict = {}
+
 
 def weighted_quantiles(
     values: np.ndarray, weights: np.ndarray, quantiles=0.5
@@ -36,6 +50,155 @@ def weighted_quantiles(
     return values[i[np.searchsorted(c, np.array(quantiles) * c[-1])]]
 
 
+def weighted_quantiles_2d(
+    values: np.ndarray, weights: np.ndarray, quantiles=0.5
+) -> np.ndarray:
+    """
+    Calculate weighted quantiles of every column of a 2D array at once,
+    sorting each column only once.
+
+    :param values: 2D array of values, with one column per parameter
+    :param weights: Weights for each row of values
+    :param quantiles: Quantiles to calculate, can be a single value or a list of values
+    :return: Quantiles of each column, with shape (n_columns,) for a single
+        quantile or (len(quantiles), n_columns) for a list
+    """
+    order = np.argsort(values, axis=0)
+    cumulative = np.cumsum(weights[order], axis=0)
+    return sorted_weighted_quantiles(values, order, cumulative, quantiles)
+
+
+def sorted_weighted_quantiles(
+    values: np.ndarray, order: np.ndarray, cumulative: np.ndarray, quantiles=0.5
+) -> np.ndarray:
+    """
+    Calculate weighted quantiles of every column of a 2D array,
+    given the sort order and cumulative weights of each column.
+
+    :param values: 2D array of values, with one column per parameter
+    :param order: Indices sorting each column, from np.argsort(values, axis=0)
+    :param cumulative: Cumulative sum of the weights in sorted order, per column
+    :param quantiles: Quantiles to calculate, can be a single value or a list of values
+    :return: Quantiles of each column, as for weighted_quantiles_2d
+    """
+    targets = np.atleast_1d(quantiles)[:, None] * cumulative[-1]
+    idx = np.array(
+        [
+            np.searchsorted(cumulative[:, j], targets[:, j])
+            for j in range(len(targets.T))
+        ]
+    ).T
+    result = np.take_along_axis(values, np.take_along_axis(order, idx, axis=0), axis=0)
+    return result[0] if np.ndim(quantiles) == 0 else result
+
+
+def _init_sed_worker(redshift: float, obs: dict):
+    """
+    Initialise an SED worker process, building the model and SPS objects
+
+    :param redshift: Redshift of the source
+    :param obs: Observation data
+    :return: None
+    """
+    _worker_state["model"] = get_model(redshift=redshift)
+    _worker_state["sps"] = get_sps()
+    _worker_state["obs"] = obs
+
+
+def _predict_sed_rows(
+    thetas_handle: SharedArray, seds_handle: SharedArray, start: int, stop: int
+):
+    """
+    Predict the SEDs for a block of posterior samples in a worker process,
+    writing them in place to the shared SED matrix
+
+    :param thetas_handle: Handle to the shared posterior samples
+    :param seds_handle: Handle to the shared SED matrix
+    :param start: First row to predict
+    :param stop: Row after the last row to predict
+    :return: None
+    """
+    thetas = thetas_handle.attach()
+    seds = seds_handle.attach(writeable=True)
+    for i in range(start, stop):
+        seds[i], _, _ = _worker_state["model"].predict(
+            thetas[i], obs=_worker_state["obs"], sps=_worker_state["sps"]
+        )
+
+
+def resample_equal_weights(
+    chain: np.ndarray, weights: np.ndarray, n_sample: int, seed: int | None = None
+) -> np.ndarray:
+    """
+    Resample a weighted chain to a fixed number of equally-weighted samples,
+    using systematic resampling so the result has the same distribution
+
+    :param chain: 2D array of samples
+    :param weights: Weights of the samples
+    :param n_sample: Number of samples to draw
+    :param seed: Random seed, or None
+    :return: Array of n_sample samples
+    """
+    cumulative = np.cumsum(weights)
+    positions = (np.random.default_rng(seed).random() + np.arange(n_sample)) / n_sample
+    idx = np.searchsorted(cumulative / cumulative[-1], positions)
+    return chain[np.minimum(idx, len(chain) - 1)]
+
+
+def get_burn_in(sampler_name: str | None) -> int:
+    """
+    Get the number of initial samples to discard from the output of a sampler
+
+    :param sampler_name: Name of the sampler backend, or None for a file
+        written before the sampler was recorded, which used nested sampling
+    :return: Number of samples to discard
+    """
+    if sampler_name is None or sampler_name in NESTED_SAMPLERS:
+        return BURN_IN
+    return 0
+
+
+def get_posterior_samples(
+    chain: np.ndarray,
+    weights: np.ndarray,
+    n_resample: int | None = None,
+    min_weight: float | None = None,
+    burn_in: int = BURN_IN,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Get the posterior samples and weights to keep from the sampler output
+
+    :param chain: 2D array of samples
+    :param weights: Weights of the samples
+    :param n_resample: If set, resample to this many equally-weighted samples
+    :param min_weight: If set, drop samples with a weight below this fraction
+        of the maximum weight
+    :param burn_in: Number of initial samples discarded if neither
+        n_resample nor min_weight is set
+    :return: Chain and weights
+    """
+    if n_resample is None and min_weight is None:
+        if burn_in >= len(chain):
+            logger.warning(
+                f"Only {len(chain)} samples, keeping all of them "
+                f"rather than discarding {burn_in} as burn-in"
+            )
+            return chain, weights
+        return chain[burn_in:], weights[burn_in:]
+
+    if min_weight is not None:
+        keep = weights >= min_weight * weights.max()
+        logger.info(f"Keeping {keep.sum()}/{len(chain)} samples above weight cut")
+        chain, weights = chain[keep], weights[keep]
+
+    if n_resample is not None:
+        logger.info(f"Resampling {len(chain)} samples to {n_resample} equal weights")
+        chain = resample_equal_weights(chain, weights, n_sample=n_resample)
+        weights = np.full(n_resample, 1.0 / n_resample)
+
+    return chain, weights
+
+
 class BestFit(BaseModel):
     """
     Base model for best fit parameters
@@ -60,6 +223,48 @@ class BestFit(BaseModel):
             )
         return self
 
+    @classmethod
+    def from_sampler_output(
+        cls, sampler_output: dict, model: SpecModel, obs: dict, sps: CSPSpecBasis
+    ) -> "BestFit":
+        """
+        Get the best fit from the nested sampler output, as the sample with the
+        highest posterior probability, in the same way as prospector
+
+        :param sampler_output: Dynesty results dictionary
+        :param model: Model used for fitting
+        :param obs: Observation data
+        :param sps: SPS model used for fitting
+        :return: BestFit
+        """
+        lnprobability = sampler_output["logl"] + model.prior_product(
+            sampler_output["samples"]
+        )
+        parameter = sampler_output["samples"][np.argmax(lnprobability)].copy()
+        return cls.from_parameter(parameter, model, obs, sps)
+
+    @classmethod
+    def from_parameter(
+        cls, parameter: np.ndarray, model: SpecModel, obs: dict, sps: CSPSpecBasis
+    ) -> "BestFit":
+        """
+        Get the best fit by predicting the model at the best fit parameters
+
+        :param parameter: Best fit parameters
+        :param model: Model used for fitting
+        :param obs: Observation data
+        :param sps: SPS model used for fitting
+        :return: BestFit
+        """
+        spectrum, photometry, mfrac = model.predict(parameter, obs=obs, sps=sps)
+        return cls(
+            parameter=parameter,
+            photometry=photometry,
+            restframe_wavelengths=sps.wavelengths,
+            spectrum=spectrum,
+            mfrac=float(mfrac),
+        )
+
 
 class PredictedPhotometry(BaseModel):
     """
@@ -107,27 +312,147 @@ class FitResult(BaseModel):
         description="Predicted photometry from the model"
     )
 
+    # Sort order and cumulative weights of each chain column, and computed quantiles
+    _chain_cdf: tuple[np.ndarray, np.ndarray] | None = PrivateAttr(default=None)
+    _quantile_cache: dict = PrivateAttr(default_factory=dict)
+
     @classmethod
-    def from_file(cls, file_path: Path) -> "FitResult":
+    def from_file(
+        cls,
+        file_path: Path,
+        n_resample: int | None = None,
+        min_weight: float | None = None,
+    ) -> "FitResult":
         """
         Read the result from a file
 
+        By default, the first BURN_IN samples of a nested sampling run
+        are discarded. Alternatively,
+        the full sampler output can be resampled to n_resample equally-weighted
+        samples, or samples can be dropped below a weight threshold.
+
         :param file_path: Path to the file
+        :param n_resample: If set, resample to this many equally-weighted samples
+        :param min_weight: If set, drop samples with a weight below this fraction
+            of the maximum weight
+        :return: Result instance
+        """
+        out = read_fit_hdf5(
+            file_path, {"sampling": ["chain", "weights"], "obs": None, "bestfit": None}
+        )
+        obs = out["obs"]
+        obs["filters"] = load_filters([str(f) for f in obs["filters"]])
+        # The spectrum may be stored in single precision
+        best_fit = out["bestfit"]
+        best_fit["spectrum"] = np.asarray(best_fit["spectrum"], dtype=float)
+
+        return cls.from_samples(
+            file_path,
+            fit_parameters=out["sampling"]["theta_labels"],
+            chain=out["sampling"]["chain"],
+            weights=out["sampling"]["weights"],
+            obs=obs,
+            best_fit=BestFit(**best_fit),
+            n_resample=n_resample,
+            min_weight=min_weight,
+            burn_in=get_burn_in(out["sampling"].get("sampler")),
+        )
+
+    @classmethod
+    def from_sampler_output(  # pylint: disable=too-many-arguments
+        cls,
+        file_path: Path,
+        sampler_output: dict,
+        *,
+        model: SpecModel,
+        obs: dict,
+        sps: CSPSpecBasis,
+        n_resample: int | None = None,
+        min_weight: float | None = None,
+        sampler_name: str | None = None,
+    ) -> "FitResult":
+        """
+        Create the result directly from the sampler output,
+        without reading it back from a file
+
+        :param file_path: Path to the file the result is saved to
+        :param sampler_output: Dynesty results dictionary
+        :param model: Model used for fitting
+        :param obs: Observation data
+        :param sps: SPS model used for fitting
+        :param n_resample: If set, resample to this many equally-weighted samples
+        :param min_weight: If set, drop samples with a weight below this fraction
+            of the maximum weight
+        :param sampler_name: Name of the sampler backend, or None for nested sampling
         :return: Result instance
         """
-        out, out_obs, _ = reader.results_from(str(file_path))
-        model = get_model(redshift=out["obs"]["redshift"])
+        return cls.from_samples(
+            file_path,
+            fit_parameters=list(model.theta_labels()),
+            chain=sampler_output["samples"],
+            weights=np.exp(sampler_output["logwt"] - sampler_output["logz"][-1]),
+            obs=obs,
+            best_fit=BestFit.from_sampler_output(sampler_output, model, obs, sps),
+            model=model,
+            sps=sps,
+            n_resample=n_resample,
+            min_weight=min_weight,
+            burn_in=get_burn_in(sampler_name),
+        )
+
+    @classmethod
+    def from_samples(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        cls,
+        file_path: Path,
+        fit_parameters: list[str],
+        chain: np.ndarray,
+        weights: np.ndarray,
+        obs: dict,
+        best_fit: BestFit,
+        *,
+        model: SpecModel | None = None,
+        sps: CSPSpecBasis | None = None,
+        n_resample: int | None = None,
+        min_weight: float | None = None,
+        burn_in: int = BURN_IN,
+    ) -> "FitResult":
+        """
+        Create the result from the full sampler output, either read from a file
+        or still in memory after fitting
+
+        :param file_path: Path to the file the result is saved to
+        :param fit_parameters: Names of fit parameters
+        :param chain: Full chain of the sampler
+        :param weights: Full weights of the sampler
+        :param obs: Observation data
+        :param best_fit: Best fit model
+        :param model: Model used for fitting, or None to build it
+        :param sps: SPS model used for fitting, or None to build it
+        :param n_resample: If set, resample to this many equally-weighted samples
+        :param min_weight: If set, drop samples with a weight below this fraction
+            of the maximum weight
+        :param burn_in: Number of initial samples discarded if neither
+            n_resample nor min_weight is set
+        :return: Result instance
+        """
+        chain, weights = get_posterior_samples(
+            chain,
+            weights,
+            n_resample=n_resample,
+            min_weight=min_weight,
+            burn_in=burn_in,
+        )
         return cls(
             input_path=file_path,
-            fit_parameters=out["theta_labels"],
-            chain=out["chain"][500:],
-            weights=out["weights"][500:],
-            redshift=out["obs"]["redshift"],
-            obs=out["obs"],
-            model=model,
-            sps=get_sps(),
-            best_fit=BestFit(**out["bestfit"]),
-            predicted_photometry=PredictedPhotometry(**out_obs),
+            fit_parameters=fit_parameters,
+            chain=chain,
+            weights=weights,
+            redshift=obs["redshift"],
+            obs=obs,
+            model=get_model(redshift=obs["redshift"]) if model is None else model,
+            sps=get_sps() if sps is None else sps,
+            best_fit=best_fit,
+            predicted_photometry=PredictedPhotometry(**obs),
         )
 
     @model_validator(mode="after")
@@ -140,6 +465,25 @@ class FitResult(BaseModel):
         )
         return self
 
+    def get_chain_quantiles(self, quantiles=0.5) -> np.ndarray:
+        """
+        Get weighted quantiles of every parameter in the chain.
+        The chain is sorted only once, and the quantiles are cached.
+
+        :param quantiles: Quantiles to calculate, single value or a list of values
+        :return: Quantiles of each parameter, with shape (n_parameters,) for a single
+            quantile or (len(quantiles), n_parameters) for a list
+        """
+        key = (np.ndim(quantiles), tuple(np.atleast_1d(quantiles).tolist()))
+        if key not in self._quantile_cache:
+            if self._chain_cdf is None:
+                order = np.argsort(self.chain, axis=0)
+                self._chain_cdf = (order, np.cumsum(self.weights[order], axis=0))
+            self._quantile_cache[key] = sorted_weighted_quantiles(
+                self.chain, *self._chain_cdf, quantiles=quantiles
+            )
+        return self._quantile_cache[key].copy()
+
     def sample_from_posterior(self, n_sample: int = 1) -> np.ndarray:
         """
         Sample from the posterior
@@ -149,24 +493,203 @@ class FitResult(BaseModel):
         """
         return sample_posterior(self.chain, weights=self.weights, nsample=n_sample)
 
-    def sample_sed_from_posterior(self, n_sample: int = 1) -> pd.DataFrame:
+    def sample_sed_from_posterior(
+        self,
+        n_sample: int = 1,
+        n_workers: int = 1,
+        dtype=np.float64,
+        rebinner: SEDRebinner | None = None,
+    ) -> pd.DataFrame:
         """
         Sample the SED from the posterior
 
         :param n_sample: Number of samples to draw
+        :param n_workers: Number of worker processes to use.
+            With more than one worker, the samples and the SED matrix are
+            placed in shared memory, so they are not copied to the workers.
+        :param dtype: Dtype of the SED matrix, e.g. np.float32 to halve its size
+        :param rebinner: Rebinner to restrict or rebin the SEDs, or None
         :return: The sampled SEDs
         """
-        all_pred = []
-
         thetas = self.sample_from_posterior(n_sample=n_sample)
         logger.info(f"Generating {n_sample} predictions from the posterior samples")
-        for theta in thetas:
-            spec, _, _ = self.predict(theta)
-            all_pred.append(spec)
+        with track_stage("sed_sampling"):
+            all_pred = self._predict_seds(thetas, n_workers=n_workers, dtype=dtype)
+            if rebinner is not None:
+                all_pred = rebinner(all_pred)
 
-        all_pred = np.array(all_pred)
         return pd.DataFrame(all_pred)
 
+    def sample_sed_sketch_from_posterior(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        n_sample: int = 1,
+        chunk_size: int = 100,
+        dtype=np.float32,
+        n_bins: int = DEFAULT_N_BINS,
+        rebinner: SEDRebinner | None = None,
+    ) -> SEDQuantileSketch:
+        """
+        Sample the SED from the posterior in chunks, reducing each chunk into
+        a quantile sketch, so peak memory does not depend on n_sample
+
+        :param n_sample: Number of samples to draw
+        :param chunk_size: Number of samples per chunk
+        :param dtype: Dtype of each chunk of SEDs
+        :param n_bins: Number of histogram bins per wavelength in the sketch
+        :param rebinner: Rebinner to restrict or rebin each chunk, or None
+        :return: Quantile sketch of the sampled SEDs
+        """
+        n_wave = len(
+            self.rest_frame_wavelengths if rebinner is None else rebinner.wavelengths
+        )
+        sketch = SEDQuantileSketch(n_wave=n_wave, n_bins=n_bins)
+        logger.info(
+            f"Generating {n_sample} predictions from the posterior samples, "
+            f"in chunks of {chunk_size}"
+        )
+        with track_stage("sed_sampling"):
+            for start in range(0, n_sample, chunk_size):
+                thetas = self.sample_from_posterior(
+                    n_sample=min(chunk_size, n_sample - start)
+                )
+                seds = self._predict_seds(thetas, dtype=dtype)
+                sketch.update(seds if rebinner is None else rebinner(seds))
+
+        return sketch
+
+    def sample_seds(
+        self, sed_config: SEDConfig | None = None
+    ) -> pd.DataFrame | SEDQuantileSketch:
+        """
+        Sample SEDs from the posterior, either keeping every sample
+        or reducing them into a quantile sketch, depending on the config.
+        Both return values provide quantile(q).
+
+        :param sed_config: SED sampling options, or None for the defaults
+        :return: The sampled SEDs, or a quantile sketch of them
+        """
+        if sed_config is None:
+            sed_config = SEDConfig()
+
+        rebinner = self.get_sed_rebinner(sed_config)
+
+        if sed_config.chunk_size is None:
+            return self.sample_sed_from_posterior(
+                n_sample=sed_config.n_sample, dtype=sed_config.dtype, rebinner=rebinner
+            )
+
+        return self.sample_sed_sketch_from_posterior(
+            n_sample=sed_config.n_sample,
+            chunk_size=sed_config.chunk_size,
+            dtype=sed_config.dtype,
+            rebinner=rebinner,
+        )
+
+    def get_sed_rebinner(self, sed_config: SEDConfig | None) -> SEDRebinner | None:
+        """
+        Get the rebinner for the SEDs sampled with a config
+
+        :param sed_config: SED sampling options, or None for the defaults
+        :return: SEDRebinner, or None if the full SED is kept
+        """
+        if sed_config is None:
+            return None
+        return sed_config.get_rebinner(
+            self.rest_frame_wavelengths, redshift=self.get_redshift()
+        )
+
+    def get_sed_wavelengths(self, sed_config: SEDConfig | None = None) -> np.ndarray:
+        """
+        Get the restframe wavelengths of the SEDs sampled with a config
+
+        :param sed_config: SED sampling options, or None for the defaults
+        :return: Restframe wavelengths
+        """
+        rebinner = self.get_sed_rebinner(sed_config)
+        if rebinner is None:
+            return self.rest_frame_wavelengths
+        return rebinner.wavelengths
+
+    def _predict_seds(
+        self, thetas: np.ndarray, n_workers: int = 1, dtype=np.float64
+    ) -> np.ndarray:
+        """
+        Predict the SEDs for a set of posterior samples
+
+        :param thetas: Posterior samples
+        :param n_workers: Number of worker processes
+        :param dtype: Dtype of the SED matrix
+        :return: SED matrix, with one row per sample
+        """
+        if n_workers > 1:
+            return self._predict_seds_parallel(thetas, n_workers, dtype=dtype)
+
+        seds = np.empty((len(thetas), len(self.rest_frame_wavelengths)), dtype=dtype)
+        for i, theta in enumerate(thetas):
+            seds[i], _, _ = self.predict(theta)
+        return seds
+
+    def _predict_seds_parallel(
+        self, thetas: np.ndarray, n_workers: int, dtype=np.float64
+    ) -> np.ndarray:
+        """
+        Predict the SEDs for a set of posterior samples with a pool of workers,
+        which write the SEDs directly into a shared SED matrix
+
+        :param thetas: Posterior samples
+        :param n_workers: Number of worker processes
+        :param dtype: Dtype of the SED matrix
+        :return: SED matrix, with one row per sample
+        """
+        n_sample = len(thetas)
+        shape = (n_sample, len(self.rest_frame_wavelengths))
+        block_size = int(np.ceil(n_sample / n_workers))
+
+        with SharedArrays(
+            arrays={"thetas": np.asarray(thetas, dtype=float)},
+            empty={"seds": (shape, np.dtype(dtype).str)},
+        ) as handles:
+            with ProcessPoolExecutor(
+                max_workers=n_workers,
+                initializer=_init_sed_worker,
+                initargs=(self.redshift, self.obs),
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        _predict_sed_rows,
+                        handles["thetas"],
+                        handles["seds"],
+                        start,
+                        min(start + block_size, n_sample),
+                    )
+                    for start in range(0, n_sample, block_size)
+                ]
+                for future in futures:
+                    future.result()
+
+            return handles["seds"].attach().copy()
+
+    def share_posterior(self) -> SharedArrays:
+        """
+        Place the posterior chain and weights in shared memory,
+        so that worker processes on this node can attach to them without copying
+
+        :return: SharedArrays context manager, yielding the handles
+        """
+        return SharedArrays(arrays={"chain": self.chain, "weights": self.weights})
+
+    def export_memmap(self) -> dict[str, SharedArray]:
+        """
+        Save the posterior chain and weights as .npy files next to the input file,
+        so that workers on any node can memory-map them without copying
+
+        :return: Dictionary of SharedArray handles
+        """
+        return save_memmap(
+            {"chain": self.chain, "weights": self.weights},
+            prefix=self.input_path.with_suffix(""),  # pylint: disable=no-member
+        )
+
     def predict(self, theta, obs=None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
         """
         Predict the spectrum, photometry and mass fraction
@@ -199,11 +722,7 @@ class FitResult(BaseModel):
         redshift = self.redshift
         if redshift is None:
             idx = self.fit_parameters.index("zred")  # pylint: disable=no-member
-            redshift = weighted_quantiles(
-                self.chain[:, idx],
-                self.weights,
-                quantiles=0.5,
-            )
+            redshift = self.get_chain_quantiles(0.5)[idx]
             logger.info(f"Redshift is not known. Using median fit value: {redshift}")
 
         return redshift
@@ -2,6 +2,7 @@
 Base Model for source
 """
 
+import json
 import logging
 from pathlib import Path
 
@@ -11,12 +12,17 @@ from astropy.coordinates import SkyCoord
 from pydantic import BaseModel, Field, model_validator
 
 from galsynthspec.datamodels.fitresult import FitResult
-from galsynthspec.datamodels.photometry import Photometry
-from galsynthspec.download import download_all_data
+from galsynthspec.datamodels.photometry import Photometry, PhotometrySet
+from galsynthspec.download import download_all_data, merge_photometry
 from galsynthspec.paths import get_output_dir
+from galsynthspec.utils.instrumentation import track_stage
+from galsynthspec.utils.io import atomic_write, directory_lock
+from galsynthspec.utils.progress import PROGRESS_FILE_NAME
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_RADIUS_ARCSEC = 3.0
+
 
 class Galaxy(BaseModel):
     """
@@ -78,6 +84,16 @@ class Galaxy(BaseModel):
         """
         return self.base_output_dir / "photometry.json"
 
+    @property
+    def skipped_surveys_file(self) -> Path:
+        """
+        Get the file listing surveys missing from the cached photometry,
+        because their archive was unavailable
+
+        :return: Skipped surveys path
+        """
+        return self.base_output_dir / "skipped_surveys.json"
+
     @property
     def mcmc_cache_file(self) -> Path:
         """
@@ -96,6 +112,42 @@ class Galaxy(BaseModel):
         """
         return self.base_output_dir / "synthetic_photometry.json"
 
+    @property
+    def fit_results_file(self) -> Path:
+        """
+        Get the file for the summary of the fit parameters
+
+        :return: Fit results path
+        """
+        return self.base_output_dir / "fit_results.json"
+
+    @property
+    def synthetic_sed_file(self) -> Path:
+        """
+        Get the file for the synthetic SED
+
+        :return: Synthetic SED path
+        """
+        return self.base_output_dir / "synthetic_sed.json"
+
+    @property
+    def run_report_file(self) -> Path:
+        """
+        Get the file for the run report
+
+        :return: Run report path
+        """
+        return self.base_output_dir / "run_report.json"
+
+    @property
+    def progress_file(self) -> Path:
+        """
+        Get the JSON-lines file for the progress of the sampler
+
+        :return: Progress file path
+        """
+        return self.base_output_dir / PROGRESS_FILE_NAME
+
     @property
     def corner_path(self) -> Path:
         """
@@ -105,8 +157,17 @@ class Galaxy(BaseModel):
         """
         return self.base_output_dir / "corner.pdf"
 
+    def lock(self):
+        """
+        Get an exclusive advisory lock on the output directory,
+        so that only one process works on the galaxy at a time
+
+        :return: Context manager holding the lock
+        """
+        return directory_lock(self.base_output_dir)
+
     def get_photometry(
-        self, radius_arcsec: float = 3.0, use_cache: bool = True
+        self, radius_arcsec: float = DEFAULT_RADIUS_ARCSEC, use_cache: bool = True
     ) -> list[Photometry]:
         """
         Get the photometry data for the source
@@ -117,13 +178,99 @@ class Galaxy(BaseModel):
         :return: list[Photometry] The photometry data
         """
         if self.photometry_cache_file.is_file() and use_cache:
-            return self.load_photometry_from_cache()
+            photometry = self.load_photometry_from_cache()
+            if self.skipped_surveys_file.is_file():
+                photometry = self.download_skipped_surveys(photometry, radius_arcsec)
+            return photometry
 
-        photometry = download_all_data(self.sky_coord, radius_arcsec=radius_arcsec)
+        skipped = []
+        photometry = download_all_data(
+            self.sky_coord, radius_arcsec=radius_arcsec, skipped=skipped
+        )
+        # Flag the skipped surveys first, so a cache is never taken as complete
+        self.export_skipped_surveys(skipped)
         self.export_photometry_to_cache(photometry)
 
         return photometry
 
+    def export_skipped_surveys(self, skipped: list[str]):
+        """
+        Flag the surveys missing from the cached photometry,
+        or remove the flag if none are missing
+
+        :param skipped: list[str] Names of the skipped surveys
+
+        :return: None
+        """
+        if len(skipped) == 0:
+            self.skipped_surveys_file.unlink(missing_ok=True)
+            return
+
+        logger.warning(
+            f"Photometry for {self.source_name} is missing surveys {skipped}, "
+            f"because their archives were unavailable"
+        )
+        with atomic_write(self.skipped_surveys_file) as tmp_path:
+            tmp_path.write_text(json.dumps(skipped), encoding="utf8")
+
+    def download_skipped_surveys(
+        self, photometry: list[Photometry], radius_arcsec: float
+    ) -> list[Photometry]:
+        """
+        Query the surveys missing from the cached photometry again,
+        and merge them into the cache
+
+        :param photometry: list[Photometry] The cached photometry
+        :param radius_arcsec: float The radius of the search in arcseconds
+
+        :return: list[Photometry] The merged photometry
+        """
+        surveys = json.loads(self.skipped_surveys_file.read_text(encoding="utf8"))
+        logger.info(
+            f"Cached photometry for {self.source_name} is missing surveys "
+            f"{surveys}, querying them again"
+        )
+        skipped = []
+        new_photometry = download_all_data(
+            self.sky_coord,
+            radius_arcsec=radius_arcsec,
+            skipped=skipped,
+            surveys=surveys,
+        )
+        photometry = merge_photometry(photometry, new_photometry)
+        self.export_photometry_to_cache(photometry)
+        self.export_skipped_surveys(skipped)
+        return photometry
+
+    def get_photometry_set(
+        self, radius_arcsec: float = DEFAULT_RADIUS_ARCSEC, use_cache: bool = True
+    ) -> PhotometrySet:
+        """
+        Get the photometry data for the source as an array-backed PhotometrySet.
+        Cached photometry is loaded directly into arrays,
+        without creating Photometry objects.
+
+        :param radius_arcsec: float The radius of the search in arcseconds
+        :param use_cache: bool If True, use the cached photometry data if available
+
+        :return: PhotometrySet The photometry data
+        """
+        if (
+            self.photometry_cache_file.is_file()
+            and use_cache
+            and not self.skipped_surveys_file.is_file()
+        ):
+            logger.info(
+                f"Loading photometry from cache file {self.photometry_cache_file}"
+            )
+            return PhotometrySet.from_dataframe(
+                pd.read_json(self.photometry_cache_file)
+            )
+
+        return PhotometrySet.from_list(
+            self.get_photometry(radius_arcsec=radius_arcsec, use_cache=use_cache)
+        )
+
     def export_photometry_to_cache(self, photometry: list[Photometry]):
         """
         Export the photometry to a cache file
@@ -133,9 +280,11 @@ class Galaxy(BaseModel):
         :return: None
         """
         logger.info(f"Exporting photometry to {self.photometry_cache_file}")
-        pd.DataFrame([p.model_dump() for p in photometry]).to_json(
-            self.photometry_cache_file
-        )
+        with (
+            track_stage("write_json"),
+            atomic_write(self.photometry_cache_file) as tmp_path,
+        ):
+            pd.DataFrame([p.model_dump() for p in photometry]).to_json(tmp_path)
 
     def load_photometry_from_cache(self) -> list[Photometry]:
         """
@@ -147,10 +296,15 @@ class Galaxy(BaseModel):
         df = pd.read_json(self.photometry_cache_file)
         return [Photometry.model_validate(p) for p in df.to_dict(orient="records")]
 
-    def load_results(self) -> FitResult:
+    def load_results(
+        self, n_resample: int | None = None, min_weight: float | None = None
+    ) -> FitResult:
         """
         Load the results for the source
 
+        :param n_resample: If set, resample to this many equally-weighted samples
+        :param min_weight: If set, drop samples with a weight below this fraction
+            of the maximum weight
         :return: Result object containing the results
         """
         if not self.mcmc_cache_file.is_file():
@@ -159,4 +313,8 @@ class Galaxy(BaseModel):
             )
 
         logger.info(f"Loading results from {self.mcmc_cache_file}")
-        return FitResult.from_file(self.mcmc_cache_file)
+        with track_stage("load_results"):
+            res = FitResult.from_file(
+                self.mcmc_cache_file, n_resample=n_resample, min_weight=min_weight
+            )
+        return res
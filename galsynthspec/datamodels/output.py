@@ -0,0 +1,70 @@
+"""
+Base Model for the options used to write sampler results
+"""
+
+from typing import Literal
+
+import numpy as np
+from pydantic import BaseModel, Field, model_validator
+
+DEFAULT_GZIP_LEVEL = 4
+DEFAULT_CHUNK_ROWS = 4096
+
+
+class OutputConfig(BaseModel):
+    """
+    Base model for the options used to write sampler results to HDF5
+    """
+
+    compression: Literal["gzip", "lzf"] | None = Field(
+        description="Compression filter for the chain, weights, likelihoods and "
+        "best fit spectrum. If None, the uncompressed prospector layout is written",
+        default=None,
+    )
+    compression_level: int | None = Field(
+        description="gzip compression level, from 0 to 9",
+        default=None,
+        ge=0,
+        le=9,
+    )
+    chunk_rows: int = Field(
+        description="Number of rows in each chunk of the compressed datasets",
+        default=DEFAULT_CHUNK_ROWS,
+        gt=0,
+    )
+    float32_spectrum: bool = Field(
+        description="Store the best fit spectrum in single precision", default=False
+    )
+
+    @model_validator(mode="after")
+    def validate_compression_level(self):
+        """
+        Validate that a compression level is only given for gzip
+        """
+        if self.compression_level is not None and self.compression != "gzip":
+            raise ValueError("compression_level can only be set for gzip compression")
+        return self
+
+    def get_dataset_kwargs(self, data: np.ndarray) -> dict:
+        """
+        Get the h5py create_dataset options for an array
+
+        :param data: Array to write
+        :return: Dictionary of chunking and compression options
+        """
+        data = np.asarray(data)
+        if self.compression is None or data.ndim == 0 or data.size < 2:
+            return {}
+
+        kwargs = {
+            "chunks": (min(self.chunk_rows, data.shape[0]),) + data.shape[1:],
+            "compression": self.compression,
+            "shuffle": True,
+        }
+        if self.compression == "gzip":
+            kwargs["compression_opts"] = (
+                DEFAULT_GZIP_LEVEL
+                if self.compression_level is None
+                else self.compression_level
+            )
+        return kwargs
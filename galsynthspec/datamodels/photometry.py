@@ -2,12 +2,53 @@
 Base Model for photometry data
 """
 
+from functools import lru_cache
+
 import numpy as np
+import pandas as pd
 from pydantic import BaseModel, Field, model_validator
 from sedpy.observate import Filter, list_available_filters
 
 from galsynthspec.utils.extinction import get_extinction_for_filter
 
+DEFAULT_SYSTEMATIC_ERROR = 0.05
+
+
+@lru_cache(maxsize=1)
+def get_available_filters() -> frozenset[str]:
+    """
+    Get the names of all filters available in sedpy
+
+    :return: Set of filter names
+    """
+    return frozenset(list_available_filters())
+
+
+@lru_cache(maxsize=None)
+def get_filter(filter_name: str) -> Filter:
+    """
+    Get the sedpy filter object for a filter name,
+    loading each filter curve only once
+
+    :param filter_name: Name of the filter
+    :return: Filter
+    """
+    return Filter(filter_name)
+
+
+def validate_filter_name(filter_name: str):
+    """
+    Check that a filter is available in sedpy
+
+    :param filter_name: Name of the filter
+    :return: None
+    """
+    if filter_name not in get_available_filters():
+        raise ValueError(
+            f"Filter {filter_name} not found. "
+            f"Available filters are {list_available_filters()}"
+        )
+
 
 class Photometry(BaseModel):
     """
@@ -22,7 +63,8 @@ class Photometry(BaseModel):
     )
     mag_err: float = Field(description="Error in the photometry")
     systematic_error: float = Field(
-        description="Systematic error in the photometry", default=0.05
+        description="Systematic error in the photometry",
+        default=DEFAULT_SYSTEMATIC_ERROR,
     )
 
     @property
@@ -37,12 +79,7 @@ class Photometry(BaseModel):
         """
         Validate the filter
         """
-        if self.filter_name not in list_available_filters():
-            raise ValueError(
-                f"Filter {self.filter_name} not found. "
-                f"Available filters are {list_available_filters()}"
-            )
-
+        validate_filter_name(self.filter_name)
         return self
 
     @property
@@ -50,7 +87,7 @@ class Photometry(BaseModel):
         """
         Get the filter object for the photometry
         """
-        return Filter(self.filter_name)
+        return get_filter(self.filter_name)
 
     @property
     def maggies(self) -> float:
@@ -75,3 +112,164 @@ class Photometry(BaseModel):
             src_position=src_position, filter_name=filter_name
         )
         return cls(filter_name=filter_name, extinction=extinction, **kwargs)
+
+
+class PhotometrySet:
+    """
+    Array-backed container for the photometry of a galaxy in several filters,
+    with the same fields as Photometry stored as one array per field
+    """
+
+    __slots__ = (
+        "filter_names",
+        "observed_mag",
+        "extinction",
+        "vega_mag",
+        "mag_err",
+        "systematic_error",
+    )
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        filter_names: list[str],
+        observed_mag: np.ndarray,
+        extinction: np.ndarray,
+        mag_err: np.ndarray,
+        vega_mag: np.ndarray | None = None,
+        systematic_error: np.ndarray | float = DEFAULT_SYSTEMATIC_ERROR,
+    ):
+        self.filter_names = tuple(str(x) for x in filter_names)
+        n_filters = len(self.filter_names)
+
+        self.observed_mag = np.asarray(observed_mag, dtype=float)
+        self.extinction = np.asarray(extinction, dtype=float)
+        self.mag_err = np.asarray(mag_err, dtype=float)
+        if vega_mag is None:
+            vega_mag = np.full(n_filters, np.nan)
+        self.vega_mag = np.asarray(vega_mag, dtype=float)
+        self.systematic_error = np.broadcast_to(
+            np.asarray(systematic_error, dtype=float), (n_filters,)
+        ).copy()
+
+        for name in ["observed_mag", "extinction", "mag_err", "vega_mag"]:
+            if getattr(self, name).shape != (n_filters,):
+                raise ValueError(
+                    f"{name} must have one entry for each of the {n_filters} filters"
+                )
+
+        for filter_name in self.filter_names:
+            validate_filter_name(filter_name)
+
+    def __len__(self) -> int:
+        return len(self.filter_names)
+
+    @classmethod
+    def from_list(cls, photometry: list[Photometry]) -> "PhotometrySet":
+        """
+        Create a PhotometrySet from a list of Photometry objects
+
+        :param photometry: List of Photometry objects
+        :return: PhotometrySet
+        """
+        return cls(
+            filter_names=[p.filter_name for p in photometry],
+            observed_mag=[p.observed_mag for p in photometry],
+            extinction=[p.extinction for p in photometry],
+            mag_err=[p.mag_err for p in photometry],
+            vega_mag=[np.nan if p.vega_mag is None else p.vega_mag for p in photometry],
+            systematic_error=[p.systematic_error for p in photometry],
+        )
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "PhotometrySet":
+        """
+        Create a PhotometrySet from a DataFrame with one row per filter,
+        as written to the photometry cache
+
+        :param df: DataFrame with columns matching the Photometry fields
+        :return: PhotometrySet
+        """
+        kwargs = {}
+        if "vega_mag" in df.columns:
+            kwargs["vega_mag"] = pd.to_numeric(df["vega_mag"]).to_numpy(dtype=float)
+        if "systematic_error" in df.columns:
+            kwargs["systematic_error"] = df["systematic_error"].to_numpy(dtype=float)
+
+        return cls(
+            filter_names=df["filter_name"].tolist(),
+            observed_mag=df["observed_mag"].to_numpy(dtype=float),
+            extinction=df["extinction"].to_numpy(dtype=float),
+            mag_err=df["mag_err"].to_numpy(dtype=float),
+            **kwargs,
+        )
+
+    def to_list(self) -> list[Photometry]:
+        """
+        Convert to a list of Photometry objects
+
+        :return: List of Photometry objects
+        """
+        return [
+            Photometry(
+                filter_name=name,
+                observed_mag=self.observed_mag[i],
+                extinction=self.extinction[i],
+                vega_mag=None if np.isnan(self.vega_mag[i]) else self.vega_mag[i],
+                mag_err=self.mag_err[i],
+                systematic_error=self.systematic_error[i],
+            )
+            for i, name in enumerate(self.filter_names)
+        ]
+
+    @property
+    def mag(self) -> np.ndarray:
+        """
+        Get the magnitudes in AB system
+        """
+        return self.observed_mag - self.extinction
+
+    @property
+    def maggies(self) -> np.ndarray:
+        """
+        Convert the magnitudes to maggies, with 0 for missing magnitudes
+        """
+        missing = np.isnan(self.observed_mag)
+        return np.where(missing, 0.0, 10.0 ** (-0.4 * np.where(missing, 0.0, self.mag)))
+
+    @property
+    def mag_err_combined(self) -> np.ndarray:
+        """
+        Get the statistical and systematic errors in the magnitudes
+        """
+        return np.hypot(self.mag_err, self.systematic_error)
+
+    @property
+    def maggies_unc(self) -> np.ndarray:
+        """
+        Get the uncertainty in maggies
+        """
+        return self.mag_err_combined * self.maggies / 1.086
+
+    @property
+    def filters(self) -> list[Filter]:
+        """
+        Get the filter objects for the photometry
+        """
+        return [get_filter(name) for name in self.filter_names]
+
+    def to_obs(self, redshift: float | None = None) -> dict:
+        """
+        Get the prospector observation dictionary for the photometry
+
+        :param redshift: Redshift of the source
+        :return: Observation dictionary, to be passed to fix_obs
+        """
+        return {
+            "wavelength": None,
+            "spectrum": None,
+            "unc": None,
+            "redshift": redshift,
+            "maggies": self.maggies,
+            "maggies_unc": self.maggies_unc,
+            "filters": self.filters,
+        }
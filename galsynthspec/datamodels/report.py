@@ -0,0 +1,146 @@
+"""
+Base Model for run reports
+"""
+
+from pathlib import Path
+
+from pydantic import BaseModel, Field
+
+from galsynthspec.utils.io import atomic_write
+
+
+class StageReport(BaseModel):
+    """
+    Base model for the resource usage of a single pipeline stage
+    """
+
+    n_calls: int = Field(description="Number of times the stage was run", default=0)
+    wall_time_s: float = Field(description="Wall time in seconds", default=0.0)
+    cpu_time_s: float = Field(description="CPU time in seconds", default=0.0)
+    peak_rss_mb: float = Field(
+        description="Peak resident set size of the process in MB", default=0.0
+    )
+    n_likelihood_calls: int = Field(
+        description="Number of likelihood evaluations", default=0
+    )
+
+    def add(self, other: "StageReport"):
+        """
+        Add the usage of another stage report to this one
+
+        :param other: StageReport to add
+        :return: None
+        """
+        self.n_calls += other.n_calls
+        self.wall_time_s += other.wall_time_s
+        self.cpu_time_s += other.cpu_time_s
+        self.peak_rss_mb = max(self.peak_rss_mb, other.peak_rss_mb)
+        self.n_likelihood_calls += other.n_likelihood_calls
+
+
+def add_stage(stages: dict[str, StageReport], name: str, stage: StageReport):
+    """
+    Add the usage of a stage to a dictionary of stage reports
+
+    :param stages: Dictionary of stage reports, keyed by stage name
+    :param name: Name of the stage
+    :param stage: StageReport for the stage
+    :return: None
+    """
+    stages.setdefault(name, StageReport()).add(stage)
+
+
+class RunReport(BaseModel):
+    """
+    Base model for the per-stage resource usage of a pipeline run on one galaxy
+    """
+
+    source_name: str | None = Field(description="Name of the source", default=None)
+    stages: dict[str, StageReport] = Field(
+        description="Resource usage for each stage", default_factory=dict
+    )
+    skipped_surveys: list[str] = Field(
+        description="Surveys skipped because their archive was unavailable",
+        default_factory=list,
+    )
+
+    def record(self, name: str, stage: StageReport):
+        """
+        Record the usage of a stage, adding it to any previous runs of that stage
+
+        :param name: Name of the stage
+        :param stage: StageReport for the stage
+        :return: None
+        """
+        add_stage(self.stages, name, stage)
+
+    def to_json(self, out_path: Path):
+        """
+        Write the report to a JSON file
+
+        :param out_path: Output path
+        :return: None
+        """
+        with atomic_write(out_path) as tmp_path:
+            tmp_path.write_text(self.model_dump_json(indent=2), encoding="utf8")
+
+
+class BatchReport(BaseModel):
+    """
+    Base model for the aggregated resource usage of a batch of pipeline runs
+    """
+
+    n_galaxies: int = Field(description="Number of galaxies processed", default=0)
+    failed: list[str] = Field(
+        description="Names of galaxies which failed", default_factory=list
+    )
+    stages: dict[str, StageReport] = Field(
+        description="Summed resource usage for each stage", default_factory=dict
+    )
+    runs: list[RunReport] = Field(
+        description="Individual run reports", default_factory=list
+    )
+
+    def add(self, report: RunReport):
+        """
+        Add a run report to the batch
+
+        :param report: RunReport for a single galaxy
+        :return: None
+        """
+        self.n_galaxies += 1
+        self.runs.append(report)  # pylint: disable=no-member
+        for name, stage in report.stages.items():
+            add_stage(self.stages, name, stage)
+
+    @property
+    def degraded(self) -> list[str]:
+        """
+        Get the names of galaxies for which some surveys were skipped
+
+        :return: List of source names
+        """
+        return [
+            run.source_name
+            for run in self.runs  # pylint: disable=not-an-iterable
+            if run.skipped_surveys
+        ]
+
+    def add_failure(self, source_name: str):
+        """
+        Record a galaxy for which the pipeline failed
+
+        :param source_name: Name of the source
+        :return: None
+        """
+        self.failed.append(source_name)  # pylint: disable=no-member
+
+    def to_json(self, out_path: Path):
+        """
+        Write the report to a JSON file
+
+        :param out_path: Output path
+        :return: None
+        """
+        with atomic_write(out_path) as tmp_path:
+            tmp_path.write_text(self.model_dump_json(indent=2), encoding="utf8")
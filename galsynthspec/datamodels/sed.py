@@ -0,0 +1,117 @@
+"""
+Base Model for the options used to sample synthetic SEDs
+"""
+
+import numpy as np
+from pydantic import BaseModel, Field, model_validator
+
+from galsynthspec.utils.rebin import SEDRebinner
+
+
+class SEDConfig(BaseModel):
+    """
+    Base model for the options used to sample synthetic SEDs from the posterior
+    """
+
+    n_sample: int = Field(
+        description="Number of SEDs to sample from the posterior", default=1000, gt=0
+    )
+    chunk_size: int | None = Field(
+        description="If set, sample the SEDs in chunks of this size, "
+        "and estimate quantiles with a sketch so memory does not grow with n_sample",
+        default=None,
+        gt=0,
+    )
+    float32: bool = Field(
+        description="Store the sampled SEDs in single precision", default=False
+    )
+    min_wavelength: float | None = Field(
+        description="Minimum observed-frame wavelength of the SEDs, in Angstrom",
+        default=None,
+        gt=0.0,
+    )
+    max_wavelength: float | None = Field(
+        description="Maximum observed-frame wavelength of the SEDs, in Angstrom",
+        default=None,
+        gt=0.0,
+    )
+    n_wavelength: int | None = Field(
+        description="If set, rebin the SEDs onto this many log-spaced wavelengths, "
+        "conserving flux, before computing quantiles",
+        default=None,
+        gt=0,
+    )
+
+    @model_validator(mode="after")
+    def validate_wavelength_range(self):
+        """
+        Validate the wavelength range
+        """
+        if (
+            self.min_wavelength is not None
+            and self.max_wavelength is not None
+            and self.min_wavelength >= self.max_wavelength
+        ):
+            raise ValueError("min_wavelength must be less than max_wavelength")
+        return self
+
+    @property
+    def dtype(self) -> str:
+        """
+        Get the dtype of the sampled SEDs
+        """
+        return "float32" if self.float32 else "float64"
+
+    @property
+    def is_full_resolution(self) -> bool:
+        """
+        Check whether the sampled SEDs keep every model wavelength
+        """
+        return (
+            self.min_wavelength is None
+            and self.max_wavelength is None
+            and self.n_wavelength is None
+        )
+
+    def full_resolution(self) -> "SEDConfig":
+        """
+        Get a copy of the config which keeps every model wavelength,
+        as needed to predict synthetic photometry
+
+        :return: SEDConfig
+        """
+        return self.model_copy(
+            update={
+                "min_wavelength": None,
+                "max_wavelength": None,
+                "n_wavelength": None,
+            }
+        )
+
+    def get_rebinner(
+        self, rest_frame_wavelengths: np.ndarray, redshift: float
+    ) -> SEDRebinner | None:
+        """
+        Get the rebinner which restricts and rebins the sampled SEDs
+
+        :param rest_frame_wavelengths: Rest-frame wavelengths of the model SEDs
+        :param redshift: Redshift of the source
+        :return: SEDRebinner, or None if the full SED is kept
+        """
+        if self.is_full_resolution:
+            return None
+
+        return SEDRebinner(
+            rest_frame_wavelengths,
+            min_wavelength=(
+                None
+                if self.min_wavelength is None
+                else self.min_wavelength / (1 + redshift)
+            ),
+            max_wavelength=(
+                None
+                if self.max_wavelength is None
+                else self.max_wavelength / (1 + redshift)
+            ),
+            n_wavelength=self.n_wavelength,
+        )
@@ -2,4 +2,4 @@
 Module for downloading photometry data for a given galaxy.
 """
 
-from galsynthspec.download.all import download_all_data
+from galsynthspec.download.all import download_all_data, merge_photometry
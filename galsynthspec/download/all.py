@@ -2,6 +2,9 @@
 Module to iteratively download photometry data for a given galaxy.
 """
 
+import logging
+from typing import Callable
+
 from astropy.coordinates import SkyCoord
 
 from galsynthspec.datamodels.photometry import Photometry
@@ -10,31 +13,102 @@ from galsynthspec.download.ps1 import download_ps1_data
 from galsynthspec.download.sdss import download_sdss_data
 from galsynthspec.download.twomass import download_twomass_data
 from galsynthspec.download.wise import download_wise_data
+from galsynthspec.utils.instrumentation import flag_skipped_survey, track_stage
+from galsynthspec.utils.resilience import ServiceUnavailableError
+
+logger = logging.getLogger(__name__)
+
+SURVEYS = ["sdss", "ps1", "galex", "twomass", "wise"]
+
+
+def download_survey(
+    name: str,
+    download: Callable[[SkyCoord, float], list[Photometry]],
+    src_position: SkyCoord,
+    radius_arcsec: float,
+    skipped: list[str],
+) -> list[Photometry]:
+    """
+    Download the photometry of one survey, skipping it if its archive is unavailable
+
+    :param name: Name of the survey
+    :param download: Function to download the photometry of the survey
+    :param src_position: SkyCoord The position of the source in the sky.
+    :param radius_arcsec: Radius of the search in arcseconds.
+    :param skipped: List to which the name is appended if the survey is skipped
+    :return: Returns a list of Photometry objects.
+    """
+    with track_stage(f"download_{name}"):
+        try:
+            return download(src_position, radius_arcsec)
+        except ServiceUnavailableError as e:
+            logger.warning(f"Skipping {name} photometry: {e}")
+            skipped.append(name)
+            flag_skipped_survey(name)
+            return []
 
 
 def download_all_data(
     src_position: SkyCoord,
     radius_arcsec: float,
+    skipped: list[str] | None = None,
+    surveys: list[str] | None = None,
 ) -> list[Photometry]:
     """
     Module for downloading photometry data for a given galaxy.
 
+    Surveys whose archive is unavailable, because its circuit breaker is open,
+    are skipped rather than stalling the download.
+
     :param src_position: SkyCoord The position of the source in the sky.
     :param radius_arcsec: Radius of the search in arcseconds.
+    :param skipped: List to which the names of skipped surveys are appended.
+    :param surveys: Names of the surveys to download, or None for all surveys.
     :return: Returns a list of Photometry objects.
     """
+    skipped = [] if skipped is None else skipped
+    surveys = SURVEYS if surveys is None else surveys
 
     # Optical data
-    all_filters = download_sdss_data(src_position, radius_arcsec)
+    all_filters = []
+    if "sdss" in surveys:
+        all_filters = download_survey(
+            "sdss", download_sdss_data, src_position, radius_arcsec, skipped
+        )
     # Download PS1 if SDSS is not available
-    if len(all_filters) == 0:
-        all_filters = download_ps1_data(src_position, radius_arcsec)
+    if len(all_filters) == 0 and "ps1" in surveys:
+        all_filters = download_survey(
+            "ps1", download_ps1_data, src_position, radius_arcsec, skipped
+        )
 
-    # UV data
-    all_filters.extend(download_galex_data(src_position, radius_arcsec))
-    # NIR data
-    all_filters.extend(download_twomass_data(src_position, radius_arcsec))
-    # MIR data
-    all_filters.extend(download_wise_data(src_position, radius_arcsec))
+    for name, download in [
+        # UV data
+        ("galex", download_galex_data),
+        # NIR data
+        ("twomass", download_twomass_data),
+        # MIR data
+        ("wise", download_wise_data),
+    ]:
+        if name in surveys:
+            all_filters.extend(
+                download_survey(name, download, src_position, radius_arcsec, skipped)
+            )
 
     return all_filters
+
+
+def merge_photometry(
+    photometry: list[Photometry], new_photometry: list[Photometry]
+) -> list[Photometry]:
+    """
+    Merge newly downloaded photometry into existing photometry,
+    replacing any existing entries of the same filters
+
+    :param photometry: Existing photometry
+    :param new_photometry: Newly downloaded photometry
+    :return: Merged list of Photometry objects
+    """
+    new_filters = {p.filter_name for p in new_photometry}
+    return [p for p in photometry if p.filter_name not in new_filters] + list(
+        new_photometry
+    )
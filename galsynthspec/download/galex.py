@@ -12,6 +12,7 @@ from astropy.coordinates import SkyCoord
 from astroquery.mast import Catalogs
 
 from galsynthspec.datamodels.photometry import Photometry
+from galsynthspec.utils.archive import get_cone_request, query_archive
 
 GALEX_BANDS = ["FUV", "NUV"]
 GALEX_MAG_COLS = [f"{x.lower()}_mag" for x in GALEX_BANDS]
@@ -37,10 +38,16 @@ def download_galex_data(
 
     all_filters = []
 
-    catalog_data = Catalogs.query_region(  # pylint: disable=no-member
-        src_position,
-        radius=radius_arcsec * u.arcsec,  # pylint: disable=no-member
-        catalog="Galex",
+    catalog_data = query_archive(
+        "mast",
+        get_cone_request(
+            "Catalogs.query_region", src_position, radius_arcsec, catalog="Galex"
+        ),
+        lambda: Catalogs.query_region(  # pylint: disable=no-member
+            src_position,
+            radius=radius_arcsec * u.arcsec,  # pylint: disable=no-member
+            catalog="Galex",
+        ),
     )
 
     if len(catalog_data) == 0:
@@ -9,6 +9,7 @@ from astropy.coordinates import SkyCoord
 from astroquery.mast import Catalogs
 
 from galsynthspec.datamodels.photometry import Photometry
+from galsynthspec.utils.archive import get_cone_request, query_archive
 
 PS1_BANDS = ["g", "r", "i", "z"]
 PS1_MAG_COLS = [f"{b}MeanKronMag" for b in PS1_BANDS]
@@ -32,10 +33,16 @@ def download_ps1_data(
 
     all_filters = []
 
-    catalog_data = Catalogs.query_region(  # pylint: disable=no-member
-        src_position,
-        radius=radius_arcsec * u.arcsec,  # pylint: disable=no-member
-        catalog="Panstarrs",
+    catalog_data = query_archive(
+        "mast",
+        get_cone_request(
+            "Catalogs.query_region", src_position, radius_arcsec, catalog="Panstarrs"
+        ),
+        lambda: Catalogs.query_region(  # pylint: disable=no-member
+            src_position,
+            radius=radius_arcsec * u.arcsec,  # pylint: disable=no-member
+            catalog="Panstarrs",
+        ),
     )
 
     if len(catalog_data) == 0:
@@ -9,6 +9,7 @@ from astropy.coordinates import SkyCoord
 from astroquery.sdss import SDSS
 
 from galsynthspec.datamodels.photometry import Photometry
+from galsynthspec.utils.archive import get_cone_request, query_archive
 
 SDSS_BANDS = ["u", "g", "r", "i", "z"]
 SDSS_MAG_COLS = [f"cModelMag_{b}" for b in SDSS_BANDS]
@@ -34,10 +35,19 @@ def download_sdss_data(
 
     all_filters = []
 
-    cat = SDSS.query_crossid(  # pylint: disable=no-member
-        src_position,
-        radius=radius_arcsec * u.arcsec,  # pylint: disable=no-member
-        photoobj_fields=["ra", "dec"] + SDSS_MAG_COLS + SDSS_MAGERR_COLS,
+    cat = query_archive(
+        "sdss",
+        get_cone_request(
+            "SDSS.query_crossid",
+            src_position,
+            radius_arcsec,
+            photoobj_fields=["ra", "dec"] + SDSS_MAG_COLS + SDSS_MAGERR_COLS,
+        ),
+        lambda: SDSS.query_crossid(  # pylint: disable=no-member
+            src_position,
+            radius=radius_arcsec * u.arcsec,  # pylint: disable=no-member
+            photoobj_fields=["ra", "dec"] + SDSS_MAG_COLS + SDSS_MAGERR_COLS,
+        ),
     )
 
     if cat is None:
@@ -10,6 +10,7 @@ from astroquery.gaia import Gaia
 from astroquery.irsa import Irsa
 
 from galsynthspec.datamodels.photometry import Photometry
+from galsynthspec.utils.archive import get_cone_request, query_archive
 
 # Silence astroquery verbiage
 logging.getLogger("astroquery").setLevel(logging.WARNING)
@@ -42,10 +43,16 @@ def download_twomass_extended(
 
     all_filters = []
 
-    extended_matches = Irsa.query_region(
-        src_position,
-        catalog="ext_src_cat",
-        radius=radius_arcsec * u.arcsec,  # pylint: disable=no-member
+    extended_matches = query_archive(
+        "irsa",
+        get_cone_request(
+            "Irsa.query_region", src_position, radius_arcsec, catalog="ext_src_cat"
+        ),
+        lambda: Irsa.query_region(
+            src_position,
+            catalog="ext_src_cat",
+            radius=radius_arcsec * u.arcsec,  # pylint: disable=no-member
+        ),
     )
 
     if len(extended_matches) == 0:
@@ -107,9 +114,13 @@ def download_twomass_ps(
         f";"
     )
 
-    job = Gaia.launch_job_async(cmd, dump_to_file=False)
-
-    src_list = job.get_results()
+    src_list = query_archive(
+        "gaia",
+        get_cone_request(
+            "Gaia.launch_job_async", src_position, radius_arcsec, query=cmd
+        ),
+        lambda: Gaia.launch_job_async(cmd, dump_to_file=False).get_results(),
+    )
 
     if len(src_list) == 0:
         logger.info("No 2MASS data found")
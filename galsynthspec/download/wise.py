@@ -10,6 +10,7 @@ from astropy.coordinates import SkyCoord
 from astroquery.ipac.irsa import Irsa
 
 from galsynthspec.datamodels.photometry import Photometry
+from galsynthspec.utils.archive import get_cone_request, query_archive
 
 logger = logging.getLogger(__name__)
 
@@ -41,10 +42,16 @@ def download_wise_data(
 
     all_filters = []
 
-    allwise = Irsa.query_region(
-        src_position,
-        catalog="allwise_p3as_psd",
-        radius=radius_arcsec * u.arcsec,  # pylint: disable=no-member
+    allwise = query_archive(
+        "irsa",
+        get_cone_request(
+            "Irsa.query_region", src_position, radius_arcsec, catalog="allwise_p3as_psd"
+        ),
+        lambda: Irsa.query_region(
+            src_position,
+            catalog="allwise_p3as_psd",
+            radius=radius_arcsec * u.arcsec,  # pylint: disable=no-member
+        ),
     )
 
     if len(allwise) == 0:
@@ -3,4 +3,4 @@ Module for prospector models
 """
 
 from galsynthspec.model.configure import get_model
-from galsynthspec.model.sps import get_sps
+from galsynthspec.model.sps import get_sps, keep_sps_warm
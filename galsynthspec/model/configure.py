@@ -2,10 +2,47 @@
 Module for generating base prospector model
 """
 
+import numpy as np
 from prospect.models import SpecModel
 from prospect.models.priors import LogUniform, Uniform
 from prospect.models.templates import TemplateLibrary
 
+from galsynthspec.utils.projection import project_maggies
+
+
+class ProjectedSpecModel(SpecModel):
+    """
+    SpecModel which projects the model spectrum onto the filters with cached
+    projection weights, rather than integrating each filter curve on every call
+    """
+
+    def predict_phot(self, filters):
+        """
+        Generate a prediction for the observed photometry, in maggies
+
+        :param filters: List of sedpy filters, or None if there is no photometry
+        :return: Array of maggies with shape (len(filters),), or 0.0
+        """
+        if filters is None or hasattr(filters, "get_sed_maggies"):
+            return super().predict_phot(filters)
+
+        phot = np.atleast_1d(
+            project_maggies(
+                self._norm_spec,
+                self._wave,
+                float(np.squeeze(self._zred)),
+                [f.name for f in filters],
+                # A free redshift changes on every call, so caching a
+                # matrix per redshift would only churn the cache
+                cache="zred" not in self.free_params,
+            )
+        )
+
+        if self._want_lines & self._need_lines:
+            phot += self.nebline_photometry(filters)
+
+        return phot
+
 
 def get_model(redshift: float | None = None) -> SpecModel:
     """
@@ -31,5 +68,5 @@ def get_model(redshift: float | None = None) -> SpecModel:
     model_params["logzsol"]["prior"] = Uniform(mini=-1.8, maxi=0.2)
     model_params["dust2"]["prior"] = Uniform(mini=0.0, maxi=1.0)
 
-    model = SpecModel(model_params)
+    model = ProjectedSpecModel(model_params)
     return model
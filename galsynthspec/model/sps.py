@@ -4,6 +4,11 @@ Model
 
 from prospect.sources import CSPSpecBasis
 
+from galsynthspec.utils.instrumentation import track_stage
+
+# SPS model kept warm by a long-running worker, and reused by get_sps
+_warm_sps: CSPSpecBasis | None = None
+
 
 def get_sps() -> CSPSpecBasis:
     """
@@ -11,5 +16,22 @@ def get_sps() -> CSPSpecBasis:
 
     :return: Stellar population synthesis model
     """
+    if _warm_sps is not None:
+        return _warm_sps
+
+    with track_stage("sps_init"):
+        sps = CSPSpecBasis(zcontinuous=1)
+    return sps
+
+
+def keep_sps_warm() -> CSPSpecBasis:
+    """
+    Build the stellar population synthesis model once, and reuse it for every
+    later call to get_sps in this process
 
-    return CSPSpecBasis(zcontinuous=1)
+    :return: Stellar population synthesis model
+    """
+    global _warm_sps  # pylint: disable=global-statement
+    if _warm_sps is None:
+        _warm_sps = get_sps()
+    return _warm_sps
@@ -7,53 +7,200 @@ from pathlib import Path
 
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
 from prospect.plotting import corner
 
-from galsynthspec.datamodels.fitresult import FitResult, weighted_quantiles
+from galsynthspec.datamodels.fitresult import FitResult
+from galsynthspec.utils.instrumentation import track_stage
+from galsynthspec.utils.io import atomic_write
+from galsynthspec.utils.summary import (
+    SUMMARY_QUANTILES,
+    export_fit_summary,
+    get_summary_labels,
+    get_summary_quantiles,
+    get_summary_values,
+)
 
 logger = logging.getLogger(__name__)
 
+# Quantiles setting the range of each parameter in the fast corner plot
+RANGE_QUANTILES = [0.001, 0.999]
 
-def plot_corner(res: FitResult, out_path: Path):
+FAST_CORNER_BINS = 30
+
+
+def get_bin_indices(
+    values: np.ndarray, ranges: np.ndarray, n_bins: int
+) -> tuple[np.ndarray, np.ndarray]:
     """
-    Plot the corner plot of the chain
+    Get the histogram bin of every value, for each column
 
-    :param res: The result of the fitting
-    :param out_path: The output of the sampling
+    :param values: 2D array of values, with one column per parameter
+    :param ranges: Array of (lower, upper) limits for each column
+    :param n_bins: Number of bins for each column
+    :return: Array of bin indices, and mask of values inside the range
+    """
+    lower, upper = ranges[:, 0], ranges[:, 1]
+    width = np.where(upper > lower, upper - lower, 1.0) / n_bins
+    inside = (values >= lower) & (values <= upper)
+    idx = np.clip(np.floor((values - lower) / width), 0, n_bins - 1).astype(np.intp)
+    return idx, inside
+
+
+def get_weighted_histograms(
+    values: np.ndarray, weights: np.ndarray, ranges: np.ndarray, n_bins: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Calculate the weighted 1D histogram of every column, and the weighted 2D
+    histogram of every pair of columns, in a single pass over the chain
+
+    :param values: 2D array of values, with one column per parameter
+    :param weights: Weights for each row of values
+    :param ranges: Array of (lower, upper) limits for each column
+    :param n_bins: Number of bins along each axis
+    :return: 1D histograms with shape (ndim, n_bins), and 2D histograms with
+        shape (ndim, ndim, n_bins, n_bins) filled for each pair i > j
+    """
+    ndim = values.shape[1]
+    idx, inside = get_bin_indices(values, ranges, n_bins)
+
+    hist_1d = np.bincount(
+        (np.arange(ndim) * n_bins + idx).ravel(),
+        weights=np.where(inside, weights[:, None], 0.0).ravel(),
+        minlength=ndim * n_bins,
+    ).reshape((ndim, n_bins))
+
+    rows, cols = np.tril_indices(ndim, k=-1)
+    pair_idx = (np.arange(len(rows)) * n_bins + idx[:, rows]) * n_bins + idx[:, cols]
+    pair_weights = np.where(inside[:, rows] & inside[:, cols], weights[:, None], 0.0)
+
+    hist_2d = np.zeros((ndim, ndim, n_bins, n_bins))
+    hist_2d[rows, cols] = np.bincount(
+        pair_idx.ravel(),
+        weights=pair_weights.ravel(),
+        minlength=len(rows) * n_bins**2,
+    ).reshape((len(rows), n_bins, n_bins))
+    return hist_1d, hist_2d
+
+
+def plot_marginal(ax, hist: np.ndarray, edges: np.ndarray, label: str, summary):
+    """
+    Plot the 1D marginal histogram of a parameter, with its summary quantiles
+
+    :param ax: Matplotlib axis
+    :param hist: Weighted histogram of the parameter
+    :param edges: Bin edges of the histogram
+    :param label: Label of the parameter
+    :param summary: Values of the parameter at SUMMARY_QUANTILES
+    :return: None
     """
-    _, ndim = res.chain.shape
-    cfig, axes = plt.subplots(ndim, ndim, figsize=(10, 9))
-    corner.allcorner(
-        res.chain.T,
-        res.fit_parameters,
-        axes,
-        weights=res.weights,
-        color="royalblue",
-        show_titles=True,
+    low, med, high = summary
+    ax.stairs(hist, edges, color="royalblue")
+    for x in summary:
+        ax.axvline(x, color="royalblue", linestyle="--", linewidth=0.8)
+    ax.set_yticks([])
+    ax.set_title(
+        f"{label} = {med:.2f}$^{{+{high - med:.2f}}}_{{-{med - low:.2f}}}$",
+        fontsize="small",
     )
-    plt.savefig(out_path, bbox_inches="tight")
+
+
+def plot_fast_corner(
+    values: np.ndarray,
+    labels: list[str],
+    weights: np.ndarray,
+    quantiles: np.ndarray,
+    out_path: Path,
+):  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    """
+    Plot a corner plot from pre-binned weighted histograms, rasterizing the
+    histograms so the output is small even for long chains
+
+    :param values: 2D array of values, with one column per parameter
+    :param labels: Label of each column
+    :param weights: Weights for each row of values
+    :param quantiles: Quantiles of each column, for SUMMARY_QUANTILES
+        followed by RANGE_QUANTILES
+    :param out_path: Output path, e.g. a .png file
+    :return: None
+    """
+    ranges = quantiles[len(SUMMARY_QUANTILES) :].T
+    hist_1d, hist_2d = get_weighted_histograms(
+        values, weights, ranges, n_bins=FAST_CORNER_BINS
+    )
+    edges = [np.linspace(lower, upper, FAST_CORNER_BINS + 1) for lower, upper in ranges]
+
+    cfig, axes = plt.subplots(len(labels), len(labels), figsize=(10, 9), squeeze=False)
+    for (i, j), ax in np.ndenumerate(axes):
+        if j > i:
+            ax.set_visible(False)
+            continue
+
+        if i == j:
+            plot_marginal(
+                ax,
+                hist_1d[i],
+                edges[i],
+                labels[i],
+                quantiles[: len(SUMMARY_QUANTILES), i],
+            )
+        else:
+            ax.pcolormesh(
+                edges[j], edges[i], hist_2d[i, j], cmap="Blues", rasterized=True
+            )
+            ax.set_ylim(ranges[i])
+            if j == 0:
+                ax.set_ylabel(labels[i])
+            else:
+                ax.set_yticklabels([])
+
+        ax.set_xlim(ranges[j])
+        if i == len(labels) - 1:
+            ax.set_xlabel(labels[j])
+        else:
+            ax.set_xticklabels([])
+
+    with atomic_write(out_path) as tmp_path:
+        plt.savefig(tmp_path, bbox_inches="tight", dpi=150.0)
     plt.close(cfig)
 
-    logger.info(f"Corner plot saved to {out_path}")
 
-    results = []
-    for i, param in enumerate(res.fit_parameters):
+def plot_corner(res: FitResult, out_path: Path, fast: bool = False):
+    """
+    Plot the corner plot of the chain
 
-        logify = param in ["mass"]
+    :param res: The result of the fitting
+    :param out_path: The output of the sampling
+    :param fast: If True, plot pre-binned weighted histograms instead of
+        smoothed contours, which is much faster for long chains.
+        Use a .png out_path for rasterized output.
+    """
+    labels = get_summary_labels(res)
+    quantiles = get_summary_quantiles(res, SUMMARY_QUANTILES + RANGE_QUANTILES)
 
-        vals = res.chain[:, i] if not logify else np.log10(res.chain[:, i])
+    with track_stage("plot_corner"):
+        if fast:
+            plot_fast_corner(
+                get_summary_values(res), labels, res.weights, quantiles, out_path
+            )
+        else:
+            _, ndim = res.chain.shape
+            cfig, axes = plt.subplots(ndim, ndim, figsize=(10, 9))
+            corner.allcorner(
+                res.chain.T,
+                res.fit_parameters,
+                axes,
+                weights=res.weights,
+                color="royalblue",
+                show_titles=True,
+            )
+            with atomic_write(out_path) as tmp_path:
+                plt.savefig(tmp_path, bbox_inches="tight")
+            plt.close(cfig)
 
-        quantiles = weighted_quantiles(vals, res.weights, [0.16, 0.5, 0.84])
-        results.append(
-            {
-                "parameter": param if not logify else f"log10({param})",
-                "median": quantiles[1],
-                "sigma-": quantiles[1] - quantiles[0],
-                "sigma+": quantiles[2] - quantiles[1],
-            }
-        )
+    logger.info(f"Corner plot saved to {out_path}")
 
-    df = pd.DataFrame(results)
-    print(df)
-    df.to_json(out_path.parent / "fit_results.json")
+    export_fit_summary(
+        labels,
+        quantiles[: len(SUMMARY_QUANTILES)],
+        out_path=out_path.parent / "fit_results.json",
+    )
@@ -11,6 +11,11 @@ import pandas as pd
 from scipy import stats
 
 from galsynthspec.datamodels.fitresult import FitResult
+from galsynthspec.datamodels.sed import SEDConfig
+from galsynthspec.utils.instrumentation import track_stage
+from galsynthspec.utils.io import atomic_write
+from galsynthspec.utils.sketch import SEDQuantileSketch
+from galsynthspec.utils.summary import export_synthetic_sed
 
 logger = logging.getLogger(__name__)
 
@@ -18,72 +23,72 @@ logger = logging.getLogger(__name__)
 def generate_sed_plot(
     res: FitResult,
     out_dir: Path,
-) -> pd.DataFrame:
+    sed_config: SEDConfig | None = None,
+) -> pd.DataFrame | SEDQuantileSketch:
     """
     Function to generate a plot of the fitting results
 
     :param res: Result
     :param out_dir: Output path
-    :return: SED DataFrame with the predicted SEDs
+    :param sed_config: SED sampling options, or None for the defaults
+    :return: SED DataFrame with the predicted SEDs,
+        or a quantile sketch of them if sampling in chunks
     """
 
-    obs_wavelengths = res.rest_frame_wavelengths * (1 + res.get_redshift())
+    obs_wavelengths = res.get_sed_wavelengths(sed_config) * (1 + res.get_redshift())
 
-    df = res.sample_sed_from_posterior(n_sample=1000)
+    df = res.sample_seds(sed_config)
 
-    plt.figure()
-    ax = plt.subplot(111)
+    with track_stage("plot_sed"):
+        plt.figure()
+        ax = plt.subplot(111)
 
-    # Plot Median
-    plt.plot(obs_wavelengths, df.quantile(0.5), linestyle="-")
+        # Plot Median
+        plt.plot(obs_wavelengths, df.quantile(0.5), linestyle="-")
 
-    sigmas = np.linspace(0.0, 3.0, 50)
+        sigmas = np.linspace(0.0, 3.0, 50)
 
-    for sigma in sigmas:
-        upper_percentile = stats.norm.cdf(sigma)
-        lower_percentile = 1.0 - upper_percentile
+        for sigma in sigmas:
+            upper_percentile = stats.norm.cdf(sigma)
 
-        plt.fill_between(
-            obs_wavelengths,
-            df.quantile(upper_percentile),
-            df.quantile(lower_percentile),
-            alpha=1.0 / len(sigmas),
-            color="C1",
-        )
+            plt.fill_between(
+                obs_wavelengths,
+                df.quantile(upper_percentile),
+                df.quantile(1.0 - upper_percentile),
+                alpha=1.0 / len(sigmas),
+                color="C1",
+            )
 
-    pwave = np.array([f.wave_effective for f in res.predicted_photometry.filters])
-    # plot the data
+        pwave = np.array([f.wave_effective for f in res.predicted_photometry.filters])
+        # plot the data
 
-    maggies = res.predicted_photometry.maggies
-    mask = maggies > 0.0
+        maggies = res.predicted_photometry.maggies
+        mask = maggies > 0.0
 
-    ax.plot(pwave, maggies, linestyle="", marker="o", color="k")
-    ax.errorbar(
-        pwave,
-        maggies,
-        yerr=res.predicted_photometry.maggies_unc,
-        linestyle="",
-        color="k",
-        zorder=10,
+        ax.plot(pwave, maggies, linestyle="", marker="o", color="k")
+        ax.errorbar(
+            pwave,
+            maggies,
+            yerr=res.predicted_photometry.maggies_unc,
+            linestyle="",
+            color="k",
+            zorder=10,
+        )
+        ax.set_ylabel(r"$f_\nu$ (maggies)")
+        ax.set_xlabel(r"$\lambda$ (AA)")
+        ax.set_xlim(1e3, 5e5)
+        ax.set_ylim(maggies[mask].min() * 0.1, maggies[mask].max() * 5)
+        ax.set_yscale("log")
+        ax.set_xscale("log")
+
+        out_path = out_dir / "sed_plot.pdf"
+        logger.info(f"Saving SED plot to {out_path}")
+        with atomic_write(out_path) as tmp_path:
+            plt.savefig(tmp_path, bbox_inches="tight", dpi=300.0)
+        plt.close()
+
+    export_synthetic_sed(
+        res, df, out_path=out_dir / "synthetic_sed.json", sed_config=sed_config
     )
-    ax.set_ylabel(r"$f_\nu$ (maggies)")
-    ax.set_xlabel(r"$\lambda$ (AA)")
-    ax.set_xlim(1e3, 5e5)
-    ax.set_ylim(maggies[mask].min() * 0.1, maggies[mask].max() * 5)
-    ax.set_yscale("log")
-    ax.set_xscale("log")
-
-    out_path = out_dir / "sed_plot.pdf"
-    logger.info(f"Saving SED plot to {out_path}")
-    plt.savefig(out_path, bbox_inches="tight", dpi=300.0)
-    plt.close()
-
-    new = pd.DataFrame()
-    new["wavelength"] = obs_wavelengths
-    new["flux"] = df.quantile(0.5)
-    new["sigma"] = 0.5 * (df.quantile(0.84) - df.quantile(0.16))
-    sed_path = out_dir / "synthetic_sed.json"
-    logger.info(f"Saving synthetic SED to {sed_path}")
-    new.to_json(sed_path)
 
     return df
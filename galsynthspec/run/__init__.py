@@ -2,4 +2,6 @@
 Core module for running the galaxy synthesis spectrum generation.
 """
 
+from galsynthspec.run.aio import run_many
+from galsynthspec.run.batch import run_batch
 from galsynthspec.run.run import run_on_galaxy
@@ -0,0 +1,247 @@
+"""
+Module for running the pipeline from asyncio code.
+
+`run_many` takes galaxies, or names to resolve, and yields a GalaxyRun for each
+one as soon as it completes, in order of completion. Name resolution and
+photometry downloads are awaited on the event loop, and the CPU-bound fitting
+and analysis are sent to a pool of worker processes, so an asyncio service can
+pipe hosts through the pipeline without blocking and without polling the
+output directories.
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor
+from typing import AsyncIterator, Iterable
+
+import pandas as pd
+from pydantic import BaseModel, ConfigDict, Field
+
+from galsynthspec.datamodels.analysis import AnalysisConfig
+from galsynthspec.datamodels.fitresult import FitResult
+from galsynthspec.datamodels.galaxy import Galaxy
+from galsynthspec.datamodels.report import RunReport
+from galsynthspec.run.config import FitConfig
+from galsynthspec.run.run import run_on_galaxy
+from galsynthspec.run.serve import get_worker_pool
+from galsynthspec.utils.query import query_by_name
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of galaxies downloading photometry at once
+DEFAULT_MAX_DOWNLOADS = 8
+
+
+class GalaxyRun(BaseModel):
+    """
+    Base model for the outcome of the pipeline on one galaxy
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    target: str = Field(description="Name of the galaxy, or the name to resolve")
+    galaxy: Galaxy | None = Field(
+        description="Galaxy, or None if the name could not be resolved", default=None
+    )
+    report: RunReport | None = Field(
+        description="Resource usage of each stage of the run", default=None
+    )
+    summary: pd.DataFrame | None = Field(
+        description="Median and 1 sigma errors of each fit parameter", default=None
+    )
+    result: FitResult | None = Field(
+        description="Result of the fit, if requested", default=None
+    )
+    error: str | None = Field(description="Error of a failed run", default=None)
+    download_seconds: float = Field(
+        description="Time spent resolving the name and downloading photometry",
+        default=0.0,
+    )
+    total_seconds: float = Field(
+        description="Time from the start of the run to its completion", default=0.0
+    )
+
+    @property
+    def ok(self) -> bool:
+        """
+        Check whether the run succeeded
+        """
+        return self.error is None
+
+
+def prepare_galaxy(galaxy: Galaxy | str, use_cache: bool = True) -> Galaxy:
+    """
+    Resolve a name, and download the photometry of a galaxy to its cache
+
+    :param galaxy: Galaxy, or the name of a transient to resolve
+    :param use_cache: Whether to use cached data if available
+    :return: Galaxy
+    """
+    if isinstance(galaxy, str):
+        galaxy = query_by_name(galaxy, use_cache=use_cache)
+    # Without the cache, the worker downloads the photometry again anyway
+    if use_cache and not galaxy.photometry_cache_file.is_file():
+        with galaxy.lock():
+            galaxy.get_photometry(use_cache=use_cache)
+    return galaxy
+
+
+def run_prepared_galaxy(
+    galaxy: Galaxy,
+    use_cache: bool,
+    analysis_config: AnalysisConfig,
+    fit_config: FitConfig,
+) -> RunReport:
+    """
+    Fit and analyse a galaxy in a worker process
+
+    :param galaxy: Galaxy, with its photometry cached
+    :param use_cache: Whether to use cached results if available
+    :param analysis_config: Options for the analysis
+    :param fit_config: Options for the fit
+    :return: RunReport
+    """
+    return run_on_galaxy(
+        galaxy,
+        use_cache=use_cache,
+        analysis_config=analysis_config,
+        fit_config=fit_config,
+    )
+
+
+def load_run_outputs(
+    galaxy: Galaxy, analysis_config: AnalysisConfig, load_results: bool
+) -> tuple[pd.DataFrame | None, FitResult | None]:
+    """
+    Load the fit summary, and optionally the fit result, of a completed run
+
+    :param galaxy: Galaxy
+    :param analysis_config: Options for the analysis
+    :param load_results: Whether to load the fit result
+    :return: Summary DataFrame, and FitResult or None
+    """
+    summary = None
+    if galaxy.fit_results_file.is_file():
+        summary = pd.read_json(galaxy.fit_results_file)
+    result = None
+    if load_results:
+        result = galaxy.load_results(
+            n_resample=analysis_config.n_resample,
+            min_weight=analysis_config.min_weight,
+        )
+    return summary, result
+
+
+async def run_one(  # pylint: disable=too-many-arguments
+    galaxy: Galaxy | str,
+    *,
+    executor: Executor,
+    downloads: asyncio.Semaphore,
+    use_cache: bool = True,
+    analysis_config: AnalysisConfig | None = None,
+    fit_config: FitConfig | None = None,
+    load_results: bool = False,
+) -> GalaxyRun:
+    """
+    Run the pipeline on one galaxy, downloading on the event loop and fitting
+    in the executor. A failure is returned in the GalaxyRun rather than raised.
+
+    :param galaxy: Galaxy, or the name of a transient to resolve
+    :param executor: Executor for the fitting and analysis
+    :param downloads: Semaphore limiting the number of concurrent downloads
+    :param use_cache: Whether to use cached results if available
+    :param analysis_config: Options for the analysis, or None for defaults
+    :param fit_config: Options for the fit, or None for defaults
+    :param load_results: Whether to load the FitResult into the GalaxyRun
+    :return: GalaxyRun
+    """
+    if analysis_config is None:
+        analysis_config = AnalysisConfig()
+    if fit_config is None:
+        fit_config = FitConfig()
+
+    start = time.perf_counter()
+    run = GalaxyRun(target=galaxy if isinstance(galaxy, str) else galaxy.source_name)
+    loop = asyncio.get_running_loop()
+    try:
+        async with downloads:
+            run.galaxy = await asyncio.to_thread(prepare_galaxy, galaxy, use_cache)
+        run.download_seconds = time.perf_counter() - start
+
+        run.report = await loop.run_in_executor(
+            executor,
+            run_prepared_galaxy,
+            run.galaxy,
+            use_cache,
+            analysis_config,
+            fit_config,
+        )
+        run.summary, run.result = await asyncio.to_thread(
+            load_run_outputs, run.galaxy, analysis_config, load_results
+        )
+    except Exception as exc:  # pylint: disable=broad-exception-caught
+        logger.error(f"Pipeline failed for {run.target}: {exc!r}")
+        run.error = repr(exc)
+    run.total_seconds = time.perf_counter() - start
+    return run
+
+
+async def run_many(  # pylint: disable=too-many-arguments
+    galaxies: Iterable[Galaxy | str],
+    *,
+    use_cache: bool = True,
+    analysis_config: AnalysisConfig | None = None,
+    fit_config: FitConfig | None = None,
+    load_results: bool = False,
+    n_workers: int | None = None,
+    max_downloads: int = DEFAULT_MAX_DOWNLOADS,
+    executor: Executor | None = None,
+) -> AsyncIterator[GalaxyRun]:
+    """
+    Run the pipeline on many galaxies, yielding each GalaxyRun as it completes.
+
+    A failure for one galaxy is yielded as a GalaxyRun with an error,
+    and does not stop the others.
+
+    :param galaxies: Galaxies, or names of transients to resolve
+    :param use_cache: Whether to use cached results if available
+    :param analysis_config: Options for the analysis, or None for defaults
+    :param fit_config: Options for the fit, or None for defaults
+    :param load_results: Whether to load the FitResult of each galaxy.
+        This builds the SPS model in the calling process.
+    :param n_workers: Number of worker processes, if no executor is given
+    :param max_downloads: Maximum number of galaxies downloading at once
+    :param executor: Executor for the fitting and analysis. If None, a pool of
+        warm worker processes is started, and stopped once all runs complete.
+    :return: Asynchronous iterator of GalaxyRun
+    """
+    own_executor = executor is None
+    if own_executor:
+        executor = get_worker_pool(n_workers)
+
+    downloads = asyncio.Semaphore(max_downloads)
+    tasks = [
+        asyncio.create_task(
+            run_one(
+                galaxy,
+                executor=executor,
+                downloads=downloads,
+                use_cache=use_cache,
+                analysis_config=analysis_config,
+                fit_config=fit_config,
+                load_results=load_results,
+            )
+        )
+        for galaxy in galaxies
+    ]
+    logger.info(f"Running pipeline on {len(tasks)} galaxies")
+
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+        if own_executor:
+            executor.shutdown(wait=False, cancel_futures=True)
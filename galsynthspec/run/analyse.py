@@ -2,22 +2,91 @@
 This module provides functionality to analyse the results of the fitting process
 """
 
+import pandas as pd
+
+from galsynthspec.datamodels.analysis import AnalysisConfig
 from galsynthspec.datamodels.fitresult import FitResult
 from galsynthspec.datamodels.galaxy import Galaxy
 from galsynthspec.plotting.corner import plot_corner
 from galsynthspec.plotting.sed import generate_sed_plot
 from galsynthspec.utils.predict import get_predicted_photometry
+from galsynthspec.utils.sketch import SEDQuantileSketch
+from galsynthspec.utils.summary import (
+    SUMMARY_QUANTILES,
+    export_fit_summary,
+    export_synthetic_sed,
+    get_summary_labels,
+    get_summary_quantiles,
+)
 
 
-def analyse_results(galaxy: Galaxy, res: FitResult):
+def analyse_results(
+    galaxy: Galaxy, res: FitResult, config: AnalysisConfig | None = None
+):
     """
     Analyse the results of the fitting process and plot the corner plot.
 
     :param galaxy: Galaxy The galaxy object to analyse results for.
     :param res: Result The result of the fitting process.
+    :param config: AnalysisConfig Options for the analysis, or None for defaults.
     :return: None
     """
+    if config is None:
+        config = AnalysisConfig()
+
+    if not config.plots:
+        summarise_results(galaxy, res, config)
+        return
+
+    if config.fast_corner:
+        plot_corner(res=res, out_path=galaxy.corner_path.with_suffix(".png"), fast=True)
+    else:
+        plot_corner(res=res, out_path=galaxy.corner_path)
+    sample_df = generate_sed_plot(
+        res=res, out_dir=galaxy.base_output_dir, sed_config=config.sed
+    )
+    predict_photometry(galaxy, res, sample_df, config)
+
+
+def summarise_results(galaxy: Galaxy, res: FitResult, config: AnalysisConfig):
+    """
+    Write the fit summary, synthetic SED and predicted photometry,
+    without plotting anything.
 
-    plot_corner(res=res, out_path=galaxy.corner_path)
-    sample_df = generate_sed_plot(res=res, out_dir=galaxy.base_output_dir)
-    get_predicted_photometry(galaxy, res, sample_df=sample_df)
+    :param galaxy: Galaxy The galaxy object to analyse results for.
+    :param res: Result The result of the fitting process.
+    :param config: AnalysisConfig Options for the analysis.
+    :return: None
+    """
+    export_fit_summary(
+        get_summary_labels(res),
+        get_summary_quantiles(res, SUMMARY_QUANTILES),
+        out_path=galaxy.fit_results_file,
+    )
+
+    sample_df = res.sample_seds(config.sed)
+    export_synthetic_sed(
+        res, sample_df, out_path=galaxy.synthetic_sed_file, sed_config=config.sed
+    )
+    predict_photometry(galaxy, res, sample_df, config)
+
+
+def predict_photometry(
+    galaxy: Galaxy,
+    res: FitResult,
+    sample_df: pd.DataFrame | SEDQuantileSketch,
+    config: AnalysisConfig,
+):
+    """
+    Predict the synthetic photometry, reusing the sampled SEDs only if they
+    were sampled at the full resolution of the model
+
+    :param galaxy: Galaxy The galaxy object to analyse results for.
+    :param res: Result The result of the fitting process.
+    :param sample_df: Sampled SEDs, or a quantile sketch of them
+    :param config: AnalysisConfig Options for the analysis.
+    :return: None
+    """
+    if not config.sed.is_full_resolution:
+        sample_df = None
+    get_predicted_photometry(galaxy, res, sample_df=sample_df, sed_config=config.sed)
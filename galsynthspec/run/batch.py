@@ -0,0 +1,167 @@
+"""
+Module for running the galaxy synthetic spectra pipeline on a batch of galaxies.
+"""
+
+import logging
+from pathlib import Path
+
+import pandas as pd
+from astropy.coordinates import SkyCoord
+
+from galsynthspec.datamodels.analysis import AnalysisConfig
+from galsynthspec.datamodels.galaxy import DEFAULT_RADIUS_ARCSEC, Galaxy
+from galsynthspec.datamodels.report import BatchReport
+from galsynthspec.paths import data_dir
+from galsynthspec.run.config import FitConfig
+from galsynthspec.run.run import run_on_galaxy
+from galsynthspec.utils.archive import prefetch_snapshots
+from galsynthspec.utils.query import query_by_name
+
+logger = logging.getLogger(__name__)
+
+BATCH_REPORT_NAME = "batch_report.json"
+
+
+def resolve_galaxy(
+    name: str | None = None,
+    ra_deg: float | None = None,
+    dec_deg: float | None = None,
+    redshift: float | None = None,
+    use_cache: bool = True,
+) -> Galaxy:
+    """
+    Get a galaxy from its position, or resolve a name with TNS/SkyPortal
+    if no position is given.
+
+    :param name: Name of the source
+    :param ra_deg: Right ascension in degrees
+    :param dec_deg: Declination in degrees
+    :param redshift: Redshift, used if the resolved source has none
+    :param use_cache: Whether to use cached source information if available
+    :return: Galaxy
+    """
+    if ra_deg is None or dec_deg is None:
+        if name is None:
+            raise ValueError("Either a name or a position must be given")
+        gal = query_by_name(name, use_cache=use_cache)
+        if gal.redshift is None:
+            gal.redshift = redshift
+        return gal
+
+    return Galaxy(source_name=name, ra_deg=ra_deg, dec_deg=dec_deg, redshift=redshift)
+
+
+def load_batch_file(batch_path: Path, failed: list[str] | None = None) -> list[Galaxy]:
+    """
+    Load a batch of galaxies from a CSV file.
+
+    The file must have either a 'name' column, in which case names without
+    positions are resolved with TNS/SkyPortal, or 'ra_deg' and 'dec_deg' columns.
+    An optional 'redshift' column can also be provided.
+    A name which cannot be resolved is logged and skipped,
+    and does not stop the batch.
+
+    :param batch_path: Path to the CSV file
+    :param failed: List to which the names which could not be resolved are appended
+    :return: List of Galaxy objects
+    """
+    failed = [] if failed is None else failed
+
+    df = pd.read_csv(batch_path)
+
+    galaxies = []
+    for row in df.to_dict(orient="records"):
+        name = row.get("name")
+        name = None if pd.isna(name) else str(name)
+        redshift = row.get("redshift")
+        redshift = None if pd.isna(redshift) else float(redshift)
+
+        ra_deg, dec_deg = row.get("ra_deg"), row.get("dec_deg")
+        if pd.isna(ra_deg) or pd.isna(dec_deg):
+            if name is None:
+                raise ValueError(f"Row {row} has neither a name nor a position")
+            ra_deg, dec_deg = None, None
+        try:
+            galaxies.append(resolve_galaxy(name, ra_deg, dec_deg, redshift))
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            logger.error(f"Could not resolve {name}: {exc!r}")
+            failed.append(name)
+
+    logger.info(f"Loaded {len(galaxies)} galaxies from {batch_path}")
+    return galaxies
+
+
+def run_batch(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    galaxies: list[Galaxy],
+    use_cache: bool = True,
+    report_path: Path | None = None,
+    analysis_config: AnalysisConfig | None = None,
+    fit_config: FitConfig | None = None,
+    failed: list[str] | None = None,
+) -> BatchReport:
+    """
+    Run the galaxy synthetic spectra pipeline on a batch of galaxies,
+    and aggregate the run reports.
+
+    A failure for one galaxy is logged, and does not stop the batch.
+
+    :param galaxies: List of galaxies to run the pipeline on
+    :param use_cache: bool Whether to use cached results if available.
+    :param report_path: Path for the aggregated report.
+        Defaults to 'batch_report.json' in the data directory.
+    :param analysis_config: AnalysisConfig Options for the analysis,
+        or None for defaults.
+    :param fit_config: FitConfig Options for the fit, or None for defaults.
+    :param failed: Names of galaxies which failed before the batch was run,
+        such as those which could not be resolved by load_batch_file.
+    :return: BatchReport with the aggregated resource usage
+    """
+    if report_path is None:
+        report_path = data_dir / BATCH_REPORT_NAME
+
+    batch_report = BatchReport()
+    for name in [] if failed is None else failed:
+        batch_report.add_failure(name)
+
+    # Cone searches for all galaxies without cached photometry are answered
+    # at once from any catalogue snapshots
+    to_download = [
+        galaxy
+        for galaxy in galaxies
+        if not (use_cache and galaxy.photometry_cache_file.is_file())
+    ]
+    prefetch_snapshots(
+        SkyCoord(
+            [galaxy.ra_deg for galaxy in to_download],
+            [galaxy.dec_deg for galaxy in to_download],
+            unit="deg",
+        ),
+        DEFAULT_RADIUS_ARCSEC,
+    )
+
+    for i, galaxy in enumerate(galaxies):
+        logger.info(f"Running galaxy {i + 1}/{len(galaxies)}: {galaxy.source_name}")
+        try:
+            report = run_on_galaxy(
+                galaxy,
+                use_cache=use_cache,
+                analysis_config=analysis_config,
+                fit_config=fit_config,
+            )
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            logger.error(f"Pipeline failed for {galaxy.source_name}: {exc}")
+            batch_report.add_failure(galaxy.source_name)
+            continue
+        batch_report.add(report)
+
+    if batch_report.degraded:
+        logger.warning(
+            f"Some surveys were skipped for {len(batch_report.degraded)} galaxies, "
+            f"because their archives were unavailable: {batch_report.degraded}"
+        )
+
+    logger.info(f"Saving batch report to {report_path}")
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    batch_report.to_json(report_path)
+
+    return batch_report
@@ -0,0 +1,40 @@
+"""
+Base Model for the options used to run a fit
+"""
+
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+from galsynthspec.datamodels.output import OutputConfig
+from galsynthspec.run.samplers import DEFAULT_SAMPLER, SAMPLER_BACKENDS
+
+DEFAULT_MIN_ESS = 200.0
+
+SamplerName = Literal[tuple(SAMPLER_BACKENDS)]
+
+
+class FitConfig(BaseModel):
+    """
+    Base model for the options used to run a new fit,
+    or to update an existing one
+    """
+
+    sampler: SamplerName = Field(
+        description="Sampler backend used for a new fit", default=DEFAULT_SAMPLER
+    )
+    output: OutputConfig = Field(
+        description="Options for compressing the HDF5 output of a new fit",
+        default_factory=OutputConfig,
+    )
+    reweight: bool = Field(
+        description="Update an existing fit to the current photometry by "
+        "importance reweighting its posterior, refitting only if the effective "
+        "sample size falls below min_ess",
+        default=False,
+    )
+    min_ess: float = Field(
+        description="Minimum effective sample size of a reweighted posterior",
+        default=DEFAULT_MIN_ESS,
+        gt=0.0,
+    )
@@ -2,98 +2,256 @@
 Module to actually run galaxy synthesis and spectral synthesis.
 """
 
+import json
 import logging
+from pathlib import Path
 
+import h5py
 import numpy as np
-from prospect.fitting import fit_model, lnprobfn
+from prospect.fitting import lnprobfn
 from prospect.io import write_results as writer
+from prospect.models import SpecModel
 from prospect.utils.obsutils import fix_obs
 
-from galsynthspec.datamodels.fitresult import FitResult
+from galsynthspec.datamodels.fitresult import BestFit, FitResult
 from galsynthspec.datamodels.galaxy import Galaxy
+from galsynthspec.datamodels.output import OutputConfig
 from galsynthspec.model import get_model, get_sps
+from galsynthspec.run.config import FitConfig
+from galsynthspec.run.samplers import DEFAULT_SAMPLER, get_sampler_backend
+from galsynthspec.utils.hdf5 import write_group
+from galsynthspec.utils.instrumentation import CallCounter, track_stage
+from galsynthspec.utils.io import atomic_write
+from galsynthspec.utils.progress import ProgressWriter
 
 logger = logging.getLogger(__name__)
 
 
-def fit_galaxy(galaxy: Galaxy, use_cache: bool = True):
+def fit_galaxy(
+    galaxy: Galaxy,
+    use_cache: bool = True,
+    n_resample: int | None = None,
+    min_weight: float | None = None,
+    fit_config: FitConfig | None = None,
+) -> FitResult:
     """
     Fit a galaxy model to the photometry data of a given galaxy.
 
+    The results are written to the MCMC cache file, and returned directly
+    without reading the file back. The progress of the sampler is written
+    to the progress file in the galaxy output directory.
+
     :param galaxy: Galaxy The galaxy object containing the photometry data.
     :param use_cache: Bool If True, use cached results if available.
-    :return: None
+    :param n_resample: int If set, resample the posterior to this many
+                        equally-weighted samples.
+    :param min_weight: float If set, drop posterior samples with a weight
+                        below this fraction of the maximum weight.
+    :param fit_config: FitConfig Options for the fit, or None for defaults.
+    :return: Result The result of the fitting process.
     """
+    if fit_config is None:
+        fit_config = FitConfig()
 
-    photometry_list = galaxy.get_photometry(use_cache=use_cache)
+    sampler = get_sampler_backend(fit_config.sampler)
 
-    filters = [p.filter for p in photometry_list]
-    maggies = np.array([p.maggies for p in photometry_list])
+    obs = fix_obs(
+        galaxy.get_photometry_set(use_cache=use_cache).to_obs(redshift=galaxy.redshift)
+    )
 
-    magerr = np.array([p.mag_err_combined for p in photometry_list])
+    model = get_model(redshift=galaxy.redshift)
 
-    obs = {
-        "wavelength": None,
-        "spectrum": None,
-        "unc": None,
-        "redshift": galaxy.redshift,
-        "maggies": maggies,
-        "maggies_unc": magerr * maggies / 1.086,
-        "filters": filters,
-    }
+    sps = get_sps()
 
-    obs = fix_obs(obs)
+    counted_lnprobfn = CallCounter(lnprobfn)
 
-    model = get_model(redshift=galaxy.redshift)
+    logger.info(f"Sampling with {sampler.name}")
+    with track_stage("sampling") as stage:
+        sampler_output, tsample = sampler.run(
+            obs,
+            model,
+            sps,
+            counted_lnprobfn,
+            progress=ProgressWriter(
+                galaxy.progress_file,
+                sampler=sampler.name,
+                source_name=galaxy.source_name,
+            ),
+        )
+        stage.n_likelihood_calls = counted_lnprobfn.n_calls
 
-    noise_model = (None, None)
+    res = FitResult.from_sampler_output(
+        galaxy.mcmc_cache_file,
+        sampler_output,
+        model=model,
+        obs=obs,
+        sps=sps,
+        n_resample=n_resample,
+        min_weight=min_weight,
+        sampler_name=sampler.name,
+    )
 
-    sps = get_sps()
+    with track_stage("write_hdf5"), atomic_write(galaxy.mcmc_cache_file) as tmp_path:
+        write_fit_hdf5(
+            tmp_path,
+            model,
+            obs,
+            sampler_output,
+            best_fit=res.best_fit,
+            tsample=tsample,
+            output_config=fit_config.output,
+            sampler_name=sampler.name,
+        )
 
-    fitting_kwargs = {
-        "nlive_init": 1000,
-        "nested_method": "rwalk",
-        "nested_target_n_effective": 1000,
-        "nested_dlogz_init": 0.05,
+    logger.info(
+        f"Prospector run complete for {galaxy.source_name} in {tsample:.1f} seconds"
+    )
+
+    return res
+
+
+def get_sampling_datasets(model: SpecModel, sampler_output: dict) -> dict:
+    """
+    Get the sampling datasets written by prospector for a dynesty run.
+
+    :param model: SpecModel The model used for fitting.
+    :param sampler_output: dict The dynesty results dictionary.
+    :return: dict The datasets of the sampling group.
+    """
+    return {
+        "chain": sampler_output["samples"],
+        "weights": np.exp(sampler_output["logwt"] - sampler_output["logz"][-1]),
+        "logvol": sampler_output["logvol"],
+        "logz": np.atleast_1d(sampler_output["logz"]),
+        "logzerr": np.atleast_1d(sampler_output["logzerr"]),
+        "information": np.atleast_1d(sampler_output["information"]),
+        "lnlikelihood": sampler_output["logl"],
+        "lnprobability": sampler_output["logl"]
+        + model.prior_product(sampler_output["samples"]),
+        "efficiency": np.atleast_1d(sampler_output["eff"]),
+        "niter": np.atleast_1d(sampler_output["niter"]),
+        "samples_id": np.atleast_1d(sampler_output["samples_id"]),
     }
 
-    output = fit_model(
-        obs,
-        model,
-        sps,
-        optimize=False,
-        dynesty=True,
-        lnprobfn=lnprobfn,
-        noise=noise_model,
-        **fitting_kwargs,
-    )
-    _, duration = output["sampling"]
 
-    galaxy.mcmc_cache_file.unlink(missing_ok=True)
+def write_fit_hdf5(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    file_path: Path,
+    model: SpecModel,
+    obs: dict,
+    sampler_output: dict,
+    best_fit: BestFit,
+    tsample: float,
+    output_config: OutputConfig | None = None,
+    sampler_name: str = DEFAULT_SAMPLER,
+):
+    """
+    Write the sampler output and best fit to an HDF5 file, in the prospector layout.
+
+    The best fit is already computed, so it is written directly rather than
+    being recomputed by prospector. If compression is enabled, the sampling
+    datasets are written chunked and compressed in place of the plain
+    datasets written by prospector, with the same names and attributes.
+
+    :param file_path: Path The path of the HDF5 file to write.
+    :param model: SpecModel The model used for fitting.
+    :param obs: dict The observation data.
+    :param sampler_output: dict The dynesty results dictionary.
+    :param best_fit: BestFit The best fit model.
+    :param tsample: float The sampling duration in seconds.
+    :param output_config: OutputConfig Options for compressing the output,
+                        or None to write the uncompressed layout.
+    :param sampler_name: str The name of the sampler backend, stored as
+                        an attribute of the sampling group.
+    :return: None
+    """
+    if output_config is None:
+        output_config = OutputConfig()
+
+    compressed = output_config.compression is not None
+
+    # write_hdf5 closes the file handle once it is done.
+    # With no sampler, it only creates an empty sampling group
     writer.write_hdf5(
-        str(galaxy.mcmc_cache_file),
+        h5py.File(file_path, "w"),
         {},
         model,
         obs,
-        output["sampling"][0],
+        None if compressed else sampler_output,
         None,
-        sps=sps,
-        tsample=output["sampling"][1],
+        sps=None,
+        tsample=tsample,
         toptimize=0.0,
     )
 
-    logger.info(
-        f"Prospector run complete for {galaxy.source_name} in {duration:.1f} seconds"
+    with h5py.File(file_path, "a") as hf:
+        if compressed:
+            write_group(
+                hf,
+                "sampling",
+                get_sampling_datasets(model, sampler_output),
+                attrs={
+                    "ncall": np.asarray(sampler_output["ncall"]).tolist(),
+                    "theta_labels": list(model.theta_labels()),
+                    "sampling_duration": tsample,
+                },
+                config=output_config,
+            )
+        hf["sampling"].attrs["sampler"] = json.dumps(sampler_name)
+
+        write_best_fit(hf, best_fit, output_config=output_config)
+
+
+def write_best_fit(
+    hf: h5py.File, best_fit: BestFit, output_config: OutputConfig | None = None
+):
+    """
+    Write the best fit group to an open HDF5 file, replacing any existing one.
+
+    :param hf: h5py.File The open HDF5 file.
+    :param best_fit: BestFit The best fit model.
+    :param output_config: OutputConfig Options for compressing the output,
+                        or None to write it uncompressed.
+    :return: None
+    """
+    if output_config is None:
+        output_config = OutputConfig()
+
+    if "bestfit" in hf:
+        del hf["bestfit"]
+
+    spectrum_dtype = "float32" if output_config.float32_spectrum else "float64"
+    write_group(
+        hf,
+        "bestfit",
+        {
+            "spectrum": best_fit.spectrum.astype(spectrum_dtype),
+            "photometry": best_fit.photometry,
+            "parameter": best_fit.parameter,
+            "restframe_wavelengths": best_fit.restframe_wavelengths,
+        },
+        attrs={"mfrac": best_fit.mfrac},
+        config=output_config,
     )
 
 
-def get_galaxy_results(galaxy: Galaxy, use_cache: bool = True) -> FitResult:
+def get_galaxy_results(
+    galaxy: Galaxy,
+    use_cache: bool = True,
+    n_resample: int | None = None,
+    min_weight: float | None = None,
+    fit_config: FitConfig | None = None,
+) -> FitResult:
     """
     Generate synthetic spectra for a given galaxy.
 
     :param galaxy: Galaxy The galaxy object to generate spectra for.
     :param use_cache: bool Whether to refit the model even if a cache file exists.
                         Defaults to False.
+    :param n_resample: int If set, resample the posterior to this many
+                        equally-weighted samples.
+    :param min_weight: float If set, drop posterior samples with a weight
+                        below this fraction of the maximum weight.
+    :param fit_config: FitConfig Options for a new fit, or None for defaults.
     :return: Result The result of the fitting process,
                 including the model and observations.
     """
@@ -101,7 +259,12 @@ def get_galaxy_results(galaxy: Galaxy, use_cache: bool = True) -> FitResult:
 
     if hfile.exists() & use_cache:
         logger.info(f"Cache file {hfile} already exists, skipping fitting.")
-    else:
-        fit_galaxy(galaxy, use_cache=use_cache)
+        return galaxy.load_results(n_resample=n_resample, min_weight=min_weight)
 
-    return galaxy.load_results()
+    return fit_galaxy(
+        galaxy,
+        use_cache=use_cache,
+        n_resample=n_resample,
+        min_weight=min_weight,
+        fit_config=fit_config,
+    )
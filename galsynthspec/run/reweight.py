@@ -0,0 +1,310 @@
+"""
+Module to update an existing fit when the photometry changes, by importance
+reweighting the posterior rather than sampling it again.
+
+The model photometry of each posterior sample is computed once and stored
+in the fit file, so that later updates only re-evaluate the photometric
+likelihood. If the effective sample size of the reweighted posterior
+collapses, the galaxy is refit instead.
+"""
+
+import json
+import logging
+import shutil
+
+import h5py
+import numpy as np
+from prospect.io.write_results import write_obs_to_h5
+from prospect.models import SpecModel
+from prospect.sources import CSPSpecBasis
+from prospect.utils.obsutils import fix_obs
+
+from galsynthspec.datamodels.fitresult import BestFit, FitResult, get_burn_in
+from galsynthspec.datamodels.galaxy import Galaxy
+from galsynthspec.datamodels.photometry import get_filter
+from galsynthspec.model import get_model, get_sps
+from galsynthspec.run.config import DEFAULT_MIN_ESS, FitConfig
+from galsynthspec.run.fit import fit_galaxy, write_best_fit
+from galsynthspec.utils.hdf5 import read_fit_hdf5, write_group
+from galsynthspec.utils.instrumentation import track_stage
+from galsynthspec.utils.io import atomic_write
+from galsynthspec.utils.progress import get_effective_sample_size
+
+logger = logging.getLogger(__name__)
+
+# Samples with a weight below this fraction of the maximum are not re-evaluated
+REWEIGHT_MIN_WEIGHT = 1.0e-8
+
+
+def get_model_photometry(
+    model: SpecModel,
+    sps: CSPSpecBasis,
+    obs: dict,
+    thetas: np.ndarray,
+    filternames: list[str],
+) -> np.ndarray:
+    """
+    Predict the model photometry of each posterior sample in a set of filters
+
+    :param model: Model used for fitting
+    :param sps: SPS model
+    :param obs: Observation data
+    :param thetas: Posterior samples
+    :param filternames: Names of the filters
+    :return: Array of maggies with shape (n_sample, n_filters)
+    """
+    logger.info(
+        f"Predicting photometry of {len(thetas)} samples in {len(filternames)} filters"
+    )
+    obs = {**obs, "filters": [get_filter(name) for name in filternames]}
+    maggies = np.empty((len(thetas), len(filternames)))
+    for i, theta in enumerate(thetas):
+        _, maggies[i], _ = model.predict(theta, obs=obs, sps=sps)
+    return maggies
+
+
+def get_photometry_lnlike(
+    obs: dict, filternames: list[str], model_maggies: np.ndarray
+) -> np.ndarray:
+    """
+    Get the photometric log-likelihood of each sample, up to a constant,
+    in the same way as prospector
+
+    :param obs: Observation data, with maggies, maggies_unc, phot_mask and filternames
+    :param filternames: Names of the filters of the model photometry
+    :param model_maggies: Model photometry with shape (n_sample, n_filters)
+    :return: Log-likelihood of each sample
+    """
+    columns = [filternames.index(name) for name in obs["filternames"]]
+    mask = np.asarray(obs["phot_mask"], dtype=bool)
+    delta = (np.asarray(obs["maggies"]) - model_maggies[:, columns])[:, mask]
+    return -0.5 * np.sum((delta / np.asarray(obs["maggies_unc"])[mask]) ** 2, axis=1)
+
+
+def is_compatible(stored: dict | None, filternames: list[str]) -> bool:
+    """
+    Check whether stored model photometry covers the filters needed
+
+    :param stored: Stored model_photometry group, or None
+    :param filternames: Names of the filters needed
+    :return: Whether the stored rows can be reused
+    """
+    return stored is not None and set(filternames).issubset(stored["filternames"])
+
+
+def get_cached_model_photometry(
+    stored: dict | None, index: np.ndarray, filternames: list[str]
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Look up the stored model photometry of each sample by its chain index
+
+    :param stored: Stored model_photometry group, or None
+    :param index: Indices of the samples in the chain
+    :param filternames: Names of the filters needed
+    :return: Model photometry in the order of filternames, with NaN for
+        samples which are not stored, and whether each sample was found
+    """
+    maggies = np.full((len(index), len(filternames)), np.nan)
+    found = np.zeros(len(index), dtype=bool)
+    if not is_compatible(stored, filternames) or len(stored["index"]) == 0:
+        return maggies, found
+
+    order = np.argsort(stored["index"])
+    stored_index = stored["index"][order]
+    pos = np.minimum(np.searchsorted(stored_index, index), len(stored_index) - 1)
+    found = stored_index[pos] == index
+
+    columns = [stored["filternames"].index(name) for name in filternames]
+    maggies[found] = stored["maggies"][order[pos[found]]][:, columns]
+    return maggies, found
+
+
+def merge_model_photometry(
+    stored: dict | None,
+    index: np.ndarray,
+    filternames: list[str],
+    maggies: np.ndarray,
+) -> dict:
+    """
+    Merge new model photometry with the stored rows of other samples,
+    so that samples dropped by this reweighting are not predicted again
+    if a later one needs them
+
+    :param stored: Stored model_photometry group, or None
+    :param index: Indices of the samples in the chain
+    :param filternames: Names of the filters of maggies
+    :param maggies: Model photometry of the samples
+    :return: Datasets of the model_photometry group, sorted by index
+    """
+    if is_compatible(stored, filternames):
+        extra = ~np.isin(stored["index"], index)
+        columns = [stored["filternames"].index(name) for name in filternames]
+        index = np.concatenate([index, stored["index"][extra]])
+        maggies = np.concatenate([maggies, stored["maggies"][extra][:, columns]])
+
+    order = np.argsort(index)
+    return {"index": index[order], "maggies": maggies[order]}
+
+
+def reweight_galaxy(  # pylint: disable=too-many-locals
+    galaxy: Galaxy,
+    use_cache: bool = True,
+    min_ess: float = DEFAULT_MIN_ESS,
+    n_resample: int | None = None,
+    min_weight: float | None = None,
+) -> FitResult | None:
+    """
+    Reweight the existing fit of a galaxy to its current photometry.
+
+    :param galaxy: Galaxy The galaxy to update.
+    :param use_cache: bool Whether to use the cached photometry.
+    :param min_ess: float Minimum effective sample size of the reweighted posterior.
+    :param n_resample: int If set, resample the posterior to this many
+                        equally-weighted samples.
+    :param min_weight: float If set, drop posterior samples with a weight
+                        below this fraction of the maximum weight.
+    :return: Result The reweighted result, or None if the effective sample
+                size collapsed below min_ess.
+    """
+    out = read_fit_hdf5(
+        galaxy.mcmc_cache_file,
+        {
+            "sampling": ["chain", "weights", "lnlikelihood", "lnprobability"],
+            "obs": None,
+            "model_photometry": None,
+        },
+    )
+    sampling = out["sampling"]
+    new_obs = fix_obs(
+        galaxy.get_photometry_set(use_cache=use_cache).to_obs(redshift=galaxy.redshift)
+    )
+    filternames = list(
+        dict.fromkeys(list(out["obs"]["filternames"]) + new_obs["filternames"])
+    )
+
+    weights = sampling["weights"]
+    index = np.flatnonzero(weights >= REWEIGHT_MIN_WEIGHT * weights.max())
+
+    model = get_model(redshift=galaxy.redshift)
+    sps = get_sps()
+
+    stored = out.get("model_photometry")
+    model_maggies, found = get_cached_model_photometry(stored, index, filternames)
+    if not np.all(found):
+        with track_stage("model_photometry"):
+            model_maggies[~found] = get_model_photometry(
+                model, sps, new_obs, sampling["chain"][index[~found]], filternames
+            )
+
+    delta = get_photometry_lnlike(
+        new_obs, filternames, model_maggies
+    ) - get_photometry_lnlike(out["obs"], filternames, model_maggies)
+
+    log_weights = np.log(weights[index]) + delta
+    ess = get_effective_sample_size(log_weights)
+    logger.info(
+        f"Reweighted posterior of {galaxy.source_name} has ESS {ess:.0f}, "
+        f"compared to {get_effective_sample_size(np.log(weights[index])):.0f} before"
+    )
+    if ess < min_ess:
+        logger.warning(
+            f"Effective sample size {ess:.0f} is below {min_ess:.0f} after reweighting"
+        )
+        return None
+
+    new_weights = np.zeros_like(weights)
+    new_weights[index] = np.exp(log_weights - log_weights.max())
+    new_weights /= new_weights.sum()
+    sampling["lnlikelihood"][index] += delta
+    sampling["lnprobability"][index] += delta
+
+    best_fit = BestFit.from_parameter(
+        sampling["chain"][index[np.argmax(sampling["lnprobability"][index])]],
+        model,
+        new_obs,
+        sps,
+    )
+
+    with track_stage("write_hdf5"), atomic_write(galaxy.mcmc_cache_file) as tmp_path:
+        shutil.copyfile(galaxy.mcmc_cache_file, tmp_path)
+        with h5py.File(tmp_path, "a") as hf:
+            for key, value in [
+                ("weights", new_weights),
+                ("lnlikelihood", sampling["lnlikelihood"]),
+                ("lnprobability", sampling["lnprobability"]),
+            ]:
+                hf["sampling"][key][...] = value
+            hf["sampling"].attrs["reweighted_ess"] = json.dumps(ess)
+
+            del hf["obs"]
+            write_obs_to_h5(hf, new_obs)
+
+            if "model_photometry" in hf:
+                del hf["model_photometry"]
+            write_group(
+                hf,
+                "model_photometry",
+                merge_model_photometry(stored, index, filternames, model_maggies),
+                attrs={"filternames": filternames},
+            )
+            write_best_fit(hf, best_fit)
+
+    return FitResult.from_samples(
+        galaxy.mcmc_cache_file,
+        fit_parameters=list(model.theta_labels()),
+        chain=sampling["chain"],
+        weights=new_weights,
+        obs=new_obs,
+        best_fit=best_fit,
+        model=model,
+        sps=sps,
+        n_resample=n_resample,
+        min_weight=min_weight,
+        burn_in=get_burn_in(sampling.get("sampler")),
+    )
+
+
+def get_reweighted_results(
+    galaxy: Galaxy,
+    use_cache: bool = True,
+    n_resample: int | None = None,
+    min_weight: float | None = None,
+    fit_config: FitConfig | None = None,
+) -> FitResult:
+    """
+    Update the existing fit of a galaxy to its current photometry by reweighting,
+    and refit the galaxy if the effective sample size collapses.
+
+    :param galaxy: Galaxy The galaxy to update.
+    :param use_cache: bool Whether to use the cached photometry.
+    :param n_resample: int If set, resample the posterior to this many
+                        equally-weighted samples.
+    :param min_weight: float If set, drop posterior samples with a weight
+                        below this fraction of the maximum weight.
+    :param fit_config: FitConfig Options for the reweighting and for a refit,
+                        or None for defaults.
+    :return: Result The updated result.
+    """
+    if fit_config is None:
+        fit_config = FitConfig()
+
+    with track_stage("reweight"):
+        res = reweight_galaxy(
+            galaxy,
+            use_cache=use_cache,
+            min_ess=fit_config.min_ess,
+            n_resample=n_resample,
+            min_weight=min_weight,
+        )
+
+    if res is not None:
+        return res
+
+    logger.info(f"Refitting {galaxy.source_name}")
+    return fit_galaxy(
+        galaxy,
+        use_cache=use_cache,
+        fit_config=fit_config,
+        n_resample=n_resample,
+        min_weight=min_weight,
+    )
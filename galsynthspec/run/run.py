@@ -2,19 +2,111 @@
 Module for running the galaxy synthetic spectra pipeline.
 """
 
+import logging
+
+from galsynthspec.datamodels.analysis import AnalysisConfig
+from galsynthspec.datamodels.fitresult import FitResult
 from galsynthspec.datamodels.galaxy import Galaxy
+from galsynthspec.datamodels.report import RunReport
 from galsynthspec.run.analyse import analyse_results
+from galsynthspec.run.config import FitConfig
 from galsynthspec.run.fit import get_galaxy_results
+from galsynthspec.run.reweight import get_reweighted_results
+from galsynthspec.utils.instrumentation import track_run
+from galsynthspec.utils.profiling import profile_stage
+
+logger = logging.getLogger(__name__)
+
 
+def get_fit_results(
+    galaxy: Galaxy,
+    use_cache: bool,
+    analysis_config: AnalysisConfig,
+    fit_config: FitConfig,
+) -> FitResult:
+    """
+    Get the fit results for a galaxy, reweighting an existing fit to the current
+    photometry if requested, and otherwise loading or running the fit.
 
-def run_on_galaxy(galaxy: Galaxy, use_cache: bool = True):
+    :param galaxy: Galaxy The galaxy object to get results for.
+    :param use_cache: bool Whether to use cached results if available.
+    :param analysis_config: AnalysisConfig Options for the analysis.
+    :param fit_config: FitConfig Options for the fit.
+    :return: Result The result of the fitting process.
+    """
+    fit_kwargs = {
+        "n_resample": analysis_config.n_resample,
+        "min_weight": analysis_config.min_weight,
+        "fit_config": fit_config,
+    }
+
+    if fit_config.reweight and galaxy.mcmc_cache_file.exists():
+        return get_reweighted_results(galaxy, use_cache=use_cache, **fit_kwargs)
+
+    return get_galaxy_results(galaxy, use_cache=use_cache, **fit_kwargs)
+
+
+def run_pipeline(
+    galaxy: Galaxy,
+    use_cache: bool,
+    profile: str | None,
+    analysis_config: AnalysisConfig,
+    fit_config: FitConfig,
+) -> tuple[FitResult, RunReport]:
+    """
+    Run the galaxy synthetic spectra pipeline for a given galaxy,
+    whose lock must already be held by the caller.
+
+    :param galaxy: Galaxy The galaxy object to run the pipeline on.
+    :param use_cache: bool Whether to use cached results if available.
+    :param profile: Stage to profile ('all', 'fit' or 'analyse'),
+        or None to disable profiling.
+    :param analysis_config: AnalysisConfig Options for the analysis.
+    :param fit_config: FitConfig Options for the fit.
+    :return: Result of the fit, and RunReport with the resource usage of each stage.
+    """
+    out_dir = galaxy.base_output_dir
+
+    with track_run(source_name=galaxy.source_name) as report:
+        with profile_stage(out_dir, "all", profile):
+            with profile_stage(out_dir, "fit", profile):
+                res = get_fit_results(galaxy, use_cache, analysis_config, fit_config)
+            with profile_stage(out_dir, "analyse", profile):
+                analyse_results(galaxy, res, config=analysis_config)
+
+        logger.info(f"Saving run report to {galaxy.run_report_file}")
+        report.to_json(galaxy.run_report_file)
+
+    return res, report
+
+
+def run_on_galaxy(
+    galaxy: Galaxy,
+    use_cache: bool = True,
+    profile: str | None = None,
+    analysis_config: AnalysisConfig | None = None,
+    fit_config: FitConfig | None = None,
+) -> RunReport:
     """
     Run the galaxy synthetic spectra pipeline for a given galaxy.
 
     :param galaxy: Galaxy The galaxy object to run the pipeline on.
     :param use_cache: bool Whether to use cached results if available.
-    :return:
+    :param profile: Stage to profile ('all', 'fit' or 'analyse'),
+        or None to disable profiling.
+    :param analysis_config: AnalysisConfig Options for the analysis,
+        or None for defaults.
+    :param fit_config: FitConfig Options for the fit, or None for defaults.
+    :return: RunReport with the resource usage of each stage.
     """
+    if analysis_config is None:
+        analysis_config = AnalysisConfig()
+    if fit_config is None:
+        fit_config = FitConfig()
+
+    with galaxy.lock():
+        _, report = run_pipeline(
+            galaxy, use_cache, profile, analysis_config, fit_config
+        )
 
-    res = get_galaxy_results(galaxy, use_cache=use_cache)
-    analyse_results(galaxy, res)
+    return report
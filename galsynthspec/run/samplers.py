@@ -0,0 +1,319 @@
+"""
+Module with the sampler backends used to fit a galaxy model.
+
+Every backend returns its samples in the layout of the dynesty results
+dictionary, so all backends write the same HDF5 schema and are loaded
+in the same way.
+"""
+
+import logging
+import time
+from typing import Callable
+
+import dynesty
+import emcee
+import numpy as np
+from prospect.fitting.fitting import wrap_lnp
+from prospect.models import SpecModel
+from prospect.sources import CSPSpecBasis
+
+from galsynthspec.utils.progress import ProgressWriter, get_effective_sample_size
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAMPLER = "dynesty"
+
+# The settings prospector applies by default, with a target effective sample size
+DEFAULT_DYNESTY_SAMPLER_KWARGS = {
+    "bound": "multi",
+    "sample": "unif",
+    "walks": 25,
+    "update_interval": 0.6,
+}
+
+DEFAULT_DYNESTY_RUN_KWARGS = {
+    "nlive_init": 100,
+    "dlogz_init": 0.05,
+    "nlive_batch": 100,
+    "wt_kwargs": {"pfrac": 1.0},
+    "n_effective": 1000,
+    "save_bounds": False,
+}
+
+
+class SamplerBackend:  # pylint: disable=too-few-public-methods
+    """
+    Base class for a sampler backend
+    """
+
+    name: str = ""
+
+    def run(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        obs: dict,
+        model: SpecModel,
+        sps: CSPSpecBasis,
+        lnprobfn: Callable,
+        progress: ProgressWriter | None = None,
+    ) -> tuple[dict, float]:
+        """
+        Sample the posterior of the model
+
+        :param obs: Observation data
+        :param model: Model to fit
+        :param sps: SPS model
+        :param lnprobfn: Posterior probability function, with the signature
+            of prospector's lnprobfn
+        :param progress: Writer for the progress of the sampler, or None
+        :return: Results in the layout of the dynesty results dictionary,
+            and the sampling duration in seconds
+        """
+        raise NotImplementedError
+
+
+class DynestyBackend(SamplerBackend):  # pylint: disable=too-few-public-methods
+    """
+    Dynamic nested sampling with dynesty, using the same settings as
+    prospector's fit_model, but reporting progress after every iteration
+    """
+
+    name = "dynesty"
+
+    def __init__(self, sampler_kwargs: dict | None = None, **run_kwargs):
+        """
+        :param sampler_kwargs: Options for the DynamicNestedSampler,
+            overriding DEFAULT_DYNESTY_SAMPLER_KWARGS
+        :param run_kwargs: Options for run_nested,
+            overriding DEFAULT_DYNESTY_RUN_KWARGS
+        """
+        self.sampler_kwargs = {
+            **DEFAULT_DYNESTY_SAMPLER_KWARGS,
+            **({} if sampler_kwargs is None else sampler_kwargs),
+        }
+        self.run_kwargs = {**DEFAULT_DYNESTY_RUN_KWARGS, **run_kwargs}
+
+    def run(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        obs: dict,
+        model: SpecModel,
+        sps: CSPSpecBasis,
+        lnprobfn: Callable,
+        progress: ProgressWriter | None = None,
+    ) -> tuple[dict, float]:
+        start = time.time()
+
+        sampler = dynesty.DynamicNestedSampler(
+            wrap_lnp(lnprobfn, obs, model, sps, noise=(None, None), nested=True),
+            model.prior_transform,
+            model.ndim,
+            **self.sampler_kwargs,
+        )
+
+        def report(results, niter, ncall, stop_val=None, **_):
+            if progress is None or not progress.is_due():
+                return
+            progress.update(
+                niter,
+                ncall,
+                dlogz=float(results.delta_logz) if stop_val is None else None,
+                stop=stop_val,
+                ess=get_effective_sample_size(sampler.results["logwt"]),
+                efficiency=float(results.eff),
+            )
+
+        sampler.run_nested(
+            print_progress=progress is not None,
+            print_func=report,
+            **self.run_kwargs,
+        )
+        results = sampler.results
+
+        if progress is not None:
+            progress.finish(
+                int(results["niter"]),
+                int(np.sum(results["ncall"])),
+                ess=get_effective_sample_size(results["logwt"]),
+                efficiency=float(results["eff"]),
+            )
+
+        return results, time.time() - start
+
+
+class EmceeBackend(SamplerBackend):  # pylint: disable=too-few-public-methods
+    """
+    Ensemble MCMC with emcee, stopped once the chain is much longer than the
+    integrated autocorrelation time, and that estimate has stabilised
+    """
+
+    name = "emcee"
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        *,
+        walker_factor: int = 4,
+        max_iterations: int = 20000,
+        check_interval: int = 100,
+        tau_factor: float = 50.0,
+        tau_tolerance: float = 0.01,
+        seed: int | None = None,
+    ):
+        """
+        :param walker_factor: Number of walkers per free parameter
+        :param max_iterations: Maximum number of iterations
+        :param check_interval: Number of iterations between convergence checks
+        :param tau_factor: Minimum chain length, in autocorrelation times
+        :param tau_tolerance: Maximum fractional change of the autocorrelation
+            time between checks
+        :param seed: Seed for the initial walker positions
+        """
+        self.walker_factor = walker_factor
+        self.max_iterations = max_iterations
+        self.check_interval = check_interval
+        self.tau_factor = tau_factor
+        self.tau_tolerance = tau_tolerance
+        self.seed = seed
+
+    def get_initial_positions(self, model: SpecModel) -> np.ndarray:
+        """
+        Draw the initial walker positions from the prior
+
+        :param model: Model to fit
+        :return: Array with shape (n_walkers, n_dim)
+        """
+        rng = np.random.default_rng(self.seed)
+        n_walkers = max(self.walker_factor * model.ndim, 2 * model.ndim + 2)
+        return np.array(
+            [model.prior_transform(rng.random(model.ndim)) for _ in range(n_walkers)]
+        )
+
+    def is_converged(self, tau: np.ndarray, old_tau: np.ndarray, n_iter: int) -> bool:
+        """
+        Check whether the chain has converged
+
+        :param tau: Current autocorrelation time of each parameter
+        :param old_tau: Autocorrelation time at the previous check
+        :param n_iter: Number of iterations so far
+        :return: Whether the chain has converged
+        """
+        return bool(
+            np.all(np.isfinite(tau))
+            and np.all(tau * self.tau_factor < n_iter)
+            and np.all(np.abs(old_tau - tau) / tau < self.tau_tolerance)
+        )
+
+    def run(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        obs: dict,
+        model: SpecModel,
+        sps: CSPSpecBasis,
+        lnprobfn: Callable,
+        progress: ProgressWriter | None = None,
+    ) -> tuple[dict, float]:
+        start = time.time()
+
+        initial = self.get_initial_positions(model)
+        sampler = emcee.EnsembleSampler(
+            len(initial),
+            model.ndim,
+            lnprobfn,
+            kwargs={"model": model, "obs": obs, "sps": sps, "nested": False},
+        )
+
+        old_tau = np.full(model.ndim, np.inf)
+        for _ in sampler.sample(initial, iterations=self.max_iterations):
+            if progress is not None and progress.is_due():
+                self.report(sampler, progress)
+            if sampler.iteration % self.check_interval:
+                continue
+            tau = sampler.get_autocorr_time(tol=0)
+            if self.is_converged(tau, old_tau, sampler.iteration):
+                logger.info(f"emcee converged after {sampler.iteration} iterations")
+                break
+            old_tau = tau
+        else:
+            logger.warning(
+                f"emcee did not converge in {self.max_iterations} iterations"
+            )
+
+        if progress is not None:
+            self.report(sampler, progress, finished=True)
+
+        return self.to_results(sampler, model), time.time() - start
+
+    @staticmethod
+    def report(
+        sampler: emcee.EnsembleSampler, progress: ProgressWriter, finished: bool = False
+    ):
+        """
+        Write the progress of the sampler, with the effective sample size
+        estimated from the autocorrelation time
+
+        :param sampler: Running emcee sampler
+        :param progress: Writer for the progress
+        :param finished: Whether sampling has finished
+        :return: None
+        """
+        n_walkers = len(sampler.acceptance_fraction)
+        tau = np.nanmax(sampler.get_autocorr_time(tol=0))
+        n_samples = n_walkers * sampler.iteration
+        (progress.finish if finished else progress.update)(
+            sampler.iteration,
+            n_samples,
+            ess=n_samples / tau if np.isfinite(tau) and tau > 0 else None,
+            efficiency=100.0 * float(np.mean(sampler.acceptance_fraction)),
+        )
+
+    @staticmethod
+    def to_results(sampler: emcee.EnsembleSampler, model: SpecModel) -> dict:
+        """
+        Convert the chain to the layout of the dynesty results dictionary,
+        after discarding burn-in and thinning by the autocorrelation time.
+        All samples have equal weight, and there is no evidence estimate.
+
+        :param sampler: Finished emcee sampler
+        :param model: Model used for fitting
+        :return: Dictionary of results
+        """
+        tau = sampler.get_autocorr_time(tol=0)
+        discard = int(2 * np.nanmax(tau))
+        thin = max(1, int(0.5 * np.nanmin(tau)))
+        samples = sampler.get_chain(discard=discard, thin=thin, flat=True)
+        lnprob = sampler.get_log_prob(discard=discard, thin=thin, flat=True)
+        n_samples = len(samples)
+        logger.info(
+            f"Kept {n_samples} emcee samples (burn-in {discard}, thinning {thin})"
+        )
+
+        return {
+            "samples": samples,
+            "logl": lnprob - model.prior_product(samples),
+            "logwt": np.full(n_samples, -np.log(n_samples)),
+            "logz": np.zeros(n_samples),
+            "logzerr": np.zeros(n_samples),
+            "logvol": np.zeros(n_samples),
+            "information": np.zeros(n_samples),
+            "ncall": np.full(n_samples, len(sampler.acceptance_fraction) * thin),
+            "eff": 100.0 * float(np.mean(sampler.acceptance_fraction)),
+            "niter": sampler.iteration,
+            "samples_id": np.arange(n_samples),
+        }
+
+
+SAMPLER_BACKENDS = {
+    DynestyBackend.name: DynestyBackend,
+    EmceeBackend.name: EmceeBackend,
+}
+
+
+def get_sampler_backend(name: str = DEFAULT_SAMPLER) -> SamplerBackend:
+    """
+    Get a sampler backend with its default options
+
+    :param name: Name of the backend
+    :return: SamplerBackend
+    """
+    if name not in SAMPLER_BACKENDS:
+        raise ValueError(
+            f"Unknown sampler '{name}'. Available samplers are {list(SAMPLER_BACKENDS)}"
+        )
+    return SAMPLER_BACKENDS[name]()
@@ -0,0 +1,601 @@
+"""
+Module for a long-running service which fits and analyses galaxies on request.
+
+The service keeps a pool of worker processes, each of which builds the SPS model,
+loads the filters and reads the dust map once when it starts, so requests do
+not pay for the cold start of the CLI. Requests are JSON over HTTP, on localhost
+or on a Unix socket:
+
+- POST /jobs with a ServeRequest queues a job, and returns its status.
+  With "wait": true, the response is sent once the job has finished.
+- GET /jobs/<job_id> returns the status of a job, with its result once done.
+- GET /health returns the number of workers and of jobs in each state.
+"""
+
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import socketserver
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Literal
+
+import numpy as np
+from pydantic import BaseModel, Field, ValidationError, model_validator
+
+from galsynthspec.datamodels.analysis import AnalysisConfig
+from galsynthspec.datamodels.archive import ArchiveConfig
+from galsynthspec.datamodels.fitresult import FitResult
+from galsynthspec.datamodels.galaxy import Galaxy
+from galsynthspec.datamodels.photometry import get_available_filters, get_filter
+from galsynthspec.model import keep_sps_warm
+from galsynthspec.run.config import FitConfig
+from galsynthspec.run.run import get_fit_results, run_pipeline
+from galsynthspec.utils.archive import get_archive_transport, set_archive_config
+from galsynthspec.utils.extinction import warm_dust_map
+from galsynthspec.utils.predict import DEFAULT_FILTER_LIST, get_predicted_photometry
+from galsynthspec.utils.query import query_by_name
+from galsynthspec.utils.summary import (
+    SUMMARY_QUANTILES,
+    get_summary_labels,
+    get_summary_quantiles,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_N_WORKERS = 1
+
+# Number of finished jobs whose results are kept
+MAX_FINISHED_JOBS = 1000
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class ServeRequest(BaseModel):
+    """
+    Base model for a request to the service
+    """
+
+    action: Literal["fit", "analyse", "predict"] = Field(
+        description="Fit the galaxy, run the full pipeline, "
+        "or predict its photometry in a set of filters"
+    )
+    galaxy: Galaxy | None = Field(
+        description="Galaxy to run on, if not given by name", default=None
+    )
+    name: str | None = Field(
+        description="Name of the source, resolved with TNS/SkyPortal", default=None
+    )
+    use_cache: bool = Field(
+        description="Whether to use cached results if available", default=True
+    )
+    analysis: AnalysisConfig = Field(
+        description="Options for the analysis", default_factory=AnalysisConfig
+    )
+    fit: FitConfig = Field(description="Options for the fit", default_factory=FitConfig)
+    filters: list[str] | None = Field(
+        description="Filters to predict photometry for, "
+        "or None for the default list",
+        default=None,
+    )
+    wait: bool = Field(
+        description="Whether to respond only once the job has finished",
+        default=False,
+    )
+
+    @model_validator(mode="after")
+    def validate_target(self):
+        """
+        Validate that exactly one of the galaxy and the name is given
+        """
+        if (self.galaxy is None) == (self.name is None):
+            raise ValueError("Exactly one of 'galaxy' and 'name' must be given")
+        return self
+
+
+class JobStatus(BaseModel):
+    """
+    Base model for the status of a job
+    """
+
+    job_id: str = Field(description="ID of the job")
+    action: str = Field(description="Action of the job")
+    target: str | None = Field(description="Name of the galaxy")
+    status: str = Field(description="One of 'queued', 'running', 'done' or 'failed'")
+    submitted: float = Field(description="Unix time at which the job was submitted")
+    finished: float | None = Field(
+        description="Unix time at which the job finished", default=None
+    )
+    result: dict | None = Field(description="Result of the job", default=None)
+    error: str | None = Field(description="Error of a failed job", default=None)
+
+
+def warm_up_worker(warm: bool = True, archive_config: ArchiveConfig | None = None):
+    """
+    Initialise a worker process, building the SPS model, loading the filters
+    and reading the dust map once
+
+    :param warm: Whether to warm up the worker
+    :param archive_config: Options for archive queries of the parent process,
+        or None to load them from the environment
+    :return: None
+    """
+    if archive_config is not None:
+        set_archive_config(archive_config)
+    if not warm:
+        return
+    start = time.time()
+    keep_sps_warm()
+    get_available_filters()
+    for filter_name in DEFAULT_FILTER_LIST:
+        get_filter(filter_name)
+    warm_dust_map()
+    logger.info(f"Worker {os.getpid()} warmed up in {time.time() - start:.1f} s")
+
+
+def get_worker_pool(n_workers: int, warm: bool = True) -> ProcessPoolExecutor:
+    """
+    Start a pool of worker processes, which share the archive options
+    of this process.
+
+    Workers are spawned rather than forked, because forking a process
+    with running threads can copy locks held by those threads.
+
+    :param n_workers: Number of worker processes
+    :param warm: Whether to warm up each worker when it starts
+    :return: ProcessPoolExecutor
+    """
+    return ProcessPoolExecutor(
+        max_workers=n_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=warm_up_worker,
+        initargs=(warm, get_archive_transport().config),
+    )
+
+
+def get_parameter_summary(res: FitResult) -> dict:
+    """
+    Get the 16th, 50th and 84th percentiles of each fit parameter
+
+    :param res: The result of the fitting
+    :return: Dictionary of percentiles, keyed by parameter label
+    """
+    quantiles = get_summary_quantiles(res, SUMMARY_QUANTILES)
+    return {
+        label: dict(zip(["p16", "p50", "p84"], np.asarray(values, dtype=float)))
+        for label, values in zip(get_summary_labels(res), quantiles.T)
+    }
+
+
+def run_request(request: ServeRequest) -> dict:
+    """
+    Run a request in a worker process
+
+    :param request: Request to run
+    :return: Result of the request
+    """
+    galaxy = request.galaxy
+    if galaxy is None:
+        galaxy = query_by_name(request.name, use_cache=request.use_cache)
+
+    result = {
+        "source_name": galaxy.source_name,
+        "output_dir": str(galaxy.base_output_dir),
+    }
+
+    with galaxy.lock():
+        if request.action == "analyse":
+            res, report = run_pipeline(
+                galaxy, request.use_cache, None, request.analysis, request.fit
+            )
+            result["report"] = report.model_dump(mode="json")
+        else:
+            res = get_fit_results(
+                galaxy, request.use_cache, request.analysis, request.fit
+            )
+        result["parameters"] = get_parameter_summary(res)
+        if request.action == "predict":
+            # The photometry in the requested filters is returned,
+            # without overwriting that of the galaxy
+            phot_df = get_predicted_photometry(
+                galaxy,
+                res,
+                filter_list=request.filters,
+                sed_config=request.analysis.sed,
+                write=False,
+            )
+            result["photometry"] = json.loads(phot_df.to_json(orient="records"))
+    return result
+
+
+class ServeJob:
+    """
+    Job queued on the worker pool
+    """
+
+    def __init__(self, request: ServeRequest, future: Future):
+        """
+        :param request: Request of the job
+        :param future: Future of the job on the worker pool
+        """
+        self.job_id = uuid.uuid4().hex
+        self.request = request
+        self.future = future
+        self.submitted = time.time()
+        self.finished = None
+        future.add_done_callback(self._set_finished)
+
+    def _set_finished(self, _):
+        self.finished = time.time()
+
+    @property
+    def status(self) -> str:
+        """
+        Get the state of the job
+        """
+        if not self.future.done():
+            return RUNNING if self.future.running() else QUEUED
+        return FAILED if self.future.exception() is not None else DONE
+
+    def to_status(self) -> JobStatus:
+        """
+        Get the status of the job, with its result once finished
+
+        :return: JobStatus
+        """
+        status = self.status
+        galaxy = self.request.galaxy
+        return JobStatus(
+            job_id=self.job_id,
+            action=self.request.action,
+            target=self.request.name if galaxy is None else galaxy.source_name,
+            status=status,
+            submitted=self.submitted,
+            finished=self.finished,
+            result=self.future.result() if status == DONE else None,
+            error=repr(self.future.exception()) if status == FAILED else None,
+        )
+
+
+class FitService:
+    """
+    Pool of warm worker processes, and the jobs queued on it
+    """
+
+    def __init__(self, n_workers: int = DEFAULT_N_WORKERS, warm: bool = True):
+        """
+        :param n_workers: Number of worker processes
+        :param warm: Whether to warm up each worker when it starts
+        """
+        self.n_workers = n_workers
+        self.executor = get_worker_pool(n_workers, warm=warm)
+        self.jobs: dict[str, ServeJob] = {}
+        self.lock = threading.Lock()
+
+        # Start every worker now, rather than on the first requests
+        pids = [self.executor.submit(os.getpid) for _ in range(n_workers)]
+        logger.info(f"Started workers {sorted({x.result() for x in pids})}")
+
+    def submit(self, request: ServeRequest) -> ServeJob:
+        """
+        Queue a request on the worker pool
+
+        :param request: Request to run
+        :return: ServeJob
+        """
+        job = ServeJob(request, self.executor.submit(run_request, request))
+        with self.lock:
+            self.jobs[job.job_id] = job
+            self._evict_finished()
+        logger.info(f"Queued {request.action} job {job.job_id}")
+        return job
+
+    def _evict_finished(self):
+        finished = [key for key, job in self.jobs.items() if job.future.done()]
+        for key in finished[: max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[key]
+
+    def get(self, job_id: str) -> ServeJob | None:
+        """
+        Get a job by ID
+
+        :param job_id: ID of the job
+        :return: ServeJob, or None if it is not known
+        """
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def health(self) -> dict:
+        """
+        Get the number of workers, and of jobs in each state
+
+        :return: Dictionary of counts
+        """
+        with self.lock:
+            statuses = [job.status for job in self.jobs.values()]
+        return {
+            "status": "ok",
+            "n_workers": self.n_workers,
+            **{
+                state: statuses.count(state)
+                for state in [QUEUED, RUNNING, DONE, FAILED]
+            },
+        }
+
+    def shutdown(self):
+        """
+        Stop the worker pool, cancelling queued jobs
+
+        :return: None
+        """
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+class ServeHandler(BaseHTTPRequestHandler):
+    """
+    Handler for HTTP requests to the service
+    """
+
+    server_version = "galsynthspec"
+
+    @property
+    def service(self) -> FitService:
+        """
+        Get the service of the server
+        """
+        return self.server.service
+
+    def address_string(self) -> str:
+        # Unix socket clients have no address
+        return str(self.client_address[0]) if self.client_address else "local"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def send_json(self, code: int, payload: dict):
+        """
+        Send a JSON response
+
+        :param code: HTTP status code
+        :param payload: Body of the response
+        :return: None
+        """
+        body = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Get the health of the service, or the status of a job
+        """
+        if self.path == "/health":
+            self.send_json(200, self.service.health())
+        elif self.path.startswith("/jobs/"):
+            job = self.service.get(self.path.removeprefix("/jobs/"))
+            if job is None:
+                self.send_json(404, {"error": "Unknown job"})
+            else:
+                self.send_json(200, job.to_status().model_dump(mode="json"))
+        else:
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """
+        Queue a job
+        """
+        if self.path != "/jobs":
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = ServeRequest.model_validate_json(self.rfile.read(length))
+        except ValidationError as e:
+            self.send_json(400, {"error": str(e)})
+            return
+
+        job = self.service.submit(request)
+        if request.wait:
+            # Wait for the job, whether it succeeds or fails
+            job.future.exception()
+        self.send_json(
+            200 if job.future.done() else 202, job.to_status().model_dump(mode="json")
+        )
+
+
+class ServiceServerMixin:  # pylint: disable=too-few-public-methods
+    """
+    Mixin for servers which pass requests to a FitService
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, service: FitService):
+        """
+        :param address: Address to listen on
+        :param service: Service which runs the requests
+        """
+        self.service = service
+        super().__init__(address, ServeHandler)
+
+
+class TCPServeServer(ServiceServerMixin, ThreadingHTTPServer):
+    """
+    HTTP server listening on a port
+    """
+
+
+class UnixServeServer(
+    ServiceServerMixin, socketserver.ThreadingMixIn, socketserver.UnixStreamServer
+):
+    """
+    HTTP server listening on a Unix socket
+    """
+
+
+def serve(  # pylint: disable=too-many-arguments
+    *,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    socket_path: Path | None = None,
+    n_workers: int = DEFAULT_N_WORKERS,
+    warm: bool = True,
+    ready: threading.Event | None = None,
+    stop: threading.Event | None = None,
+):
+    """
+    Run the service until interrupted, or until stop is set
+
+    :param host: Host to listen on, if not using a Unix socket
+    :param port: Port to listen on, if not using a Unix socket
+    :param socket_path: Path of a Unix socket to listen on instead of a port
+    :param n_workers: Number of worker processes
+    :param warm: Whether to warm up each worker when it starts
+    :param ready: Event which is set once the service is listening
+    :param stop: Event which stops the service when set
+    :return: None
+    """
+    service = FitService(n_workers=n_workers, warm=warm)
+
+    if socket_path is not None:
+        socket_path = Path(socket_path)
+        socket_path.unlink(missing_ok=True)
+        server = UnixServeServer(str(socket_path), service)
+        address = f"unix socket {socket_path}"
+    else:
+        server = TCPServeServer((host, port), service)
+        address = f"http://{host}:{server.server_address[1]}"
+
+    if stop is not None:
+
+        def shutdown_on_stop():
+            stop.wait()
+            server.shutdown()
+
+        threading.Thread(target=shutdown_on_stop, daemon=True).start()
+
+    logger.info(f"Serving on {address} with {n_workers} workers")
+    if ready is not None:
+        ready.set()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Stopping service")
+    finally:
+        server.server_close()
+        service.shutdown()
+        if socket_path is not None:
+            socket_path.unlink(missing_ok=True)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """
+    HTTP connection over a Unix socket
+    """
+
+    def __init__(self, socket_path: Path, timeout: float | None = None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = str(socket_path)
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class ServeClient:
+    """
+    Client for the service, for use from notebooks and brokers
+    """
+
+    def __init__(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        socket_path: Path | None = None,
+        timeout: float | None = None,
+    ):
+        """
+        :param host: Host of the service
+        :param port: Port of the service
+        :param socket_path: Path of the Unix socket of the service, if used
+        :param timeout: Timeout of each request in seconds, or None to wait
+        """
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def request(self, method: str, path: str, payload: dict | None = None) -> dict:
+        """
+        Send a request to the service
+
+        :param method: HTTP method
+        :param path: Path of the endpoint
+        :param payload: JSON body, if any
+        :return: JSON response
+        """
+        if self.socket_path is not None:
+            conn = UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+        else:
+            conn = http.client.HTTPConnection(
+                self.host, self.port, timeout=self.timeout
+            )
+        try:
+            body = None if payload is None else json.dumps(payload)
+            conn.request(
+                method, path, body=body, headers={"Content-Type": "application/json"}
+            )
+            response = conn.getresponse()
+            data = json.loads(response.read())
+        finally:
+            conn.close()
+        if response.status >= 400:
+            raise ValueError(f"Request failed ({response.status}): {data['error']}")
+        return data
+
+    def submit(self, action: str, wait: bool = False, **kwargs) -> JobStatus:
+        """
+        Queue a job
+
+        :param action: 'fit', 'analyse' or 'predict'
+        :param wait: Whether to return only once the job has finished
+        :param kwargs: Other fields of ServeRequest
+        :return: JobStatus
+        """
+        payload = ServeRequest(action=action, wait=wait, **kwargs)
+        return JobStatus(
+            **self.request("POST", "/jobs", payload.model_dump(mode="json"))
+        )
+
+    def get(self, job_id: str) -> JobStatus:
+        """
+        Get the status of a job
+
+        :param job_id: ID of the job
+        :return: JobStatus
+        """
+        return JobStatus(**self.request("GET", f"/jobs/{job_id}"))
+
+    def health(self) -> dict:
+        """
+        Get the health of the service
+
+        :return: Dictionary of counts
+        """
+        return self.request("GET", "/health")
@@ -0,0 +1,684 @@
+"""
+Module for fitting the hosts of new transients continuously, as they arrive.
+
+The watcher consumes items from a spool directory, in which another process
+drops files, or from a JSON-lines file which another process appends to.
+Each item is a JSON object with a 'name' and/or 'ra_deg' and 'dec_deg', and
+optionally a 'redshift', or simply the name of a transient. Names are resolved
+to their host galaxy with TNS/SkyPortal, and each host is fitted once, by a
+persistent pool of warm worker processes.
+
+Every item is recorded in a SQLite ledger as soon as it is received, before it
+is consumed from the source, and then with its outcome and latency, from its
+arrival to the completion of its run. Items received but not finished when the
+watcher stopped are processed again when it restarts. Names and hosts which
+were already processed successfully are skipped, including across restarts.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from concurrent.futures import Executor
+from contextlib import closing
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+from pydantic import BaseModel, Field, model_validator
+
+from galsynthspec.datamodels.analysis import AnalysisConfig
+from galsynthspec.datamodels.galaxy import Galaxy
+from galsynthspec.paths import data_dir
+from galsynthspec.run.aio import DEFAULT_MAX_DOWNLOADS, run_one
+from galsynthspec.run.batch import resolve_galaxy
+from galsynthspec.run.config import FitConfig
+from galsynthspec.run.serve import get_worker_pool
+from galsynthspec.utils.io import atomic_write
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEDGER_PATH = data_dir / "watch.sqlite"
+DEFAULT_POLL_S = 10.0
+
+PROCESSED_DIR_NAME = "processed"
+
+DONE = "done"
+FAILED = "failed"
+DUPLICATE = "duplicate"
+
+LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS received (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    item TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    target TEXT NOT NULL,
+    source_name TEXT,
+    host TEXT,
+    status TEXT NOT NULL,
+    received REAL NOT NULL,
+    finished REAL NOT NULL,
+    latency_s REAL NOT NULL,
+    resolve_s REAL,
+    download_s REAL,
+    run_s REAL,
+    error TEXT
+);
+"""
+
+
+class WatchItem(BaseModel):
+    """
+    Base model for a transient or galaxy to process
+    """
+
+    name: str | None = Field(description="Name of the transient", default=None)
+    ra_deg: float | None = Field(description="Right ascension in degrees", default=None)
+    dec_deg: float | None = Field(description="Declination in degrees", default=None)
+    redshift: float | None = Field(
+        description="Redshift, used if the resolved source has none", default=None
+    )
+    received: float = Field(
+        description="Unix time at which the item arrived", default_factory=time.time
+    )
+
+    @model_validator(mode="after")
+    def validate_target(self):
+        """
+        Validate that a name or a position is given
+        """
+        if self.name is None and (self.ra_deg is None or self.dec_deg is None):
+            raise ValueError("Either a name or a position must be given")
+        return self
+
+    @property
+    def target(self) -> str:
+        """
+        Get the name of the item, or its position
+        """
+        if self.name is not None:
+            return self.name
+        return f"{self.ra_deg:.6f} {self.dec_deg:+.6f}"
+
+    @classmethod
+    def from_line(cls, line: str, received: float | None = None) -> "WatchItem":
+        """
+        Parse an item from a line, which is a JSON object or a name
+
+        :param line: Line to parse
+        :param received: Unix time at which the item arrived, or None for now
+        :return: WatchItem
+        """
+        line = line.strip()
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError:
+            data = line
+        if not isinstance(data, dict):
+            data = {"name": str(data)}
+        if received is not None:
+            data.setdefault("received", received)
+        return cls(**data)
+
+
+def parse_lines(lines: list[str], received: float | None = None) -> list[WatchItem]:
+    """
+    Parse the items in some lines, skipping blank and invalid lines
+
+    :param lines: Lines to parse
+    :param received: Unix time at which the items arrived, or None for now
+    :return: List of WatchItem
+    """
+    items = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            items.append(WatchItem.from_line(line, received=received))
+        except ValueError as exc:
+            logger.error(f"Skipping invalid item {line.strip()!r}: {exc}")
+    return items
+
+
+def get_host_key(galaxy: Galaxy) -> str:
+    """
+    Get a key identifying the host galaxy by its position,
+    so that transients in the same host are deduplicated
+
+    :param galaxy: Galaxy
+    :return: J2000 name of the position
+    """
+    return Galaxy(
+        ra_deg=galaxy.ra_deg, dec_deg=galaxy.dec_deg, redshift=None
+    ).source_name
+
+
+class SpoolSource:  # pylint: disable=too-few-public-methods
+    """
+    Source of items from files dropped into a spool directory. Each file holds
+    one item per line. Files are moved to the 'processed' subdirectory once their
+    items are committed, and files starting with '.' are ignored, so writers
+    should write to a hidden file and rename it into place.
+    """
+
+    def __init__(self, spool_dir: Path):
+        """
+        :param spool_dir: Spool directory
+        """
+        self.spool_dir = Path(spool_dir)
+        self.processed_dir = self.spool_dir / PROCESSED_DIR_NAME
+        self.processed_dir.mkdir(parents=True, exist_ok=True)
+        # Files read by the last poll, and not yet committed
+        self.read_paths: list[Path] = []
+
+    def poll(self) -> list[WatchItem]:
+        """
+        Read the items of any new files, which are read again
+        by the next poll unless they are committed
+
+        :return: List of WatchItem
+        """
+        paths = sorted(
+            (
+                path
+                for path in self.spool_dir.iterdir()
+                if path.is_file() and not path.name.startswith(".")
+            ),
+            key=lambda path: path.stat().st_mtime,
+        )
+        items = []
+        for path in paths:
+            received = path.stat().st_mtime
+            items += parse_lines(
+                path.read_text(encoding="utf8").splitlines(), received=received
+            )
+        self.read_paths = paths
+        return items
+
+    def commit(self):
+        """
+        Consume the files read by the last poll,
+        by moving them to the 'processed' subdirectory
+
+        :return: None
+        """
+        for path in self.read_paths:
+            path.replace(self.processed_dir / path.name)
+        self.read_paths = []
+
+
+class JsonlSource:  # pylint: disable=too-few-public-methods
+    """
+    Source of items from a JSON-lines file which another process appends to.
+    The offset of the last complete line committed is saved next to the file,
+    so that a restarted watcher resumes where it stopped.
+    """
+
+    def __init__(self, path: Path):
+        """
+        :param path: Path of the JSON-lines file
+        """
+        self.path = Path(path)
+        self.offset_path = self.path.with_name(f".{self.path.name}.offset")
+        self.offset = 0
+        if self.offset_path.is_file():
+            self.offset = int(self.offset_path.read_text(encoding="utf8"))
+        # Offset after the lines read by the last poll, and not yet committed
+        self.read_offset = self.offset
+
+    def poll(self) -> list[WatchItem]:
+        """
+        Read the items of any new complete lines, which are read again
+        by the next poll unless they are committed
+
+        :return: List of WatchItem
+        """
+        if not self.path.is_file():
+            return []
+        if self.path.stat().st_size < self.offset:
+            logger.warning(f"{self.path} was truncated, reading it from the start")
+            self.offset = 0
+
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+
+        # A line without a newline may still be being written
+        end = data.rfind(b"\n") + 1
+        self.read_offset = self.offset + end
+        if end == 0:
+            return []
+        return parse_lines(data[:end].decode("utf8").splitlines())
+
+    def commit(self):
+        """
+        Consume the lines read by the last poll, by saving the offset after them
+
+        :return: None
+        """
+        if self.read_offset == self.offset:
+            return
+        self.offset = self.read_offset
+        with atomic_write(self.offset_path) as tmp_path:
+            tmp_path.write_text(str(self.offset), encoding="utf8")
+
+
+def get_source(path: Path) -> SpoolSource | JsonlSource:
+    """
+    Get the source of items at a path
+
+    :param path: Spool directory, or JSON-lines file
+    :return: SpoolSource or JsonlSource
+    """
+    path = Path(path)
+    if path.is_dir():
+        return SpoolSource(path)
+    return JsonlSource(path)
+
+
+class WatchRecord(BaseModel):
+    """
+    Base model for the outcome of one item
+    """
+
+    target: str = Field(description="Name or position of the item")
+    source_name: str | None = Field(description="Name of the galaxy", default=None)
+    host: str | None = Field(description="J2000 name of the host", default=None)
+    status: str = Field(description="One of 'done', 'failed' or 'duplicate'")
+    received: float = Field(description="Unix time at which the item arrived")
+    finished: float = Field(description="Unix time at which the item finished")
+    resolve_s: float | None = Field(
+        description="Time spent resolving the name", default=None
+    )
+    download_s: float | None = Field(
+        description="Time spent downloading photometry", default=None
+    )
+    run_s: float | None = Field(
+        description="Time spent downloading, fitting and analysing", default=None
+    )
+    error: str | None = Field(description="Error of a failed item", default=None)
+
+    @property
+    def latency_s(self) -> float:
+        """
+        Get the time from the arrival of the item to its completion
+        """
+        return self.finished - self.received
+
+
+class WatchLedger:
+    """
+    Ledger of received and processed items, backed by a SQLite database
+    """
+
+    def __init__(self, db_path: Path = DEFAULT_LEDGER_PATH):
+        """
+        :param db_path: Path to the ledger database
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.connect() as conn:
+            conn.executescript(LEDGER_SCHEMA)
+
+    def connect(self) -> closing:
+        """
+        Open a connection to the database, closed on exit
+
+        :return: Context manager of the connection
+        """
+        conn = sqlite3.connect(self.db_path, timeout=60.0, isolation_level=None)
+        return closing(conn)
+
+    def receive(self, items: list[WatchItem]) -> list[int]:
+        """
+        Record that items were received, before they are consumed from the source
+
+        :param items: List of WatchItem
+        :return: Ids of the received items in the ledger
+        """
+        with self.connect() as conn:
+            conn.execute("BEGIN")
+            ids = [
+                conn.execute(
+                    "INSERT INTO received (item) VALUES (?)", (item.model_dump_json(),)
+                ).lastrowid
+                for item in items
+            ]
+            conn.execute("COMMIT")
+        return ids
+
+    def pending(self) -> list[tuple[int, WatchItem]]:
+        """
+        Get the items which were received, but not finished
+
+        :return: List of the ids and WatchItem of the items, in order
+        """
+        with self.connect() as conn:
+            rows = conn.execute("SELECT id, item FROM received ORDER BY id").fetchall()
+        return [(row_id, WatchItem.model_validate_json(item)) for row_id, item in rows]
+
+    def record(self, record: WatchRecord, received_id: int | None = None):
+        """
+        Record the outcome of an item
+
+        :param record: WatchRecord
+        :param received_id: Id of the item in the ledger of received items,
+            which is removed once its outcome is recorded
+        :return: None
+        """
+        with self.connect() as conn:
+            conn.execute("BEGIN")
+            conn.execute(
+                "INSERT INTO items (target, source_name, host, status, received, "
+                "finished, latency_s, resolve_s, download_s, run_s, error) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    record.target,
+                    record.source_name,
+                    record.host,
+                    record.status,
+                    record.received,
+                    record.finished,
+                    record.latency_s,
+                    record.resolve_s,
+                    record.download_s,
+                    record.run_s,
+                    record.error,
+                ),
+            )
+            if received_id is not None:
+                conn.execute("DELETE FROM received WHERE id = ?", (received_id,))
+            conn.execute("COMMIT")
+
+    def is_done(self, target: str | None = None, host: str | None = None) -> bool:
+        """
+        Check whether an item or a host was already processed successfully
+
+        :param target: Name or position of the item
+        :param host: J2000 name of the host
+        :return: Whether it was processed
+        """
+        with self.connect() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM items WHERE status = ? AND (target = ? OR host = ?) "
+                "LIMIT 1",
+                (DONE, target, host),
+            ).fetchone()
+        return row is not None
+
+    def records(self) -> Iterator[WatchRecord]:
+        """
+        Iterate over the recorded items, in order
+
+        :return: Iterator of WatchRecord
+        """
+        columns = list(WatchRecord.model_fields)
+        with self.connect() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(columns)} FROM items ORDER BY id"
+            ).fetchall()
+        for row in rows:
+            yield WatchRecord(**dict(zip(columns, row)))
+
+    def summary(self) -> dict:
+        """
+        Get the number of items with each status,
+        and the percentiles of the latency of completed items
+
+        :return: Dictionary of counts and latencies in seconds
+        """
+        with self.connect() as conn:
+            rows = conn.execute("SELECT status, latency_s FROM items").fetchall()
+        statuses = [status for status, _ in rows]
+        latencies = [latency for status, latency in rows if status == DONE]
+        summary = {
+            status: statuses.count(status) for status in [DONE, FAILED, DUPLICATE]
+        }
+        for percentile in [50, 90, 99]:
+            summary[f"latency_p{percentile}_s"] = (
+                float(np.percentile(latencies, percentile)) if latencies else None
+            )
+        return summary
+
+
+class Watcher:
+    """
+    Watcher which feeds new items from a source to a persistent worker pool
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        source: SpoolSource | JsonlSource,
+        ledger: WatchLedger,
+        *,
+        executor: Executor,
+        use_cache: bool = True,
+        analysis_config: AnalysisConfig | None = None,
+        fit_config: FitConfig | None = None,
+        max_downloads: int = DEFAULT_MAX_DOWNLOADS,
+    ):
+        """
+        :param source: Source of new items
+        :param ledger: Ledger of processed items
+        :param executor: Executor for the fitting and analysis
+        :param use_cache: Whether to use cached results if available
+        :param analysis_config: Options for the analysis, or None for defaults
+        :param fit_config: Options for the fit, or None for defaults
+        :param max_downloads: Maximum number of items downloading at once
+        """
+        self.source = source
+        self.ledger = ledger
+        self.run_kwargs = {
+            "executor": executor,
+            "use_cache": use_cache,
+            "analysis_config": analysis_config,
+            "fit_config": fit_config,
+        }
+        self.downloads = asyncio.Semaphore(max_downloads)
+        # Names and hosts of the items being processed
+        self.in_flight: set[str] = set()
+
+    def is_duplicate(self, key: str, host: bool = False) -> bool:
+        """
+        Check whether an item or host is being, or was already, processed
+
+        :param key: Name or position of the item, or J2000 name of the host
+        :param host: Whether the key is a host
+        :return: Whether it is a duplicate
+        """
+        if key in self.in_flight:
+            return True
+        if host:
+            return self.ledger.is_done(host=key)
+        return self.ledger.is_done(target=key)
+
+    def finish(
+        self, item: WatchItem, received_id: int | None, status: str, **kwargs
+    ) -> WatchRecord:
+        """
+        Record the outcome of an item
+
+        :param item: WatchItem
+        :param received_id: Id of the item in the ledger of received items
+        :param status: Status of the item
+        :param kwargs: Other fields of the WatchRecord
+        :return: WatchRecord
+        """
+        record = WatchRecord(
+            target=item.target,
+            status=status,
+            received=item.received,
+            finished=time.time(),
+            **kwargs,
+        )
+        self.ledger.record(record, received_id=received_id)
+        logger.info(
+            f"Item {record.target} {record.status} "
+            f"with a latency of {record.latency_s:.1f} s"
+        )
+        return record
+
+    async def process(
+        self, item: WatchItem, received_id: int | None = None
+    ) -> WatchRecord:
+        """
+        Resolve an item, and run the pipeline on its host unless it is a duplicate
+
+        :param item: WatchItem
+        :param received_id: Id of the item in the ledger of received items
+        :return: WatchRecord
+        """
+        if self.is_duplicate(item.target):
+            return self.finish(item, received_id, DUPLICATE)
+
+        self.in_flight.add(item.target)
+        try:
+            return await self.process_new(item, received_id)
+        finally:
+            self.in_flight.discard(item.target)
+
+    async def process_new(
+        self, item: WatchItem, received_id: int | None = None
+    ) -> WatchRecord:
+        """
+        Resolve a new item, and run the pipeline on its host unless it is
+        a duplicate
+
+        :param item: WatchItem
+        :param received_id: Id of the item in the ledger of received items
+        :return: WatchRecord
+        """
+        start = time.perf_counter()
+        try:
+            async with self.downloads:
+                galaxy = await asyncio.to_thread(
+                    resolve_galaxy,
+                    item.name,
+                    item.ra_deg,
+                    item.dec_deg,
+                    item.redshift,
+                    self.run_kwargs["use_cache"],
+                )
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            logger.error(f"Could not resolve {item.target}: {exc!r}")
+            return self.finish(
+                item,
+                received_id,
+                FAILED,
+                resolve_s=time.perf_counter() - start,
+                error=repr(exc),
+            )
+        resolve_s = time.perf_counter() - start
+
+        host = get_host_key(galaxy)
+        fields = {
+            "source_name": galaxy.source_name,
+            "host": host,
+            "resolve_s": resolve_s,
+        }
+        if self.is_duplicate(host, host=True):
+            return self.finish(item, received_id, DUPLICATE, **fields)
+
+        self.in_flight.add(host)
+        try:
+            run = await run_one(galaxy, downloads=self.downloads, **self.run_kwargs)
+        finally:
+            self.in_flight.discard(host)
+
+        return self.finish(
+            item,
+            received_id,
+            DONE if run.ok else FAILED,
+            download_s=run.download_seconds,
+            run_s=run.total_seconds,
+            error=run.error,
+            **fields,
+        )
+
+    async def run(self, poll_s: float = DEFAULT_POLL_S, once: bool = False):
+        """
+        Process any items received but not finished before a restart,
+        then poll the source for new items and process them, until cancelled
+
+        :param poll_s: Interval between polls of the source, in seconds
+        :param once: Whether to stop once the items available now are processed
+        :return: None
+        """
+        tasks = set()
+        for received_id, item in self.ledger.pending():
+            logger.info(f"Resuming {item.target}")
+            tasks.add(asyncio.create_task(self.process(item, received_id)))
+        try:
+            while True:
+                items = self.source.poll()
+                # Items are recorded before they are consumed from the source,
+                # so that none is lost if the watcher stops
+                received_ids = self.ledger.receive(items)
+                self.source.commit()
+                for received_id, item in zip(received_ids, items):
+                    logger.info(f"Received {item.target}")
+                    tasks.add(asyncio.create_task(self.process(item, received_id)))
+                if once:
+                    await asyncio.gather(*tasks)
+                    return
+                if tasks:
+                    _, tasks = await asyncio.wait(tasks, timeout=poll_s)
+                else:
+                    await asyncio.sleep(poll_s)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def watch(  # pylint: disable=too-many-arguments
+    path: Path,
+    *,
+    ledger_path: Path = DEFAULT_LEDGER_PATH,
+    use_cache: bool = True,
+    analysis_config: AnalysisConfig | None = None,
+    fit_config: FitConfig | None = None,
+    n_workers: int | None = None,
+    poll_s: float = DEFAULT_POLL_S,
+    once: bool = False,
+    warm: bool = True,
+) -> dict:
+    """
+    Watch a spool directory or JSON-lines file,
+    and run the pipeline on the host of each new item
+
+    :param path: Spool directory, or JSON-lines file
+    :param ledger_path: Path to the ledger database
+    :param use_cache: Whether to use cached results if available
+    :param analysis_config: Options for the analysis, or None for defaults
+    :param fit_config: Options for the fit, or None for defaults
+    :param n_workers: Number of worker processes
+    :param poll_s: Interval between polls of the source, in seconds
+    :param once: Whether to stop once the items available now are processed
+    :param warm: Whether to warm up each worker when it starts
+    :return: Summary of the ledger
+    """
+    source = get_source(path)
+    ledger = WatchLedger(ledger_path)
+    logger.info(f"Watching {path}, recording items in {ledger_path}")
+
+    with get_worker_pool(n_workers, warm=warm) as executor:
+        watcher = Watcher(
+            source,
+            ledger,
+            executor=executor,
+            use_cache=use_cache,
+            analysis_config=analysis_config,
+            fit_config=fit_config,
+        )
+        try:
+            asyncio.run(watcher.run(poll_s=poll_s, once=once))
+        except KeyboardInterrupt:
+            logger.info("Stopping watcher")
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    summary = ledger.summary()
+    logger.info(f"Watch summary: {summary}")
+    return summary
@@ -0,0 +1,362 @@
+"""
+Module for running the pipeline from a shared work queue,
+so that workers on many nodes can process a batch of galaxies.
+
+The queue is a SQLite database, which should be on a filesystem
+shared by all workers. Workers claim jobs with a lease, which is renewed
+by a heartbeat while the job runs. Jobs whose lease expires, because
+their worker died, are reclaimed by other workers. A worker which loses
+the lease on its job abandons the job to the worker which reclaimed it.
+"""
+
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+from pydantic import BaseModel, Field
+
+from galsynthspec.datamodels.analysis import AnalysisConfig
+from galsynthspec.datamodels.galaxy import Galaxy
+from galsynthspec.paths import data_dir
+from galsynthspec.run.config import FitConfig
+from galsynthspec.run.run import run_on_galaxy
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_PATH = data_dir / "queue.sqlite"
+DEFAULT_LEASE_S = 300.0
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_POLL_S = 30.0
+
+JOB_STATUSES = ["pending", "running", "done", "failed"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source_name TEXT UNIQUE NOT NULL,
+    galaxy TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated REAL
+)
+"""
+
+
+class Job(BaseModel):
+    """
+    Base model for a job claimed from the queue
+    """
+
+    job_id: int = Field(description="ID of the job in the queue")
+    galaxy: Galaxy = Field(description="Galaxy to run the pipeline on")
+    attempts: int = Field(description="Number of times the job has been claimed")
+
+
+def get_worker_id() -> str:
+    """
+    Get a unique ID for this worker process
+
+    :return: Worker ID
+    """
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    Work queue of galaxies, backed by a SQLite database
+    """
+
+    def __init__(
+        self,
+        db_path: Path = DEFAULT_QUEUE_PATH,
+        lease_s: float = DEFAULT_LEASE_S,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ):
+        self.db_path = Path(db_path)
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.transaction() as conn:
+            conn.execute(SCHEMA)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Open a connection holding the database write lock,
+        and commit on exit (or roll back on error)
+
+        :return: Connection
+        """
+        conn = sqlite3.connect(self.db_path, timeout=60.0, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def add(self, galaxies: list[Galaxy]) -> int:
+        """
+        Add galaxies to the queue. Galaxies already in the queue are ignored.
+
+        :param galaxies: Galaxies to add
+        :return: Number of galaxies added
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            n_before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (source_name, galaxy, updated) "
+                "VALUES (?, ?, ?)",
+                [(gal.source_name, gal.model_dump_json(), now) for gal in galaxies],
+            )
+            n_added = conn.total_changes - n_before
+
+        logger.info(f"Added {n_added} of {len(galaxies)} galaxies to {self.db_path}")
+        return n_added
+
+    def _reclaim_expired(self, conn: sqlite3.Connection, now: float):
+        """
+        Return running jobs with an expired lease to the queue,
+        or mark them as failed if they have used all their attempts
+
+        :param conn: Connection in a write transaction
+        :param now: Current time
+        :return: None
+        """
+        expired = conn.execute(
+            "SELECT id, source_name, worker, attempts FROM jobs "
+            "WHERE status = 'running' AND lease_expires < ?",
+            (now,),
+        ).fetchall()
+
+        for job_id, source_name, worker, attempts in expired:
+            status = "failed" if attempts >= self.max_attempts else "pending"
+            logger.warning(
+                f"Lease of worker {worker} on {source_name} expired, "
+                f"setting status to {status}"
+            )
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, lease_expires = NULL, "
+                "error = ?, updated = ? WHERE id = ?",
+                (status, f"Lease expired for worker {worker}", now, job_id),
+            )
+
+    def claim(self, worker_id: str) -> Job | None:
+        """
+        Claim the next pending job, reclaiming any jobs from dead workers first
+
+        :param worker_id: ID of the worker
+        :return: Job, or None if no job is pending
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            self._reclaim_expired(conn, now)
+            row = conn.execute(
+                "SELECT id, galaxy, attempts FROM jobs WHERE status = 'pending' "
+                "ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+
+            job_id, galaxy, attempts = row
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, lease_expires = ?, "
+                "attempts = ?, updated = ? WHERE id = ?",
+                (worker_id, now + self.lease_s, attempts + 1, now, job_id),
+            )
+
+        return Job(
+            job_id=job_id,
+            galaxy=Galaxy.model_validate_json(galaxy),
+            attempts=attempts + 1,
+        )
+
+    def renew(self, job_id: int, worker_id: str) -> bool:
+        """
+        Renew the lease on a running job
+
+        :param job_id: ID of the job
+        :param worker_id: ID of the worker holding the lease
+        :return: True if the lease was renewed, False if it has been lost
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (now + self.lease_s, now, job_id, worker_id),
+            )
+        return cursor.rowcount > 0
+
+    def finish(self, job_id: int, worker_id: str, error: str | None = None):
+        """
+        Mark a job as done, or as failed/pending again if there was an error
+
+        :param job_id: ID of the job
+        :param worker_id: ID of the worker holding the lease
+        :param error: Error message, or None if the job succeeded
+        :return: None
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT attempts FROM jobs WHERE id = ? AND worker = ?",
+                (job_id, worker_id),
+            ).fetchone()
+            if row is None:
+                logger.warning(f"Worker {worker_id} no longer holds job {job_id}")
+                return
+
+            if error is None:
+                status = "done"
+            elif row[0] >= self.max_attempts:
+                status = "failed"
+            else:
+                status = "pending"
+
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, lease_expires = NULL, "
+                "error = ?, updated = ? WHERE id = ?",
+                (status, error, now, job_id),
+            )
+
+    def counts(self) -> dict[str, int]:
+        """
+        Count the jobs with each status
+
+        :return: Dictionary of status to number of jobs
+        """
+        with self.transaction() as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        counts = {status: 0 for status in JOB_STATUSES}
+        counts.update(dict(rows))
+        return counts
+
+
+class Heartbeat:
+    """
+    Thread which renews the lease on a job until stopped,
+    or until the lease is lost
+    """
+
+    def __init__(self, queue: WorkQueue, job_id: int, worker_id: str):
+        self.queue = queue
+        self.job_id = job_id
+        self.worker_id = worker_id
+        # Set once the lease is lost, after which the job may be reclaimed
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        """
+        Renew the lease at a third of the lease time
+
+        :return: None
+        """
+        while not self._stop.wait(self.queue.lease_s / 3.0):
+            try:
+                renewed = self.queue.renew(self.job_id, self.worker_id)
+            except sqlite3.Error as exc:
+                # The lease is still held until it expires, so try again
+                logger.warning(f"Could not renew lease on job {self.job_id}: {exc}")
+                continue
+            if not renewed:
+                logger.warning(f"Lost lease on job {self.job_id}")
+                self.lost.set()
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_worker(  # pylint: disable=too-many-arguments
+    queue: WorkQueue,
+    use_cache: bool = True,
+    max_jobs: int | None = None,
+    poll_s: float = DEFAULT_POLL_S,
+    *,
+    analysis_config: AnalysisConfig | None = None,
+    fit_config: FitConfig | None = None,
+) -> int:
+    """
+    Run the pipeline on jobs claimed from the queue, until no jobs remain.
+
+    If no jobs are pending but other workers are still running jobs,
+    the worker waits in case those jobs need to be reclaimed.
+
+    :param queue: WorkQueue to claim jobs from
+    :param use_cache: bool Whether to use cached results if available.
+    :param max_jobs: Maximum number of jobs to run, or None for no limit
+    :param poll_s: Time to wait between polls when no job is pending
+    :param analysis_config: AnalysisConfig Options for the analysis,
+        or None for defaults.
+    :param fit_config: FitConfig Options for the fit, or None for defaults.
+    :return: Number of jobs run
+    """
+    worker_id = get_worker_id()
+    n_jobs = 0
+
+    logger.info(f"Starting worker {worker_id} on {queue.db_path}")
+
+    while max_jobs is None or n_jobs < max_jobs:
+        job = queue.claim(worker_id)
+
+        if job is None:
+            if queue.counts()["running"] == 0:
+                break
+            time.sleep(poll_s)
+            continue
+
+        galaxy = job.galaxy
+        logger.info(
+            f"Worker {worker_id} running {galaxy.source_name} "
+            f"(attempt {job.attempts})"
+        )
+
+        error = None
+        with Heartbeat(queue, job.job_id, worker_id) as heartbeat:
+            try:
+                run_on_galaxy(
+                    galaxy,
+                    use_cache=use_cache,
+                    analysis_config=analysis_config,
+                    fit_config=fit_config,
+                )
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                logger.error(f"Pipeline failed for {galaxy.source_name}: {exc}")
+                error = repr(exc)
+
+        if heartbeat.lost.is_set():
+            logger.warning(
+                f"Worker {worker_id} lost the lease on {galaxy.source_name}, "
+                f"abandoning it to the worker which reclaimed it"
+            )
+        else:
+            queue.finish(job.job_id, worker_id, error=error)
+        n_jobs += 1
+
+    logger.info(f"Worker {worker_id} finished after {n_jobs} jobs")
+    return n_jobs
@@ -12,6 +12,8 @@ from dotenv import load_dotenv
 from requests.adapters import HTTPAdapter
 from urllib3.util import Retry
 
+from galsynthspec.utils.archive import query_archive
+
 DEFAULT_TIMEOUT = 5  # seconds
 
 logger = logging.getLogger(__name__)
@@ -184,19 +186,16 @@ class SkyportalClient:
         url = urljoin(self.base_url, endpoint)
 
         if method == "get":
-            response = methods[method](
-                url,
-                params=data,
-                headers=self.session_headers,
-            )
+            kwargs = {"params": data}
         else:
-            response = methods[method](
-                url,
-                json=data,
-                headers=self.session_headers,
-            )
+            kwargs = {"json": data}
 
-        return response
+        # The token is only in the request headers, which are never recorded
+        return query_archive(
+            "skyportal",
+            {"method": method.upper(), "url": url, **kwargs},
+            lambda: methods[method](url, headers=self.session_headers, **kwargs),
+        )
 
 
 client = SkyportalClient()
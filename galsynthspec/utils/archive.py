@@ -0,0 +1,407 @@
+"""
+Module routing every query to an external archive through one transport.
+
+Each download function passes its query to `query_archive`, with the name of
+the service, a description of the request, and a function which runs it.
+In 'live' mode the function is simply called. In 'record' mode the result is
+also saved to a JSON fixture named by a hash of the request, and in 'replay'
+mode the fixture is returned without any network access. Fixtures hold plain
+data only: tables are stored as ECSV, and HTTP responses as their status,
+headers, URL and content, so the request and its credentials are never saved.
+Replayed queries can be slowed, failed or throttled, to test the pipeline and
+benchmark downloads without depending on the archives.
+
+In every mode, queries pass through the rate limiter, retry budget and
+circuit breaker of their service. Cone searches covered by a local catalogue
+snapshot are answered from it first, without querying the archive.
+"""
+
+import base64
+import hashlib
+import io
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator, TypeVar
+
+import numpy as np
+import requests
+from astropy.coordinates import SkyCoord
+from astropy.table import Table
+from requests.structures import CaseInsensitiveDict
+
+from galsynthspec.datamodels.archive import (
+    ARCHIVE_SERVICES,
+    LIVE,
+    RECORD,
+    REPLAY,
+    ArchiveConfig,
+)
+from galsynthspec.paths import data_dir
+from galsynthspec.utils.io import atomic_write
+from galsynthspec.utils.resilience import ServiceGuard
+from galsynthspec.utils.snapshot import SnapshotBackend
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_FIXTURE_DIR = data_dir / "archive_fixtures"
+
+
+def get_request_key(service: str, request: dict) -> str:
+    """
+    Get a stable key for a request to a service
+
+    :param service: Name of the service
+    :param request: Description of the request, which must be JSON-serialisable
+    :return: Hex digest
+    """
+    text = json.dumps({"service": service, "request": request}, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()[:24]
+
+
+def get_cone_request(
+    function: str, src_position: SkyCoord, radius_arcsec: float, **kwargs
+) -> dict:
+    """
+    Describe a cone search around a position
+
+    :param function: Name of the query function
+    :param src_position: Position of the search
+    :param radius_arcsec: Radius of the search in arcseconds
+    :param kwargs: Other arguments of the query
+    :return: Description of the request
+    """
+    return {
+        "function": function,
+        "ra": float(src_position.ra.deg),
+        "dec": float(src_position.dec.deg),
+        "radius_arcsec": float(radius_arcsec),
+        **kwargs,
+    }
+
+
+def make_response(  # pylint: disable=too-many-arguments
+    status_code: int,
+    content: bytes,
+    *,
+    url: str | None = None,
+    reason: str | None = None,
+    encoding: str | None = None,
+    headers: dict | None = None,
+) -> requests.Response:
+    """
+    Build an HTTP response, as returned by a query
+
+    :param status_code: HTTP status code
+    :param content: Body of the response
+    :param url: URL of the response
+    :param reason: Reason phrase of the status code
+    :param encoding: Encoding of the body, or None to guess it
+    :param headers: Headers of the response
+    :return: Response
+    """
+    response = requests.Response()
+    response.status_code = status_code
+    response.url = url
+    response.reason = reason
+    response.encoding = encoding
+    response.headers = CaseInsensitiveDict({} if headers is None else headers)
+    response._content = content  # pylint: disable=protected-access
+    return response
+
+
+def get_simulated_error(service: str, status_code: int) -> requests.HTTPError:
+    """
+    Get an HTTP error like the one raised by a failed query
+
+    :param service: Name of the service
+    :param status_code: HTTP status code
+    :return: HTTPError with a response
+    """
+    response = make_response(
+        status_code,
+        b"",
+        url=f"replay://{service}",
+        reason="Too Many Requests" if status_code == 429 else "Server Error",
+    )
+    return requests.HTTPError(
+        f"{status_code} {response.reason} for {service} (simulated)",
+        response=response,
+    )
+
+
+def encode_result(result: Any) -> dict:
+    """
+    Encode the result of a query as JSON-serialisable data
+
+    :param result: Result of the query, which must be an HTTP response,
+        an astropy table, or JSON-serialisable
+    :return: Encoded result
+    """
+    if isinstance(result, requests.Response):
+        return {
+            "type": "response",
+            "status_code": result.status_code,
+            "reason": result.reason,
+            "url": result.url,
+            "encoding": result.encoding,
+            "headers": dict(result.headers),
+            "content": base64.b64encode(result.content).decode("ascii"),
+        }
+
+    if isinstance(result, Table):
+        with io.StringIO() as f:
+            result.write(f, format="ascii.ecsv")
+            return {"type": "table", "ecsv": f.getvalue()}
+
+    try:
+        json.dumps(result)
+    except TypeError as exc:
+        raise TypeError(
+            f"Cannot record a result of type {type(result).__name__}"
+        ) from exc
+    return {"type": "json", "value": result}
+
+
+def decode_result(data: dict) -> Any:
+    """
+    Decode the result of a query saved by encode_result
+
+    :param data: Encoded result
+    :return: Result of the query
+    """
+    if data["type"] == "response":
+        return make_response(
+            data["status_code"],
+            base64.b64decode(data["content"]),
+            url=data["url"],
+            reason=data["reason"],
+            encoding=data["encoding"],
+            headers=data["headers"],
+        )
+
+    if data["type"] == "table":
+        return Table.read(data["ecsv"], format="ascii.ecsv")
+
+    return data["value"]
+
+
+class ArchiveTransport:
+    """
+    Transport which runs, records or replays archive queries
+    """
+
+    def __init__(self, config: ArchiveConfig | None = None):
+        """
+        :param config: Options for the transport, or None for live queries
+        """
+        self.config = ArchiveConfig() if config is None else config
+        self.fixture_dir = Path(
+            DEFAULT_FIXTURE_DIR
+            if self.config.fixture_dir is None
+            else self.config.fixture_dir
+        )
+        self.rng = np.random.default_rng(self.config.seed)
+        self.recent = defaultdict(deque)
+        self.guards = {}
+        self.snapshots = (
+            None
+            if self.config.snapshot_dir is None
+            else SnapshotBackend(self.config.snapshot_dir)
+        )
+        self.lock = threading.Lock()
+
+    def get_guard(self, service: str) -> ServiceGuard:
+        """
+        Get the rate limiter, retry budget and circuit breaker of a service,
+        which are shared by all threads using this transport
+
+        :param service: Name of the service
+        :return: ServiceGuard
+        """
+        with self.lock:
+            if service not in self.guards:
+                self.guards[service] = ServiceGuard(
+                    service, self.config.get_policy(service), seed=self.config.seed
+                )
+            return self.guards[service]
+
+    def get_fixture_path(self, service: str, request: dict) -> Path:
+        """
+        Get the path of the fixture for a request
+
+        :param service: Name of the service
+        :param request: Description of the request
+        :return: Path of the fixture
+        """
+        return self.fixture_dir / service / f"{get_request_key(service, request)}.json"
+
+    def query(self, service: str, request: dict, fetch: Callable[[], T]) -> T:
+        """
+        Run, record or replay a query
+
+        :param service: Name of the service
+        :param request: Description of the request, which must be JSON-serialisable
+        :param fetch: Function which runs the query against the archive
+        :return: Result of the query
+        """
+        if service not in ARCHIVE_SERVICES:
+            raise ValueError(
+                f"Unknown archive service '{service}'. "
+                f"Available services are {ARCHIVE_SERVICES}"
+            )
+
+        if self.snapshots is not None:
+            answered, result = self.snapshots.answer(request)
+            if answered:
+                return result
+
+        guard = self.get_guard(service)
+
+        if self.config.mode == REPLAY:
+            return guard.call(lambda: self.replay(service, request))
+
+        result = guard.call(fetch)
+        if self.config.mode == RECORD:
+            self.record(service, request, result)
+        return result
+
+    def record(self, service: str, request: dict, result: Any):
+        """
+        Save the result of a query as a fixture
+
+        :param service: Name of the service
+        :param request: Description of the request
+        :param result: Result of the query
+        :return: None
+        """
+        path = self.get_fixture_path(service, request)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        logger.debug(f"Recording {service} fixture {path.name}")
+        fixture = {
+            "service": service,
+            "request": request,
+            "result": encode_result(result),
+        }
+        with atomic_write(path) as tmp_path:
+            tmp_path.write_text(json.dumps(fixture), encoding="utf8")
+
+    def replay(self, service: str, request: dict) -> Any:
+        """
+        Serve the result of a query from its fixture, after the simulated
+        latency, and raise an HTTPError if it is throttled or fails
+
+        :param service: Name of the service
+        :param request: Description of the request
+        :return: Recorded result of the query
+        """
+        config = self.config.for_service(service)
+
+        with self.lock:
+            now = time.monotonic()
+            recent = self.recent[service]
+            while recent and now - recent[0] >= 1.0:
+                recent.popleft()
+            throttled = config.max_rate is not None and len(recent) >= config.max_rate
+            if not throttled:
+                recent.append(now)
+            failed = self.rng.random() < config.error_rate
+            delay = max(0.0, self.rng.normal(config.latency, config.latency_jitter))
+
+        if throttled:
+            raise get_simulated_error(service, 429)
+
+        time.sleep(delay)
+
+        if failed:
+            raise get_simulated_error(service, 503)
+
+        path = self.get_fixture_path(service, request)
+        if not path.exists():
+            raise FileNotFoundError(
+                f"No recorded {service} fixture for request {request} in "
+                f"{self.fixture_dir}. Record it first with mode '{RECORD}'."
+            )
+        fixture = json.loads(path.read_text(encoding="utf8"))
+        return decode_result(fixture["result"])
+
+
+_transport: ArchiveTransport | None = None
+
+
+def get_archive_transport() -> ArchiveTransport:
+    """
+    Get the archive transport, configured from the environment on first use
+
+    :return: ArchiveTransport
+    """
+    global _transport  # pylint: disable=global-statement
+    if _transport is None:
+        _transport = ArchiveTransport(ArchiveConfig.from_env())
+        if _transport.config.mode != LIVE:
+            logger.info(
+                f"Archive queries are in '{_transport.config.mode}' mode, "
+                f"using fixtures in {_transport.fixture_dir}"
+            )
+    return _transport
+
+
+def set_archive_config(config: ArchiveConfig | None) -> ArchiveTransport:
+    """
+    Replace the archive transport
+
+    :param config: Options for the transport, or None to reload them
+        from the environment on next use
+    :return: New ArchiveTransport
+    """
+    global _transport  # pylint: disable=global-statement
+    _transport = None if config is None else ArchiveTransport(config)
+    return get_archive_transport()
+
+
+@contextmanager
+def use_archive_config(config: ArchiveConfig) -> Iterator[ArchiveTransport]:
+    """
+    Context manager to use an archive transport, restoring the previous one after
+
+    :param config: Options for the transport
+    :return: ArchiveTransport
+    """
+    global _transport  # pylint: disable=global-statement
+    previous = _transport
+    try:
+        yield set_archive_config(config)
+    finally:
+        _transport = previous
+
+
+def prefetch_snapshots(positions: SkyCoord, radius_arcsec: float):
+    """
+    Answer the cone searches of many positions at once from the catalogue
+    snapshots, if any are configured
+
+    :param positions: Array of positions
+    :param radius_arcsec: Radius of the search in arcseconds
+    :return: None
+    """
+    transport = get_archive_transport()
+    if transport.snapshots is not None and len(positions) > 0:
+        transport.snapshots.prefetch(positions, radius_arcsec)
+
+
+def query_archive(service: str, request: dict, fetch: Callable[[], T]) -> T:
+    """
+    Run a query to an archive through the configured transport
+
+    :param service: Name of the service
+    :param request: Description of the request, which must be JSON-serialisable
+    :param fetch: Function which runs the query against the archive
+    :return: Result of the query
+    """
+    return get_archive_transport().query(service, request, fetch)
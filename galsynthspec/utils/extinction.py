@@ -12,6 +12,7 @@ from sedpy.observate import load_filters
 from sfdmap2 import sfdmap
 
 from galsynthspec.paths import sfd_path
+from galsynthspec.utils.instrumentation import track_stage
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +36,15 @@ def get_extinction_correction(
     )
 
 
+def warm_dust_map():
+    """
+    Read both hemispheres of the dust map, so that later queries are fast
+
+    :return: None
+    """
+    m.ebv(SkyCoord(l=[0.0, 0.0], b=[45.0, -45.0], frame="galactic", unit="degree"))
+
+
 def get_extinction_for_filter(
     src_position: SkyCoord,
     filter_name: str,
@@ -46,13 +56,14 @@ def get_extinction_for_filter(
     :param filter_name: Name of the filter to get the extinction for.
     :return: Float The extinction correction value for the filter.
     """
-    res = load_filters([filter_name])[0]
+    with track_stage("extinction"):
+        res = load_filters([filter_name])[0]
 
-    mean = np.average(res.wavelength, weights=res.transmission)
+        mean = np.average(res.wavelength, weights=res.transmission)
 
-    extinction_value = get_extinction_correction(
-        ra_deg=src_position.ra.deg,
-        dec_deg=src_position.dec.deg,
-        wavelengths_angstroms=[mean],
-    )[0]
+        extinction_value = get_extinction_correction(
+            ra_deg=src_position.ra.deg,
+            dec_deg=src_position.dec.deg,
+            wavelengths_angstroms=[mean],
+        )[0]
     return extinction_value
@@ -0,0 +1,94 @@
+"""
+Module for reading and writing sampler results in HDF5 files,
+using the layout written by prospector.
+
+Only the datasets which are asked for are read, so large datasets such as
+the full likelihood history are never loaded unless they are needed.
+Datasets can optionally be written chunked and compressed, which h5py
+decompresses transparently on reading.
+"""
+
+import json
+import logging
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+from galsynthspec.datamodels.output import OutputConfig
+
+logger = logging.getLogger(__name__)
+
+
+def decode_attr(value):
+    """
+    Decode an HDF5 attribute, which prospector writes as JSON where possible
+
+    :param value: Attribute value
+    :return: Decoded value, or the raw value if it is not JSON
+    """
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def read_group(group: h5py.Group, datasets: list[str] | None = None) -> dict:
+    """
+    Read the attributes and the requested datasets of an HDF5 group
+
+    :param group: HDF5 group
+    :param datasets: Names of the datasets to read, or None to read all
+    :return: Dictionary of decoded attributes and arrays
+    """
+    out = {key: decode_attr(value) for key, value in group.attrs.items()}
+    names = list(group.keys()) if datasets is None else datasets
+    for name in names:
+        out[name] = np.asarray(group[name][()])
+    return out
+
+
+def read_fit_hdf5(
+    file_path: Path, datasets: dict[str, list[str] | None]
+) -> dict[str, dict]:
+    """
+    Read selected groups and datasets from a sampler results file
+
+    :param file_path: Path to the HDF5 file
+    :param datasets: Dictionary mapping each group to the names of the datasets
+        to read from it, or None to read all of them. Missing groups are skipped.
+    :return: Dictionary mapping each group to its attributes and arrays
+    """
+    with h5py.File(file_path, "r") as hf:
+        return {
+            group: read_group(hf[group], names)
+            for group, names in datasets.items()
+            if group in hf
+        }
+
+
+def write_group(
+    hf: h5py.File | h5py.Group,
+    name: str,
+    datasets: dict[str, np.ndarray],
+    attrs: dict | None = None,
+    config: OutputConfig | None = None,
+) -> h5py.Group:
+    """
+    Write a group of datasets and JSON attributes
+
+    :param hf: HDF5 file or parent group
+    :param name: Name of the group, which is created if it does not exist
+    :param datasets: Arrays to write
+    :param attrs: Attributes to write as JSON
+    :param config: Options for chunking and compressing the datasets,
+        or None to write them uncompressed
+    :return: HDF5 group
+    """
+    group = hf.require_group(name)
+    for key, value in datasets.items():
+        kwargs = {} if config is None else config.get_dataset_kwargs(value)
+        group.create_dataset(key, data=value, **kwargs)
+    for key, value in ({} if attrs is None else attrs).items():
+        group.attrs[key] = json.dumps(value)
+    return group
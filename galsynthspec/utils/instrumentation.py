@@ -0,0 +1,113 @@
+"""
+Module for recording the wall time, CPU time and memory usage of pipeline stages.
+"""
+
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator
+
+from galsynthspec.datamodels.report import RunReport, StageReport
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+_active_report: ContextVar[RunReport | None] = ContextVar("active_report", default=None)
+
+
+def get_peak_rss_mb() -> float:
+    """
+    Get the peak resident set size of the current process
+
+    :return: Peak RSS in MB, or 0 if it is not available on this platform
+    """
+    if resource is None:
+        return 0.0
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, and in kilobytes elsewhere
+    if sys.platform == "darwin":
+        return max_rss / 1024.0**2
+    return max_rss / 1024.0
+
+
+def get_active_report() -> RunReport | None:
+    """
+    Get the run report currently being recorded, if any
+
+    :return: RunReport or None
+    """
+    return _active_report.get()
+
+
+@contextmanager
+def track_run(source_name: str | None = None) -> Iterator[RunReport]:
+    """
+    Context manager to record all stages run within it to a new RunReport
+
+    :param source_name: Name of the source
+    :return: RunReport which is filled as stages complete
+    """
+    report = RunReport(source_name=source_name)
+    token = _active_report.set(report)
+    try:
+        yield report
+    finally:
+        _active_report.reset(token)
+
+
+@contextmanager
+def track_stage(name: str) -> Iterator[StageReport]:
+    """
+    Context manager to record the resource usage of a pipeline stage.
+    If no run is being tracked, the usage is discarded.
+
+    Stages can be nested, in which case the time spent in the inner stage
+    is also counted in the outer stage.
+
+    :param name: Name of the stage
+    :return: StageReport for the stage, which can be updated by the caller
+    """
+    stage = StageReport(n_calls=1)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield stage
+    finally:
+        stage.wall_time_s = time.perf_counter() - wall_start
+        stage.cpu_time_s = time.process_time() - cpu_start
+        stage.peak_rss_mb = get_peak_rss_mb()
+
+        report = _active_report.get()
+        if report is not None:
+            report.record(name, stage)
+
+
+def flag_skipped_survey(name: str):
+    """
+    Record in the active run report that a survey was skipped.
+    If no run is being tracked, the flag is discarded.
+
+    :param name: Name of the survey
+    :return: None
+    """
+    report = _active_report.get()
+    if report is not None and name not in report.skipped_surveys:
+        report.skipped_surveys.append(name)
+
+
+class CallCounter:  # pylint: disable=too-few-public-methods
+    """
+    Wrapper for a function which counts the number of times it is called
+    """
+
+    def __init__(self, func: Callable):
+        self.func = func
+        self.n_calls = 0
+
+    def __call__(self, *args, **kwargs):
+        self.n_calls += 1
+        return self.func(*args, **kwargs)
@@ -0,0 +1,111 @@
+"""
+Module for writing output files safely when several processes share
+the same data directory.
+"""
+
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LOCK_FILE_NAME = ".lock"
+
+# Mode of new files before the umask is applied, as for open()
+DEFAULT_FILE_MODE = 0o666
+
+
+def get_umask() -> int:
+    """
+    Get the umask of the process. On Linux it is read from /proc, since
+    setting the umask to read it back is not safe with several threads.
+
+    :return: umask
+    """
+    try:
+        with open("/proc/self/status", encoding="utf8") as f:
+            for line in f:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except OSError:
+        pass
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+def get_file_mode(out_path: Path) -> int:
+    """
+    Get the permissions for a file written to out_path: those of the existing
+    file if there is one, and otherwise those of a file created with open()
+
+    :param out_path: Path of the file
+    :return: Permission bits
+    """
+    try:
+        return out_path.stat().st_mode & 0o7777
+    except FileNotFoundError:
+        return DEFAULT_FILE_MODE & ~get_umask()
+
+
+@contextmanager
+def atomic_write(out_path: Path) -> Iterator[Path]:
+    """
+    Context manager yielding a temporary path to write to,
+    which is renamed to out_path once the block completes without error.
+
+    The temporary file is in the same directory as out_path,
+    and has the same suffix, so readers only ever see a complete file.
+    It is given the permissions of any existing file, or of a file created
+    with open(), rather than the owner-only permissions of a temporary file.
+
+    :param out_path: Final path of the file
+    :return: Temporary path to write to
+    """
+    out_path = Path(out_path)
+    fd, tmp_name = tempfile.mkstemp(
+        dir=out_path.parent, prefix=f".{out_path.stem}.", suffix=out_path.suffix
+    )
+    os.close(fd)
+    tmp_path = Path(tmp_name)
+    try:
+        yield tmp_path
+        os.chmod(tmp_path, get_file_mode(out_path))
+        os.replace(tmp_path, out_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+@contextmanager
+def directory_lock(directory: Path) -> Iterator[None]:
+    """
+    Context manager holding an exclusive advisory lock on a directory,
+    blocking until any other process holding the lock releases it.
+
+    :param directory: Directory to lock
+    :return: None
+    """
+    if fcntl is None:  # pragma: no cover
+        logger.warning("File locking is not supported on this platform")
+        yield
+        return
+
+    lock_path = Path(directory) / LOCK_FILE_NAME
+    with open(lock_path, "a", encoding="utf8") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            logger.info(f"Waiting for lock on {directory}")
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -3,14 +3,19 @@ This module predicts the photometry for a galaxy
 based on the results of a fitting procedure.
 """
 
+import numpy as np
 import pandas as pd
 from prospect.sources.constants import jansky_cgs, lightspeed
 from scipy import stats
-from sedpy.observate import getSED, load_filters
 
 from galsynthspec.datamodels.fitresult import FitResult
 from galsynthspec.datamodels.galaxy import Galaxy
+from galsynthspec.datamodels.sed import SEDConfig
 from galsynthspec.utils.extinction import get_extinction_for_filter
+from galsynthspec.utils.instrumentation import track_stage
+from galsynthspec.utils.io import atomic_write
+from galsynthspec.utils.projection import project_maggies
+from galsynthspec.utils.sketch import SEDQuantileSketch
 
 DEFAULT_FILTER_LIST = [
     "galex_FUV",
@@ -48,12 +53,12 @@ def get_lambda_quantile(df, q, angstroms):
     """
     Get the quantile of the wavelength in CGS units from a DataFrame.
 
-    :param df: DataFrame containing the sampled SEDs.
+    :param df: DataFrame containing the sampled SEDs, or a quantile sketch.
     :param q: Quantile to compute (e.g., 0.5 for median).
     :param angstroms: Array of wavelengths in Angstroms.
     :return: Quantile flux in CGS units (erg/s/cm^2/nm).
     """
-    return get_lambda_cgs(df.quantile(q).to_numpy(), angstroms)
+    return get_lambda_cgs(np.asarray(df.quantile(q), dtype=float), angstroms)
 
 
 def get_photometry_quantile(angstroms, df, q, filters: list[str]):
@@ -61,22 +66,26 @@ def get_photometry_quantile(angstroms, df, q, filters: list[str]):
     Get the photometry quantile for a given set of wavelengths and a DataFrame of SEDs.
 
     :param angstroms: Array of wavelengths in Angstroms.
-    :param df: DataFrame containing the sampled SEDs.
+    :param df: DataFrame containing the sampled SEDs, or a quantile sketch.
     :param q: Quantile to compute (e.g., 0.5 for median).
     :param filters: List of filter names to compute the photometry for.
     :return: Magnitudes corresponding to the specified quantile for each filter.
     """
-    filterlist = load_filters(filters)
-    f_lambda_cgs = get_lambda_quantile(df, q, angstroms)
-    mags = getSED(angstroms, f_lambda_cgs, filterlist=filterlist)
-    return mags
+    # The wavelengths are already in the observed frame
+    maggies = project_maggies(
+        np.asarray(df.quantile(q), dtype=float), angstroms, 0.0, filters
+    )
+    return -2.5 * np.log10(maggies)
 
 
-def get_predicted_photometry(
+def get_predicted_photometry(  # pylint: disable=too-many-arguments,too-many-locals
     galaxy: Galaxy,
     result: FitResult,
-    sample_df: pd.DataFrame | None = None,
+    sample_df: pd.DataFrame | SEDQuantileSketch | None = None,
     filter_list: None | list[str] = None,
+    sed_config: SEDConfig | None = None,
+    *,
+    write: bool = True,
 ) -> pd.DataFrame:
     """
     Function to get the predicted photometry for a galaxy based
@@ -84,16 +93,26 @@ def get_predicted_photometry(
 
     :param galaxy: Galaxy
     :param result: Result of the MCMC fitting procedure.
-    :param sample_df: DataFrame containing the sampled SEDs from the posterior.
-                        If None, it will sample 1000 SEDs.
+    :param sample_df: DataFrame containing the sampled SEDs from the posterior,
+                        or a quantile sketch of them, at the full resolution
+                        of the model. If None, it will sample SEDs using sed_config.
     :param filter_list: List of filters to predict photometry for.
                         If None, it will use a default list of filters.
+    :param sed_config: SED sampling options, used to sample SEDs if sample_df
+                        is None. The wavelength range and rebinning only apply
+                        to the stored SED, so are ignored here.
+    :param write: Whether to write the predicted photometry
+                        to the synthetic photometry file of the galaxy.
     :return: pd.DataFrame containing the predicted photometry.
     """
 
     if sample_df is None:
-        sample_df = result.sample_sed_from_posterior(n_sample=1000)
+        if sed_config is None:
+            sed_config = SEDConfig()
+        sample_df = result.sample_seds(sed_config.full_resolution())
 
+    # Filters are projected onto the full model SED, never a restricted
+    # or rebinned one, which would bias the synthetic photometry
     angstroms = result.rest_frame_wavelengths * (1.0 + result.get_redshift())
 
     if filter_list is None:
@@ -143,5 +162,10 @@ def get_predicted_photometry(
 
     print(phot_df)
 
-    phot_df.to_json(galaxy.synthetic_photometry_file)
+    if write:
+        with (
+            track_stage("write_json"),
+            atomic_write(galaxy.synthetic_photometry_file) as tmp_path,
+        ):
+            phot_df.to_json(tmp_path)
     return phot_df
@@ -0,0 +1,146 @@
+"""
+Module for profiling stages of the pipeline, with cProfile
+and a sampling profiler for flamegraphs.
+"""
+
+import cProfile
+import logging
+import pstats
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Iterator
+
+from galsynthspec.utils.io import atomic_write
+
+logger = logging.getLogger(__name__)
+
+PROFILE_STAGES = ["all", "fit", "analyse"]
+
+DEFAULT_SAMPLE_INTERVAL_S = 0.005
+DEFAULT_N_TOP = 25
+
+
+class StackSampler:
+    """
+    Sampling profiler which periodically records the stack of a thread,
+    to produce collapsed stacks (as used by flamegraph.pl, speedscope or py-spy)
+    """
+
+    def __init__(self, thread_id: int, interval_s: float = DEFAULT_SAMPLE_INTERVAL_S):
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        """
+        Sample the stack of the target thread until stopped
+
+        :return: None
+        """
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(  # pylint: disable=protected-access
+                self.thread_id
+            )
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_name} ({Path(code.co_filename).name}:"
+                    f"{code.co_firstlineno})"
+                )
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        """
+        Start sampling
+
+        :return: None
+        """
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop sampling
+
+        :return: None
+        """
+        self._stop.set()
+        self._thread.join()
+
+    def write_collapsed(self, out_path: Path):
+        """
+        Write the sampled stacks in collapsed format, one stack per line
+
+        :param out_path: Output path
+        :return: None
+        """
+        lines = [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+        out_path.write_text("\n".join(lines) + "\n", encoding="utf8")
+
+
+@contextmanager
+def profile_block(
+    out_dir: Path, label: str, n_top: int = DEFAULT_N_TOP
+) -> Iterator[cProfile.Profile]:
+    """
+    Context manager to profile the code run within it.
+
+    Saves a cProfile 'profile_<label>.prof' file and a collapsed-stack
+    'profile_<label>.collapsed.txt' file to out_dir,
+    and prints the top entries by cumulative time.
+
+    :param out_dir: Output directory
+    :param label: Label for the output files
+    :param n_top: Number of entries to print
+    :return: cProfile.Profile
+    """
+    profiler = cProfile.Profile()
+    sampler = StackSampler(threading.get_ident())
+
+    sampler.start()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        sampler.stop()
+
+        prof_path = out_dir / f"profile_{label}.prof"
+        logger.info(f"Saving profile to {prof_path}")
+        with atomic_write(prof_path) as tmp_path:
+            profiler.dump_stats(tmp_path)
+
+        collapsed_path = out_dir / f"profile_{label}.collapsed.txt"
+        logger.info(f"Saving collapsed stacks to {collapsed_path}")
+        with atomic_write(collapsed_path) as tmp_path:
+            sampler.write_collapsed(tmp_path)
+
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(n_top)
+
+
+def profile_stage(out_dir: Path, stage: str, profile: str | None = None):
+    """
+    Profile a pipeline stage, if it is the stage selected for profiling
+
+    :param out_dir: Output directory
+    :param stage: Name of the stage
+    :param profile: Stage selected for profiling, or None for no profiling
+    :return: Context manager
+    """
+    if profile is not None and profile not in PROFILE_STAGES:
+        raise ValueError(
+            f"Unknown profile stage {profile}. Choose from {PROFILE_STAGES}"
+        )
+
+    if profile == stage:
+        return profile_block(out_dir, label=stage)
+    return nullcontext()
@@ -0,0 +1,225 @@
+"""
+Module for streaming the progress of a running fit to a JSON-lines status file,
+and for summarising the status files of a batch.
+"""
+
+import logging
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_FILE_NAME = "progress.jsonl"
+DEFAULT_PROGRESS_INTERVAL = 10.0
+
+RUNNING = "running"
+DONE = "done"
+
+
+class ProgressStatus(BaseModel):
+    """
+    Base model for one line of a progress status file
+    """
+
+    source_name: str | None = Field(description="Name of the source", default=None)
+    sampler: str = Field(description="Name of the sampler backend")
+    state: str = Field(description="Either 'running' or 'done'", default=RUNNING)
+    time: float = Field(description="Unix time of the update")
+    elapsed: float = Field(description="Time since sampling started, in seconds")
+    iteration: int = Field(description="Number of sampler iterations")
+    ncall: int = Field(description="Number of likelihood calls")
+    dlogz: float | None = Field(
+        description="Estimated remaining log-evidence of the initial nested run",
+        default=None,
+    )
+    stop: float | None = Field(
+        description="Value of the stopping criterion, where 1 is converged",
+        default=None,
+    )
+    ess: float | None = Field(description="Effective sample size", default=None)
+    efficiency: float | None = Field(
+        description="Sampling efficiency, in percent", default=None
+    )
+
+    @property
+    def calls_per_second(self) -> float:
+        """
+        Get the average number of likelihood calls per second
+        """
+        return self.ncall / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def get_effective_sample_size(logwt: np.ndarray) -> float:
+    """
+    Get the Kish effective sample size of a set of log weights
+
+    :param logwt: Array of log weights
+    :return: Effective sample size
+    """
+    weights = np.exp(np.asarray(logwt) - np.max(logwt))
+    return float(np.sum(weights) ** 2 / np.sum(weights**2))
+
+
+class ProgressWriter:
+    """
+    Append the progress of a fit to a JSON-lines file, at most once per interval
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        sampler: str,
+        source_name: str | None = None,
+        interval: float = DEFAULT_PROGRESS_INTERVAL,
+    ):
+        """
+        :param path: Path of the status file, which is truncated
+        :param sampler: Name of the sampler backend
+        :param source_name: Name of the source
+        :param interval: Minimum time between updates, in seconds
+        """
+        self.path = Path(path)
+        self.sampler = sampler
+        self.source_name = source_name
+        self.interval = interval
+        self.start = time.time()
+        self.last_update = -np.inf
+        self.path.write_text("", encoding="utf-8")
+
+    def is_due(self) -> bool:
+        """
+        Check whether the interval since the last update has passed,
+        so that expensive quantities are only computed when they are written
+
+        :return: Whether an update is due
+        """
+        return time.time() - self.last_update >= self.interval
+
+    def update(self, iteration: int, ncall: int, state: str = RUNNING, **kwargs):
+        """
+        Write a status line
+
+        :param iteration: Number of sampler iterations
+        :param ncall: Number of likelihood calls
+        :param state: Either 'running' or 'done'
+        :param kwargs: Other fields of ProgressStatus
+        :return: None
+        """
+        now = time.time()
+        status = ProgressStatus(
+            source_name=self.source_name,
+            sampler=self.sampler,
+            state=state,
+            time=now,
+            elapsed=now - self.start,
+            iteration=iteration,
+            ncall=ncall,
+            **kwargs,
+        )
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(status.model_dump_json() + "\n")
+        self.last_update = now
+
+    def finish(self, iteration: int, ncall: int, **kwargs):
+        """
+        Write the final status line
+
+        :param iteration: Number of sampler iterations
+        :param ncall: Number of likelihood calls
+        :param kwargs: Other fields of ProgressStatus
+        :return: None
+        """
+        self.update(iteration, ncall, state=DONE, **kwargs)
+
+
+def read_last_status(path: Path) -> ProgressStatus | None:
+    """
+    Read the last line of a status file
+
+    :param path: Path of the status file
+    :return: ProgressStatus, or None if the file has no complete line
+    """
+    lines = Path(path).read_text(encoding="utf-8").splitlines()
+    for line in reversed(lines):
+        try:
+            return ProgressStatus.model_validate_json(line)
+        except ValueError:
+            # A partially-written line
+            continue
+    return None
+
+
+def find_status_files(base_dir: Path) -> list[Path]:
+    """
+    Find the status files of every galaxy in a directory
+
+    :param base_dir: Directory containing one output directory per galaxy
+    :return: Sorted list of status file paths
+    """
+    return sorted(Path(base_dir).glob(f"*/{PROGRESS_FILE_NAME}"))
+
+
+def get_progress_table(statuses: list[ProgressStatus]) -> pd.DataFrame:
+    """
+    Get a table of the latest status of each fit, with the likelihood call rate
+
+    :param statuses: Latest status of each fit
+    :return: DataFrame with one row per fit
+    """
+    return pd.DataFrame(
+        [
+            {
+                "source": s.source_name,
+                "sampler": s.sampler,
+                "state": s.state,
+                "iteration": s.iteration,
+                "ncall": s.ncall,
+                "dlogz": s.dlogz,
+                "stop": s.stop,
+                "ess": s.ess,
+                "efficiency": s.efficiency,
+                "elapsed": s.elapsed,
+                "calls_per_second": s.calls_per_second,
+                "age": time.time() - s.time,
+            }
+            for s in statuses
+        ]
+    )
+
+
+def summarise_progress(
+    statuses: list[ProgressStatus], n_total: int | None = None
+) -> dict:
+    """
+    Summarise the throughput of a batch, and estimate the time until it finishes
+
+    :param statuses: Latest status of each fit
+    :param n_total: Total number of fits in the batch,
+        or None to use the number of statuses
+    :return: Dictionary with the number of fits done and running,
+        the throughput in fits per hour, and the ETA in seconds
+    """
+    n_total = len(statuses) if n_total is None else n_total
+    done = [s for s in statuses if s.state == DONE]
+    n_running = len(statuses) - len(done)
+
+    throughput = None
+    eta = None
+    if done:
+        start = min(s.time - s.elapsed for s in statuses)
+        span = max(s.time for s in done) - start
+        if span > 0:
+            throughput = 3600.0 * len(done) / span
+            eta = 3600.0 * (n_total - len(done)) / throughput
+
+    return {
+        "n_total": n_total,
+        "n_done": len(done),
+        "n_running": n_running,
+        "fits_per_hour": throughput,
+        "eta_seconds": eta,
+    }
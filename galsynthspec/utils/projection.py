@@ -0,0 +1,282 @@
+"""
+Module for synthetic photometry with cached filter projection matrices.
+
+For a fixed wavelength grid, redshift and set of filters, projecting a spectrum
+onto the filters is linear. The projection is therefore computed once as a
+matrix, with the same trapezoidal integral as sedpy, and any number of spectra
+are projected with a single matrix multiply.
+
+When the redshift is a free parameter, it changes on every call, so the
+redshift-independent part of the projection is cached once per grid and the
+filters are integrated at each redshift without caching a matrix.
+"""
+
+import hashlib
+import logging
+
+import numpy as np
+from prospect.sources.constants import jansky_cgs, lightspeed
+from sedpy.observate import Filter
+
+from galsynthspec.datamodels.photometry import get_filter
+
+logger = logging.getLogger(__name__)
+
+MAX_CACHE_BYTES = 64 * 2**20
+MAX_CACHED_GRIDS = 8
+
+_projection_cache: dict[tuple[str, float, tuple[str, ...]], np.ndarray] = {}
+_cache_bytes: int = 0
+_grid_cache: list["ProjectionGrid"] = []
+
+
+def get_grid_hash(wavelengths: np.ndarray) -> str:
+    """
+    Get a hash of a wavelength grid, to use as a cache key
+
+    :param wavelengths: Array of wavelengths
+    :return: Hex digest of the grid
+    """
+    return hashlib.sha1(
+        np.ascontiguousarray(wavelengths, dtype=float).tobytes()
+    ).hexdigest()
+
+
+def get_trapezoid_weights(x: np.ndarray) -> np.ndarray:
+    """
+    Get the weights which turn a sum over samples into the trapezoidal integral
+
+    :param x: Increasing array of sample positions
+    :return: Array of weights, with the same length as x
+    """
+    dx = np.diff(x)
+    weights = np.zeros(len(x))
+    weights[:-1] += 0.5 * dx
+    weights[1:] += 0.5 * dx
+    return weights
+
+
+class ProjectionGrid:
+    """
+    Redshift-independent part of the projection onto filters for one
+    rest-frame wavelength grid.
+
+    The projection is the linear form of sedpy's Filter.obj_counts_hires,
+    the trapezoidal integral of lambda * f_lambda * R over the observed
+    wavelengths. Every factor of (1 + z) in the observed wavelengths,
+    their spacing and the conversion from f_nu to f_lambda cancels, so only
+    the filter transmission depends on the redshift.
+    """
+
+    def __init__(self, rest_wavelengths: np.ndarray):
+        """
+        :param rest_wavelengths: Increasing array of rest-frame wavelengths,
+            in Angstrom
+        """
+        self.wavelengths = np.array(rest_wavelengths, dtype=float)
+        self.wavelengths.flags.writeable = False
+        self.key = get_grid_hash(self.wavelengths)
+
+        # Trapezoid weights times lambda times the conversion to f_lambda,
+        # with f_lambda in erg/s/cm^2/AA
+        self.base = (
+            get_trapezoid_weights(self.wavelengths)
+            * (lightspeed / self.wavelengths)
+            * (3631 * jansky_cgs)
+        )
+
+    def matches(self, rest_wavelengths: np.ndarray) -> bool:
+        """
+        Check whether a wavelength grid is this grid
+
+        :param rest_wavelengths: Array of rest-frame wavelengths
+        :return: Whether the grids are equal
+        """
+        return rest_wavelengths is self.wavelengths or (
+            len(rest_wavelengths) == len(self.wavelengths)
+            and np.array_equal(rest_wavelengths, self.wavelengths)
+        )
+
+    def get_support(self, filt: Filter, redshift: float) -> slice:
+        """
+        Get the wavelengths at which a filter can transmit, at a redshift
+
+        :param filt: sedpy filter
+        :param redshift: Redshift of the source
+        :return: Slice of the grid
+        """
+        return slice(
+            np.searchsorted(self.wavelengths, filt.wavelength[0] / (1.0 + redshift)),
+            np.searchsorted(
+                self.wavelengths, filt.wavelength[-1] / (1.0 + redshift), side="right"
+            ),
+        )
+
+    def get_weights(
+        self, filt: Filter, redshift: float, support: slice
+    ) -> np.ndarray | None:
+        """
+        Get the projection weights of a filter over part of the grid
+
+        :param filt: sedpy filter
+        :param redshift: Redshift of the source
+        :param support: Slice of the grid
+        :return: Array of weights, or None if the filter does not transmit
+        """
+        transmission = np.interp(
+            self.wavelengths[support] * (1.0 + redshift),
+            filt.wavelength,
+            filt.transmission,
+            left=0.0,
+            right=0.0,
+        )
+        if not np.any(transmission > 0.0):
+            return None
+        return self.base[support] * transmission / filt.ab_zero_counts
+
+    def get_row(self, filt: Filter, redshift: float) -> np.ndarray:
+        """
+        Get the row of the projection matrix for one filter, which turns an
+        f_nu spectrum in maggies into the maggies through the filter
+
+        :param filt: sedpy filter
+        :param redshift: Redshift of the source
+        :return: Array of weights, with the same length as the grid.
+            If the filter does not overlap the grid, all weights are NaN.
+        """
+        support = self.get_support(filt, redshift)
+        weights = self.get_weights(filt, redshift, support)
+        if weights is None:
+            return np.full(len(self.wavelengths), np.nan)
+        row = np.zeros(len(self.wavelengths))
+        row[support] = weights
+        return row
+
+    def project(
+        self, seds: np.ndarray, redshift: float, filters: tuple[str, ...]
+    ) -> np.ndarray:
+        """
+        Project spectra onto filters, integrating only over the wavelengths
+        each filter transmits, without building or caching a matrix
+
+        :param seds: Spectrum with shape (n_wave,), or spectra with
+            shape (n_sample, n_wave)
+        :param redshift: Redshift of the source
+        :param filters: Names of the filters
+        :return: Maggies with shape (n_filters,) or (n_sample, n_filters)
+        """
+        seds = np.asarray(seds, dtype=float)
+        maggies = np.full(seds.shape[:-1] + (len(filters),), np.nan)
+        for i, name in enumerate(filters):
+            filt = get_filter(name)
+            support = self.get_support(filt, redshift)
+            weights = self.get_weights(filt, redshift, support)
+            if weights is not None:
+                maggies[..., i] = seds[..., support] @ weights
+        return maggies
+
+
+def get_projection_grid(rest_wavelengths: np.ndarray) -> ProjectionGrid:
+    """
+    Get the cached redshift-independent projection for a wavelength grid
+
+    :param rest_wavelengths: Increasing array of rest-frame wavelengths, in Angstrom
+    :return: ProjectionGrid
+    """
+    for grid in _grid_cache:
+        if grid.matches(rest_wavelengths):
+            return grid
+
+    grid = ProjectionGrid(rest_wavelengths)
+    if len(_grid_cache) >= MAX_CACHED_GRIDS:
+        del _grid_cache[0]
+    _grid_cache.append(grid)
+    return grid
+
+
+def get_projection_matrix(
+    rest_wavelengths: np.ndarray, redshift: float, filters: tuple[str, ...]
+) -> np.ndarray:
+    """
+    Get the cached matrix projecting rest-frame f_nu spectra (in maggies,
+    observed at the given redshift) onto a set of filters.
+    The cache holds at most MAX_CACHE_BYTES of matrices.
+
+    :param rest_wavelengths: Increasing array of rest-frame wavelengths, in Angstrom
+    :param redshift: Redshift of the source
+    :param filters: Names of the filters
+    :return: Read-only matrix with shape (n_filters, n_wave)
+    """
+    global _cache_bytes  # pylint: disable=global-statement
+
+    grid = get_projection_grid(rest_wavelengths)
+    key = (grid.key, float(redshift), tuple(filters))
+    if key in _projection_cache:
+        return _projection_cache[key]
+
+    matrix = np.stack([grid.get_row(get_filter(name), redshift) for name in filters])
+    matrix.flags.writeable = False
+
+    while _projection_cache and _cache_bytes + matrix.nbytes > MAX_CACHE_BYTES:
+        # Evict the oldest entry
+        _cache_bytes -= _projection_cache.pop(next(iter(_projection_cache))).nbytes
+    _projection_cache[key] = matrix
+    _cache_bytes += matrix.nbytes
+    logger.debug(
+        f"Cached {matrix.shape} projection matrix for z={redshift:.4f} "
+        f"({_cache_bytes / 2**20:.1f} MiB cached)"
+    )
+    return matrix
+
+
+def get_projection_cache_info() -> dict[str, int]:
+    """
+    Get the number of cached grids and matrices, and the size of the matrices
+
+    :return: Dictionary with the number of grids, of matrices, and of bytes
+    """
+    return {
+        "n_grids": len(_grid_cache),
+        "n_matrices": len(_projection_cache),
+        "n_bytes": _cache_bytes,
+    }
+
+
+def clear_projection_cache():
+    """
+    Empty the caches of grids and projection matrices
+
+    :return: None
+    """
+    global _cache_bytes  # pylint: disable=global-statement
+    _grid_cache.clear()
+    _projection_cache.clear()
+    _cache_bytes = 0
+
+
+def project_maggies(
+    seds: np.ndarray,
+    rest_wavelengths: np.ndarray,
+    redshift: float,
+    filters: list[str] | tuple[str, ...],
+    cache: bool = True,
+) -> np.ndarray:
+    """
+    Project f_nu spectra in maggies onto a set of filters
+
+    :param seds: Spectrum with shape (n_wave,), or spectra with
+        shape (n_sample, n_wave)
+    :param rest_wavelengths: Rest-frame wavelengths of the spectra, in Angstrom
+    :param redshift: Redshift of the source
+    :param filters: Names of the filters
+    :param cache: Whether to cache the projection matrix for this redshift.
+        Disable this when the redshift changes on every call,
+        e.g. when it is a free parameter of the fit.
+    :return: Maggies with shape (n_filters,) or (n_sample, n_filters)
+    """
+    if not cache:
+        return get_projection_grid(rest_wavelengths).project(
+            seds, redshift, tuple(filters)
+        )
+    matrix = get_projection_matrix(rest_wavelengths, redshift, tuple(filters))
+    return np.asarray(seds, dtype=float) @ matrix.T
@@ -12,6 +12,8 @@ from requests.exceptions import HTTPError
 
 from galsynthspec.datamodels.galaxy import Galaxy
 from galsynthspec.skyportal import client, query_skyportal_by_name
+from galsynthspec.utils.archive import get_cone_request, query_archive
+from galsynthspec.utils.resilience import ServiceUnavailableError
 from galsynthspec.utils.tns import get_tns_by_name
 
 logger = logging.getLogger(__name__)
@@ -29,7 +31,7 @@ def load_source_info(name: str, use_cache: bool = True) -> pd.Series:
         if client.ping():
             try:
                 return query_skyportal_by_name(name)
-            except HTTPError as e:
+            except (HTTPError, ServiceUnavailableError) as e:
                 logger.debug(f"Error querying SkyPortal for {name}: {e}")
                 logger.debug("Falling back to TNS query.")
 
@@ -54,10 +56,16 @@ def query_by_name(name: str, use_cache: bool = True) -> Galaxy:
 
     src_position = SkyCoord(src_ra, src_dec, unit="deg")
 
-    catalog_data = Catalogs.query_region(  # pylint: disable=no-member
-        src_position,
-        radius=10.0 * u.arcsec,  # pylint: disable=no-member
-        catalog="Panstarrs",
+    catalog_data = query_archive(
+        "mast",
+        get_cone_request(
+            "Catalogs.query_region", src_position, 10.0, catalog="Panstarrs"
+        ),
+        lambda: Catalogs.query_region(  # pylint: disable=no-member
+            src_position,
+            radius=10.0 * u.arcsec,  # pylint: disable=no-member
+            catalog="Panstarrs",
+        ),
     )
 
     if len(catalog_data) > 1:
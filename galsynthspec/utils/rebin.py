@@ -0,0 +1,118 @@
+"""
+Module for restricting and rebinning sampled SEDs onto a coarser
+log-spaced wavelength grid, conserving flux.
+
+SEDs are in f_nu (maggies), so rebinning conserves the integral of f_nu
+over frequency within each new bin.
+"""
+
+import logging
+
+import numpy as np
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+
+def get_bin_edges(wavelengths: np.ndarray) -> np.ndarray:
+    """
+    Get the edges of wavelength bins centred (in log) on each wavelength
+
+    :param wavelengths: Increasing array of wavelengths
+    :return: Array of bin edges, one longer than wavelengths
+    """
+    log_wave = np.log(wavelengths)
+    mid = 0.5 * (log_wave[1:] + log_wave[:-1])
+    first = 2.0 * log_wave[0] - mid[0]
+    last = 2.0 * log_wave[-1] - mid[-1]
+    return np.exp(np.concatenate([[first], mid, [last]]))
+
+
+def get_rebin_matrix(
+    wavelengths: np.ndarray, new_edges: np.ndarray
+) -> sparse.csr_matrix:
+    """
+    Get the sparse matrix which rebins f_nu from one wavelength grid onto new bins,
+    weighting each old bin by its overlap in frequency with each new bin
+
+    :param wavelengths: Increasing array of wavelengths of the SED
+    :param new_edges: Increasing array of edges of the new bins
+    :return: Matrix with shape (n_new, n_old)
+    """
+    old_edges = get_bin_edges(wavelengths)
+
+    rows, cols, values = [], [], []
+    for j, (low, high) in enumerate(zip(new_edges[:-1], new_edges[1:])):
+        start = max(np.searchsorted(old_edges, low, side="right") - 1, 0)
+        stop = min(np.searchsorted(old_edges, high, side="left"), len(wavelengths))
+        idx = np.arange(start, stop)
+        overlap_low = np.maximum(old_edges[idx], low)
+        overlap_high = np.minimum(old_edges[idx + 1], high)
+        # Frequency is proportional to 1/wavelength
+        overlap = np.clip(1.0 / overlap_low - 1.0 / overlap_high, 0.0, None)
+        rows.append(np.full(len(idx), j))
+        cols.append(idx)
+        values.append(overlap / (1.0 / low - 1.0 / high))
+
+    return sparse.csr_matrix(
+        (np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(len(new_edges) - 1, len(wavelengths)),
+    )
+
+
+class SEDRebinner:  # pylint: disable=too-few-public-methods
+    """
+    Restrict sampled SEDs to a wavelength range,
+    and optionally rebin them onto a log-spaced grid
+    """
+
+    def __init__(
+        self,
+        wavelengths: np.ndarray,
+        min_wavelength: float | None = None,
+        max_wavelength: float | None = None,
+        n_wavelength: int | None = None,
+    ):
+        """
+        :param wavelengths: Increasing array of wavelengths of the SEDs
+        :param min_wavelength: Minimum wavelength to keep, or None for no limit
+        :param max_wavelength: Maximum wavelength to keep, or None for no limit
+        :param n_wavelength: Number of log-spaced bins to rebin onto,
+            or None to keep the original wavelengths in the range
+        """
+        wavelengths = np.asarray(wavelengths, dtype=float)
+        low = wavelengths[0] if min_wavelength is None else min_wavelength
+        high = wavelengths[-1] if max_wavelength is None else max_wavelength
+
+        mask = (wavelengths >= low) & (wavelengths <= high)
+        if not np.any(mask):
+            raise ValueError(
+                f"No SED wavelengths between {low:.1f} and {high:.1f} Angstrom"
+            )
+
+        self.matrix = None
+        if n_wavelength is None:
+            self.index = np.flatnonzero(mask)
+            self.wavelengths = wavelengths[self.index]
+        else:
+            self.index = None
+            low, high = max(low, wavelengths[0]), min(high, wavelengths[-1])
+            new_edges = np.geomspace(low, high, n_wavelength + 1)
+            self.wavelengths = np.sqrt(new_edges[1:] * new_edges[:-1])
+            self.matrix = get_rebin_matrix(wavelengths, new_edges)
+
+        logger.debug(
+            f"Rebinning SEDs from {len(wavelengths)} to "
+            f"{len(self.wavelengths)} wavelengths"
+        )
+
+    def __call__(self, seds: np.ndarray) -> np.ndarray:
+        """
+        Restrict and rebin SEDs
+
+        :param seds: Array of SEDs, with shape (n_sample, n_wave)
+        :return: Array of SEDs on the new grid, with the same dtype
+        """
+        if self.matrix is None:
+            return seds[:, self.index]
+        return np.asarray(self.matrix.dot(seds.T).T, dtype=seds.dtype)
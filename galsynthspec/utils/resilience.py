@@ -0,0 +1,327 @@
+"""
+Module for protecting the archives, and the pipeline, from each other.
+
+Every archive query passes through the guard of its service, which
+rate-limits queries with a token bucket, retries transient failures with
+jittered exponential backoff within a retry budget, and opens a circuit
+breaker after repeated failures. While a breaker is open, queries to that
+service fail immediately with ServiceUnavailableError, so that callers can
+skip the service rather than waiting on it.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, TypeVar
+
+import numpy as np
+import requests
+from pyvo.dal.exceptions import DALServiceError
+
+from galsynthspec.datamodels.archive import ServicePolicy
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ServiceUnavailableError(requests.exceptions.ConnectionError):
+    """
+    Error raised when the circuit breaker of a service is open
+    """
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Check whether an error is a transient failure of the service
+
+    :param error: Exception raised by a query
+    :return: Whether the query should be retried
+    """
+    if isinstance(error, ServiceUnavailableError):
+        return False
+    if isinstance(error, requests.HTTPError):
+        # Gaia raises HTTPError without a response when the service fails
+        return (
+            error.response is None
+            or error.response.status_code in RETRYABLE_STATUS_CODES
+        )
+    if isinstance(error, DALServiceError):
+        # IRSA raises DALServiceError, with the HTTP status code if there is one
+        return error.code is None or error.code in RETRYABLE_STATUS_CODES
+    return isinstance(
+        error,
+        (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError),
+    )
+
+
+def get_retry_after(error: Exception) -> float | None:
+    """
+    Get the delay requested by a throttled service, if any
+
+    :param error: Exception raised by a query
+    :return: Delay in seconds, or None
+    """
+    response = getattr(error, "response", None)
+    if response is None or response.status_code != 429:
+        return None
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter, shared by all threads querying a service
+    """
+
+    def __init__(self, rate: float, burst: int):
+        """
+        :param rate: Number of tokens added per second
+        :param burst: Maximum number of tokens
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Take a token, borrowing it from the future if the bucket is empty
+
+        :return: Time to wait before using the token, in seconds
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= 1.0
+            return max(0.0, -self.tokens / self.rate)
+
+    def acquire(self):
+        """
+        Wait until a token is available, and take it
+
+        :return: None
+        """
+        wait = self.reserve()
+        if wait > 0.0:
+            time.sleep(wait)
+
+
+class RetryBudget:
+    """
+    Limit on the number of retries in a sliding window, relative to the number
+    of queries, so that retries cannot multiply the load on a failing service
+    """
+
+    def __init__(self, ratio: float, min_retries: int, window: float):
+        """
+        :param ratio: Maximum number of retries as a fraction of the queries
+        :param min_retries: Number of retries always allowed in the window
+        :param window: Length of the window, in seconds
+        """
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self.queries = deque()
+        self.retries = deque()
+        self.lock = threading.Lock()
+
+    def _expire(self, now: float):
+        for times in (self.queries, self.retries):
+            while times and now - times[0] > self.window:
+                times.popleft()
+
+    def record_query(self):
+        """
+        Record a new query
+
+        :return: None
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._expire(now)
+            self.queries.append(now)
+
+    def try_retry(self) -> bool:
+        """
+        Spend a retry from the budget, if any is left
+
+        :return: Whether a retry is allowed
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._expire(now)
+            if len(self.retries) >= self.min_retries + self.ratio * len(self.queries):
+                return False
+            self.retries.append(now)
+            return True
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker, which opens after consecutive failures and lets a single
+    trial query through once the reset timeout has passed
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        """
+        :param failure_threshold: Number of consecutive failures to open
+        :param reset_timeout: Time before a trial query is allowed, in seconds
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Check whether a query may be sent
+
+        :return: Whether the query is allowed
+        """
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            if (
+                self.state == OPEN
+                and time.monotonic() - self.opened_at >= self.reset_timeout
+            ):
+                self.state = HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        """
+        Record a successful query, closing the breaker
+
+        :return: None
+        """
+        with self.lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> bool:
+        """
+        Record a failed query
+
+        :return: Whether the breaker opened
+        """
+        with self.lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                opened = self.state != OPEN
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                return opened
+            return False
+
+    def release(self):
+        """
+        Release a trial query which neither succeeded nor failed,
+        so that the next query is let through as the trial instead
+
+        :return: None
+        """
+        with self.lock:
+            if self.state == HALF_OPEN:
+                self.state = OPEN
+
+
+class ServiceGuard:
+    """
+    Rate limiter, retry budget and circuit breaker of one service
+    """
+
+    def __init__(self, service: str, policy: ServicePolicy, seed: int | None = None):
+        """
+        :param service: Name of the service
+        :param policy: Options for the service
+        :param seed: Seed for the backoff jitter
+        """
+        self.service = service
+        self.policy = policy
+        self.bucket = TokenBucket(policy.rate, policy.burst)
+        self.budget = RetryBudget(
+            policy.retry_ratio, policy.min_retries, policy.budget_window
+        )
+        self.breaker = CircuitBreaker(policy.failure_threshold, policy.reset_timeout)
+        self.rng = np.random.default_rng(seed)
+
+    def get_backoff(self, attempt: int, error: Exception) -> float:
+        """
+        Get the delay before a retry, with full jitter,
+        or the delay requested by the service if it is longer
+
+        :param attempt: Number of the retry, starting from 0
+        :param error: Exception raised by the failed query
+        :return: Delay in seconds
+        """
+        cap = min(self.policy.max_backoff, self.policy.backoff * 2.0**attempt)
+        delay = float(self.rng.uniform(0.0, cap))
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.policy.max_backoff))
+        return delay
+
+    def check(self):
+        """
+        Raise an error if the circuit breaker is open
+
+        :return: None
+        """
+        if not self.breaker.allow():
+            raise ServiceUnavailableError(
+                f"Circuit breaker for {self.service} is open, skipping query"
+            )
+
+    def call(self, fetch: Callable[[], T]) -> T:
+        """
+        Run a query, retrying transient failures
+
+        :param fetch: Function which runs the query
+        :return: Result of the query
+        """
+        self.check()
+        self.budget.record_query()
+
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            try:
+                result = fetch()
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                if not is_retryable(error):
+                    self.breaker.release()
+                    raise
+                if self.breaker.record_failure():
+                    logger.warning(
+                        f"Opened the circuit breaker for {self.service} after "
+                        f"repeated failures. Queries will be skipped for "
+                        f"{self.policy.reset_timeout:.0f} s"
+                    )
+                if attempt >= self.policy.max_retries or not self.budget.try_retry():
+                    raise
+                delay = self.get_backoff(attempt, error)
+                logger.info(
+                    f"Query to {self.service} failed ({error}), "
+                    f"retrying in {delay:.1f} s"
+                )
+                time.sleep(delay)
+                attempt += 1
+                self.check()
+            else:
+                self.breaker.record_success()
+                return result
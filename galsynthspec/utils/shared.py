@@ -0,0 +1,198 @@
+"""
+Module for sharing large arrays, such as posterior chains, with worker processes
+without copying them.
+
+Arrays can either be placed in shared memory, for workers on the same node,
+or saved as memory-mapped .npy files, which can also be read by other nodes.
+Workers receive a small picklable SharedArray handle, and attach to the array.
+"""
+
+import logging
+import os
+import sys
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+
+import numpy as np
+from pydantic import BaseModel, Field, model_validator
+
+from galsynthspec.utils.io import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# Shared memory segments created or attached in this process, kept open while in use
+_attached: dict[str, SharedMemory] = {}
+
+
+class SharedArray(BaseModel):
+    """
+    Base model for a picklable handle to an array in shared memory
+    or in a memory-mapped .npy file
+    """
+
+    shape: tuple[int, ...] = Field(description="Shape of the array")
+    dtype: str = Field(description="Numpy dtype of the array")
+    shm_name: str | None = Field(
+        description="Name of the shared memory segment", default=None
+    )
+    path: Path | None = Field(description="Path to the .npy file", default=None)
+    tracker_id: int | None = Field(
+        description="ID of the resource tracker of the process which created "
+        "the shared memory segment",
+        default=None,
+    )
+
+    @model_validator(mode="after")
+    def validate_location(self):
+        """
+        Validate that exactly one of shm_name and path is set
+        """
+        if (self.shm_name is None) == (self.path is None):
+            raise ValueError("Exactly one of shm_name and path must be set")
+        return self
+
+    def attach(self, writeable: bool = False) -> np.ndarray:
+        """
+        Attach to the array, without copying it
+
+        :param writeable: If True, the array can be modified in place
+        :return: Array
+        """
+        if self.path is not None:
+            return np.load(self.path, mmap_mode="r+" if writeable else "r")
+
+        shm = _attached.get(self.shm_name)
+        if shm is None:
+            shm = open_shared_memory(self.shm_name, tracker_id=self.tracker_id)
+            _attached[self.shm_name] = shm
+
+        array = np.ndarray(self.shape, dtype=self.dtype, buffer=shm.buf)
+        array.flags.writeable = writeable
+        return array
+
+
+def get_tracker_id() -> int | None:
+    """
+    Get an ID for the resource tracker of this process. Child processes share
+    the tracker of their parent through a pipe, so the inode of the pipe
+    identifies the tracker in every process which shares it.
+
+    :return: Inode of the pipe to the tracker, or None if it is not running
+    """
+    # pylint: disable-next=protected-access
+    fd = resource_tracker._resource_tracker._fd
+    if fd is None:
+        return None
+    try:
+        return os.fstat(fd).st_ino
+    except OSError:
+        return None
+
+
+def open_shared_memory(name: str, tracker_id: int | None = None) -> SharedMemory:
+    """
+    Open an existing shared memory segment, without making this process
+    responsible for unlinking it
+
+    :param name: Name of the segment
+    :param tracker_id: ID of the resource tracker of the process which
+        created the segment, if known
+    :return: SharedMemory
+    """
+    if sys.version_info >= (3, 13):
+        # pylint: disable-next=unexpected-keyword-arg
+        return SharedMemory(name=name, track=False)
+
+    # Before python 3.13, attaching registers the segment with the resource
+    # tracker, which would unlink it when this process exits. Child processes
+    # share the tracker of the creator, where the segment is already
+    # registered, and unregistering it there would leak it if the creator
+    # crashed. Only a process with its own tracker unregisters it.
+    shared_tracker = tracker_id is not None and get_tracker_id() == tracker_id
+    shm = SharedMemory(name=name)
+    if not shared_tracker:
+        # pylint: disable-next=protected-access
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+class SharedArrays:
+    """
+    Context manager which places arrays in shared memory,
+    and frees the shared memory on exit
+    """
+
+    def __init__(
+        self,
+        arrays: dict[str, np.ndarray] | None = None,
+        empty: dict[str, tuple[tuple[int, ...], str]] | None = None,
+    ):
+        """
+        :param arrays: Arrays to copy into shared memory
+        :param empty: Shape and dtype of zero-filled arrays to allocate
+            in shared memory, for workers to fill in place
+        """
+        self.arrays = {} if arrays is None else arrays
+        self.empty = {} if empty is None else empty
+        self.handles: dict[str, SharedArray] = {}
+        self._segments: list[SharedMemory] = []
+
+    def _allocate(self, key: str, shape: tuple[int, ...], dtype) -> np.ndarray:
+        """
+        Allocate a zero-filled array in shared memory
+
+        :param key: Key for the array
+        :param shape: Shape of the array
+        :param dtype: Dtype of the array
+        :return: Array backed by the shared memory
+        """
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        shm = SharedMemory(create=True, size=max(nbytes, 1))
+        self._segments.append(shm)
+        _attached[shm.name] = shm
+        self.handles[key] = SharedArray(
+            shape=tuple(shape),
+            dtype=dtype.str,
+            shm_name=shm.name,
+            tracker_id=get_tracker_id(),
+        )
+        array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        array[...] = 0
+        return array
+
+    def __enter__(self) -> dict[str, SharedArray]:
+        for key, value in self.arrays.items():
+            self._allocate(key, value.shape, value.dtype)[...] = value
+        for key, (shape, dtype) in self.empty.items():
+            self._allocate(key, shape, dtype)
+        return self.handles
+
+    def __exit__(self, *exc):
+        for shm in self._segments:
+            _attached.pop(shm.name, None)
+            shm.close()
+            shm.unlink()
+        self._segments = []
+
+
+def save_memmap(arrays: dict[str, np.ndarray], prefix: Path) -> dict[str, SharedArray]:
+    """
+    Save arrays as .npy files named '<prefix>_<key>.npy', which workers can
+    memory-map without loading them into memory
+
+    :param arrays: Arrays to save
+    :param prefix: Path prefix for the files
+    :return: Dictionary of SharedArray handles
+    """
+    handles = {}
+    for key, value in arrays.items():
+        out_path = prefix.parent / f"{prefix.name}_{key}.npy"
+        logger.info(f"Saving {key} to {out_path}")
+        with atomic_write(out_path) as tmp_path:
+            np.save(tmp_path, value)
+        handles[key] = SharedArray(
+            shape=value.shape, dtype=value.dtype.str, path=out_path
+        )
+    return handles
@@ -0,0 +1,123 @@
+"""
+Module for estimating quantiles of sampled SEDs without keeping every sample
+in memory.
+
+Each wavelength has a histogram of log10(flux), with a range fixed by the first
+chunk of samples, so memory is bounded by the number of wavelengths and bins
+rather than by the number of samples.
+"""
+
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_N_BINS = 200
+
+# Padding of the histogram range, in dex, beyond the range of the first chunk
+MIN_PADDING_DEX = 0.5
+
+
+class SEDQuantileSketch:
+    """
+    Online histogram sketch of the flux distribution at each wavelength
+    """
+
+    def __init__(self, n_wave: int, n_bins: int = DEFAULT_N_BINS):
+        """
+        :param n_wave: Number of wavelengths
+        :param n_bins: Number of histogram bins per wavelength
+        """
+        self.n_wave = n_wave
+        self.n_bins = n_bins
+        self.n_sample = 0
+        self.lower: np.ndarray | None = None
+        self.width: np.ndarray | None = None
+        # Bin 0 counts samples below the range, and bin n_bins + 1 above it
+        self.counts = np.zeros((n_bins + 2, n_wave), dtype=np.uint32)
+
+    @staticmethod
+    def _log_flux(seds: np.ndarray) -> np.ndarray:
+        """
+        Convert fluxes to log10, with -inf for non-positive fluxes
+
+        :param seds: Array of SEDs
+        :return: log10 of the fluxes
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log_flux = np.log10(seds)
+        return np.where(np.isnan(log_flux), -np.inf, log_flux)
+
+    def _set_range(self, log_flux: np.ndarray):
+        """
+        Set the histogram range for each wavelength from the first chunk
+
+        :param log_flux: log10 fluxes of the first chunk
+        :return: None
+        """
+        finite = np.isfinite(log_flux)
+        low = np.where(finite, log_flux, np.inf).min(axis=0)
+        high = np.where(finite, log_flux, -np.inf).max(axis=0)
+        empty = ~np.isfinite(low)
+        low[empty], high[empty] = 0.0, 0.0
+
+        padding = 0.5 * (high - low) + MIN_PADDING_DEX
+        self.lower = low - padding
+        self.width = (high - low + 2.0 * padding) / self.n_bins
+
+    def update(self, seds: np.ndarray):
+        """
+        Add a chunk of sampled SEDs to the sketch
+
+        :param seds: Array of SEDs, with shape (n_sample, n_wave)
+        :return: None
+        """
+        seds = np.atleast_2d(seds)
+        if seds.shape[1] != self.n_wave:
+            raise ValueError(
+                f"SEDs have {seds.shape[1]} wavelengths, expected {self.n_wave}"
+            )
+
+        log_flux = self._log_flux(seds)
+        if self.lower is None:
+            self._set_range(log_flux)
+
+        with np.errstate(invalid="ignore"):
+            idx = np.floor((log_flux - self.lower) / self.width)
+        idx = np.clip(np.nan_to_num(idx, neginf=-1.0), -1, self.n_bins) + 1
+        flat_idx = idx.astype(np.intp) * self.n_wave + np.arange(self.n_wave)
+        self.counts += (
+            np.bincount(flat_idx.ravel(), minlength=self.counts.size)
+            .reshape(self.counts.shape)
+            .astype(np.uint32)
+        )
+        self.n_sample += len(seds)
+
+    def quantile(self, q: float | list[float]) -> np.ndarray:
+        """
+        Estimate quantiles of the flux at each wavelength,
+        interpolating linearly in log10(flux) within each bin.
+        Samples outside the histogram range are counted at its edges.
+
+        :param q: Quantile, or list of quantiles
+        :return: Flux quantiles, with shape (n_wave,) or (len(q), n_wave)
+        """
+        if self.n_sample == 0:
+            raise ValueError("No samples have been added to the sketch")
+
+        quantiles = np.atleast_1d(np.asarray(q, dtype=float))
+        cumulative = np.cumsum(self.counts, axis=0, dtype=np.float64)
+        columns = np.arange(self.n_wave)
+
+        result = np.empty((len(quantiles), self.n_wave))
+        for i, quantile in enumerate(quantiles):
+            target = quantile * self.n_sample
+            k = np.minimum((cumulative < target).sum(axis=0), self.n_bins + 1)
+            previous = np.where(k > 0, cumulative[np.maximum(k - 1, 0), columns], 0.0)
+            count = self.counts[k, columns]
+            frac = np.where(count > 0, (target - previous) / np.maximum(count, 1), 0.0)
+            position = np.clip(k - 1 + frac, 0.0, self.n_bins)
+            result[i] = 10.0 ** (self.lower + position * self.width)
+
+        return result[0] if np.ndim(q) == 0 else result
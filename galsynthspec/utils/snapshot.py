@@ -0,0 +1,382 @@
+"""
+Module for answering catalogue queries from local snapshots.
+
+A snapshot of a catalogue is a directory of Parquet files, one per HEALPix
+pixel (nested ordering), holding the columns used by the download functions,
+with a metadata file giving the HEALPix resolution, the position columns and
+the footprint of pixels which the snapshot covers completely. A cone search
+reads only the partitions overlapping the cone, and matches any number of
+positions against them at once. Results have the layout of the archive
+query they replace, so the download functions work unchanged.
+"""
+
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from astropy import units as u
+from astropy.coordinates import ICRS, Angle, SkyCoord, search_around_sky
+from astropy.table import Table
+from pydantic import BaseModel, Field
+
+try:
+    from astropy_healpix import HEALPix
+except ImportError:  # pragma: no cover
+    HEALPix = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_METADATA_NAME = "metadata.json"
+DEFAULT_NSIDE = 64
+MAX_CACHED_PARTITIONS = 512
+
+
+class SnapshotSpec(BaseModel):
+    """
+    Base model for the archive query which a catalogue snapshot replaces
+    """
+
+    function: str = Field(description="Name of the query function")
+    catalog: str | None = Field(
+        description="Name of the catalogue in the query, if any", default=None
+    )
+    distance_column: str = Field(
+        description="Name of the column with the distance from the position",
+        default="distance_arcsec",
+    )
+    distance_unit: str = Field(
+        description="Unit of the distance column", default="arcsec"
+    )
+    none_if_empty: bool = Field(
+        description="Whether the query returns None rather than an empty table",
+        default=False,
+    )
+
+
+SNAPSHOT_CATALOGUES = {
+    "sdss": SnapshotSpec(function="SDSS.query_crossid", none_if_empty=True),
+    "panstarrs": SnapshotSpec(
+        function="Catalogs.query_region",
+        catalog="Panstarrs",
+        distance_column="distance",
+        distance_unit="deg",
+    ),
+    "galex": SnapshotSpec(
+        function="Catalogs.query_region",
+        catalog="Galex",
+        distance_column="distance_arcmin",
+        distance_unit="arcmin",
+    ),
+    "twomass_xsc": SnapshotSpec(function="Irsa.query_region", catalog="ext_src_cat"),
+    "twomass_psc": SnapshotSpec(function="Gaia.launch_job_async"),
+    "allwise": SnapshotSpec(function="Irsa.query_region", catalog="allwise_p3as_psd"),
+}
+
+
+def get_healpix(nside: int) -> "HEALPix":
+    """
+    Get a nested HEALPix grid
+
+    :param nside: HEALPix resolution
+    :return: HEALPix
+    """
+    if HEALPix is None:
+        raise ImportError(
+            "Catalogue snapshots need astropy-healpix and pyarrow. "
+            "Install them with 'pip install astropy-healpix pyarrow'."
+        )
+    return HEALPix(nside=nside, order="nested", frame=ICRS())
+
+
+def get_snapshot_name(request: dict) -> str | None:
+    """
+    Get the name of the catalogue snapshot which can answer a request
+
+    :param request: Description of the request
+    :return: Name of the catalogue, or None
+    """
+    for name, spec in SNAPSHOT_CATALOGUES.items():
+        if (
+            request.get("function") == spec.function
+            and request.get("catalog") == spec.catalog
+        ):
+            return name
+    return None
+
+
+def to_table(rows: pd.DataFrame) -> Table:
+    """
+    Convert catalogue rows to a table, masking missing values
+    in the same way as the archives
+
+    :param rows: DataFrame of catalogue rows
+    :return: Table
+    """
+    return Table(
+        {
+            name: (
+                np.ma.masked_invalid(column.to_numpy())
+                if pd.api.types.is_float_dtype(column)
+                else column.to_numpy()
+            )
+            for name, column in rows.items()
+        }
+    )
+
+
+def write_catalogue_snapshot(  # pylint: disable=too-many-arguments
+    df: pd.DataFrame,
+    out_dir: Path,
+    *,
+    nside: int = DEFAULT_NSIDE,
+    ra_column: str = "ra",
+    dec_column: str = "dec",
+    footprint: list[int] | None = None,
+):
+    """
+    Write a catalogue extract as a HEALPix-partitioned snapshot
+
+    :param df: Catalogue rows, with the columns used by the download functions
+    :param out_dir: Directory of the snapshot, named after the catalogue
+    :param nside: HEALPix resolution of the partitions
+    :param ra_column: Name of the right ascension column, in degrees
+    :param dec_column: Name of the declination column, in degrees
+    :param footprint: Pixels which the extract covers completely.
+        If None, the pixels with at least one row are used
+    :return: None
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    pixels = get_healpix(nside).lonlat_to_healpix(
+        df[ra_column].to_numpy() * u.deg,  # pylint: disable=no-member
+        df[dec_column].to_numpy() * u.deg,  # pylint: disable=no-member
+    )
+    for pixel, rows in df.groupby(pixels):
+        rows.to_parquet(out_dir / f"hpx_{pixel}.parquet", index=False)
+
+    metadata = {
+        "nside": nside,
+        "ra_column": ra_column,
+        "dec_column": dec_column,
+        "pixels": sorted(
+            int(x) for x in (np.unique(pixels) if footprint is None else footprint)
+        ),
+    }
+    (out_dir / SNAPSHOT_METADATA_NAME).write_text(json.dumps(metadata), encoding="utf8")
+    logger.info(
+        f"Wrote snapshot of {len(df)} rows in {len(metadata['pixels'])} "
+        f"pixels to {out_dir}"
+    )
+
+
+class CatalogueSnapshot:
+    """
+    HEALPix-partitioned snapshot of one catalogue
+    """
+
+    def __init__(self, path: Path, spec: SnapshotSpec):
+        """
+        :param path: Directory of the snapshot
+        :param spec: Archive query which the snapshot replaces
+        """
+        self.path = Path(path)
+        self.spec = spec
+        metadata = json.loads(
+            (self.path / SNAPSHOT_METADATA_NAME).read_text(encoding="utf8")
+        )
+        self.healpix = get_healpix(metadata["nside"])
+        self.position_columns = (metadata["ra_column"], metadata["dec_column"])
+        self.footprint = frozenset(metadata["pixels"])
+        self.partitions: dict[int, pd.DataFrame] = {}
+        self.lock = threading.Lock()
+
+    def get_cone_pixels(self, src_position: SkyCoord, radius_arcsec: float) -> set:
+        """
+        Get the pixels overlapping a cone
+
+        :param src_position: Centre of the cone
+        :param radius_arcsec: Radius of the cone in arcseconds
+        :return: Set of pixels
+        """
+        return set(
+            self.healpix.cone_search_lonlat(
+                src_position.ra,
+                src_position.dec,
+                radius_arcsec * u.arcsec,  # pylint: disable=no-member
+            ).tolist()
+        )
+
+    def covers(self, src_position: SkyCoord, radius_arcsec: float) -> bool:
+        """
+        Check whether the snapshot covers a cone completely
+
+        :param src_position: Centre of the cone
+        :param radius_arcsec: Radius of the cone in arcseconds
+        :return: Whether every pixel of the cone is in the footprint
+        """
+        return self.get_cone_pixels(src_position, radius_arcsec) <= self.footprint
+
+    def load_partition(self, pixel: int) -> pd.DataFrame:
+        """
+        Load the rows of one pixel, which are cached
+
+        :param pixel: HEALPix pixel
+        :return: DataFrame of catalogue rows
+        """
+        with self.lock:
+            if pixel in self.partitions:
+                return self.partitions[pixel]
+
+        path = self.path / f"hpx_{pixel}.parquet"
+        rows = pd.read_parquet(path) if path.exists() else pd.DataFrame()
+
+        with self.lock:
+            if len(self.partitions) >= MAX_CACHED_PARTITIONS:
+                # Evict the oldest entry
+                del self.partitions[next(iter(self.partitions))]
+            self.partitions[pixel] = rows
+        return rows
+
+    def get_result(self, rows: pd.DataFrame, separation: Angle) -> Table | None:
+        """
+        Get the matches of one position, in the layout of the archive query
+
+        :param rows: Matching catalogue rows
+        :param separation: Distance of each row from the position
+        :return: Table sorted by distance, or None if the query would return None
+        """
+        if len(rows) == 0 and self.spec.none_if_empty:
+            return None
+        order = np.argsort(separation)
+        rows = rows.iloc[order].reset_index(drop=True)
+        rows[self.spec.distance_column] = separation[order].to_value(
+            self.spec.distance_unit
+        )
+        return to_table(rows)
+
+    def cone_search_many(
+        self, positions: SkyCoord, radius_arcsec: float
+    ) -> list[Table | None]:
+        """
+        Find the catalogue rows within a radius of each of many positions,
+        matching all positions against the overlapping partitions at once
+
+        :param positions: Array of positions
+        :param radius_arcsec: Radius of the search in arcseconds
+        :return: Result for each position, as from the archive query
+        """
+        positions = positions.reshape(-1)
+        pixels = set().union(
+            *(self.get_cone_pixels(position, radius_arcsec) for position in positions)
+        )
+        partitions = [self.load_partition(pixel) for pixel in sorted(pixels)]
+        partitions = [x for x in partitions if len(x) > 0]
+        if len(partitions) == 0:
+            no_match = Angle(np.zeros(0), unit="deg")
+            return [self.get_result(pd.DataFrame(), no_match) for _ in positions]
+        rows = pd.concat(partitions, ignore_index=True)
+
+        ra_column, dec_column = self.position_columns
+        coords = SkyCoord(
+            rows[ra_column].to_numpy(), rows[dec_column].to_numpy(), unit="deg"
+        )
+        idx_position, idx_row, separation, _ = search_around_sky(
+            positions, coords, radius_arcsec * u.arcsec  # pylint: disable=no-member
+        )
+
+        order = np.argsort(idx_position, kind="stable")
+        bounds = np.searchsorted(idx_position[order], np.arange(len(positions) + 1))
+        return [
+            self.get_result(
+                rows.iloc[idx_row[order[start:end]]], separation[order[start:end]]
+            )
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ]
+
+    def cone_search(self, src_position: SkyCoord, radius_arcsec: float) -> Table | None:
+        """
+        Find the catalogue rows within a radius of a position
+
+        :param src_position: Position of the search
+        :param radius_arcsec: Radius of the search in arcseconds
+        :return: Result as from the archive query
+        """
+        return self.cone_search_many(src_position, radius_arcsec)[0]
+
+
+class SnapshotBackend:
+    """
+    Set of catalogue snapshots, answering the archive queries they cover
+    """
+
+    def __init__(self, snapshot_dir: Path):
+        """
+        :param snapshot_dir: Directory with one snapshot directory per catalogue,
+            named as in SNAPSHOT_CATALOGUES
+        """
+        self.snapshot_dir = Path(snapshot_dir)
+        self.catalogues = {
+            name: CatalogueSnapshot(self.snapshot_dir / name, spec)
+            for name, spec in SNAPSHOT_CATALOGUES.items()
+            if (self.snapshot_dir / name / SNAPSHOT_METADATA_NAME).exists()
+        }
+        self.prefetched: dict[tuple, Any] = {}
+        logger.info(
+            f"Using catalogue snapshots {sorted(self.catalogues)} "
+            f"from {self.snapshot_dir}"
+        )
+
+    def answer(self, request: dict) -> tuple[bool, Any]:
+        """
+        Answer a request from the snapshots, if they cover it
+
+        :param request: Description of the request
+        :return: Whether the request was answered, and the result
+        """
+        name = get_snapshot_name(request)
+        if name not in self.catalogues or "radius_arcsec" not in request:
+            return False, None
+
+        key = (name, request["ra"], request["dec"], request["radius_arcsec"])
+        if key in self.prefetched:
+            return True, self.prefetched[key]
+
+        catalogue = self.catalogues[name]
+        position = SkyCoord(request["ra"], request["dec"], unit="deg")
+        if not catalogue.covers(position, request["radius_arcsec"]):
+            return False, None
+        return True, catalogue.cone_search(position, request["radius_arcsec"])
+
+    def prefetch(self, positions: SkyCoord, radius_arcsec: float):
+        """
+        Answer the cone searches of many positions at once, in every catalogue,
+        so that later queries for those positions are served from memory.
+        Any previously prefetched results are discarded.
+
+        :param positions: Array of positions
+        :param radius_arcsec: Radius of the search in arcseconds
+        :return: None
+        """
+        positions = positions.reshape(-1)
+        self.prefetched = {}
+        for name, catalogue in self.catalogues.items():
+            covered = positions[
+                [catalogue.covers(position, radius_arcsec) for position in positions]
+            ]
+            if len(covered) == 0:
+                continue
+            results = catalogue.cone_search_many(covered, radius_arcsec)
+            for position, result in zip(covered, results):
+                key = (
+                    name,
+                    float(position.ra.deg),
+                    float(position.dec.deg),
+                    float(radius_arcsec),
+                )
+                self.prefetched[key] = result
+            logger.info(f"Prefetched {len(covered)} cone searches from {name}")
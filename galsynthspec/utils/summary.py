@@ -0,0 +1,126 @@
+"""
+Module for summarising the result of a fit, without plotting.
+"""
+
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from galsynthspec.datamodels.fitresult import FitResult
+from galsynthspec.datamodels.sed import SEDConfig
+from galsynthspec.utils.instrumentation import track_stage
+from galsynthspec.utils.io import atomic_write
+from galsynthspec.utils.sketch import SEDQuantileSketch
+
+logger = logging.getLogger(__name__)
+
+# Parameters which are summarised and plotted in log10
+LOG_PARAMETERS = ["mass"]
+
+SUMMARY_QUANTILES = [0.16, 0.5, 0.84]
+
+
+def get_summary_labels(res: FitResult) -> list[str]:
+    """
+    Get the label of each parameter, with LOG_PARAMETERS as log10(parameter)
+
+    :param res: The result of the fitting
+    :return: List of labels
+    """
+    return [
+        f"log10({param})" if param in LOG_PARAMETERS else param
+        for param in res.fit_parameters
+    ]
+
+
+def get_log_columns(res: FitResult) -> list[int]:
+    """
+    Get the indices of the LOG_PARAMETERS in the chain
+
+    :param res: The result of the fitting
+    :return: List of column indices
+    """
+    return [i for i, param in enumerate(res.fit_parameters) if param in LOG_PARAMETERS]
+
+
+def get_summary_values(res: FitResult) -> np.ndarray:
+    """
+    Get the chain values to summarise, with LOG_PARAMETERS in log10
+
+    :param res: The result of the fitting
+    :return: Array of values, with one column per parameter
+    """
+    values = np.array(res.chain, dtype=float)
+    log_columns = get_log_columns(res)
+    values[:, log_columns] = np.log10(values[:, log_columns])
+    return values
+
+
+def get_summary_quantiles(res: FitResult, quantiles: list[float]) -> np.ndarray:
+    """
+    Get weighted quantiles of every parameter, with LOG_PARAMETERS in log10.
+    The log is monotonic, so the quantiles are taken from the cached
+    quantiles of the chain.
+
+    :param res: The result of the fitting
+    :param quantiles: Quantiles to calculate
+    :return: Array of quantiles, with shape (len(quantiles), n_parameters)
+    """
+    result = res.get_chain_quantiles(list(quantiles))
+    log_columns = get_log_columns(res)
+    result[:, log_columns] = np.log10(result[:, log_columns])
+    return result
+
+
+def export_fit_summary(
+    labels: list[str], quantiles: np.ndarray, out_path: Path
+) -> pd.DataFrame:
+    """
+    Export the median and 1 sigma errors of each parameter to a JSON file
+
+    :param labels: Label of each parameter
+    :param quantiles: Values of each parameter at SUMMARY_QUANTILES
+    :param out_path: Output path
+    :return: DataFrame with the summary
+    """
+    low, med, high = quantiles
+    df = pd.DataFrame(
+        {
+            "parameter": labels,
+            "median": med,
+            "sigma-": med - low,
+            "sigma+": high - med,
+        }
+    )
+    print(df)
+    logger.info(f"Saving fit results to {out_path}")
+    with track_stage("write_json"), atomic_write(out_path) as tmp_path:
+        df.to_json(tmp_path)
+    return df
+
+
+def export_synthetic_sed(
+    res: FitResult,
+    sample_df: pd.DataFrame | SEDQuantileSketch,
+    out_path: Path,
+    sed_config: SEDConfig | None = None,
+) -> pd.DataFrame:
+    """
+    Export the median and 1 sigma error of the sampled SEDs to a JSON file
+
+    :param res: The result of the fitting
+    :param sample_df: DataFrame with the sampled SEDs, or a quantile sketch
+    :param out_path: Output path
+    :param sed_config: SED sampling options used to sample the SEDs
+    :return: DataFrame with the synthetic SED
+    """
+    new = pd.DataFrame()
+    new["wavelength"] = res.get_sed_wavelengths(sed_config) * (1 + res.get_redshift())
+    new["flux"] = sample_df.quantile(0.5)
+    new["sigma"] = 0.5 * (sample_df.quantile(0.84) - sample_df.quantile(0.16))
+    logger.info(f"Saving synthetic SED to {out_path}")
+    with track_stage("write_json"), atomic_write(out_path) as tmp_path:
+        new.to_json(tmp_path)
+    return new
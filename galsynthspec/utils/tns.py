@@ -12,6 +12,9 @@ from astropy.coordinates import SkyCoord
 
 from galsynthspec.paths import get_output_dir
 from galsynthspec.skyportal.query import strip_tns_name
+from galsynthspec.utils.archive import query_archive
+from galsynthspec.utils.instrumentation import track_stage
+from galsynthspec.utils.io import atomic_write
 
 logger = logging.getLogger(__name__)
 
@@ -42,7 +45,11 @@ def query_tns_by_name(
         f"{BASE_TNS_URL}{query_arg}{strip_tns_name(source_name)}"
         f"&include_frb=0&format=csv&page=0"
     )
-    response = requests.get(search_url, headers=TNS_HEADERS, timeout=10)
+    response = query_archive(
+        "tns",
+        {"method": "GET", "url": search_url},
+        lambda: requests.get(search_url, headers=TNS_HEADERS, timeout=10),
+    )
     csv_data = StringIO(response.text)
     return pd.read_csv(csv_data)
 
@@ -105,6 +112,7 @@ def get_tns_by_name(tns_name: str, use_cache: bool = True) -> pd.Series:
         logger.info(f"Downloading TNS data for {tns_name}")
         res = download_tns(tns_name)
         logger.info(f"Saving TNS data to {tns_file}")
-        res.to_json(tns_file)
+        with track_stage("write_json"), atomic_write(tns_file) as tmp_path:
+            res.to_json(tmp_path)
 
     return res
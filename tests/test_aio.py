@@ -0,0 +1,62 @@
+"""
+Module for testing the asyncio API
+"""
+
+import asyncio
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from galsynthspec.datamodels.archive import ArchiveConfig
+from galsynthspec.paths import data_dir
+from galsynthspec.run.aio import run_many
+from galsynthspec.utils.archive import use_archive_config
+
+NAMES = ["SN2099zzz", "SN2099zzy"]
+
+
+async def collect(galaxies, **kwargs) -> list:
+    """
+    Collect the runs yielded by run_many
+    """
+    return [run async for run in run_many(galaxies, **kwargs)]
+
+
+class TestAio(unittest.TestCase):
+    """
+    Class for testing the asyncio API
+    """
+
+    def tearDown(self):
+        for name in NAMES:
+            shutil.rmtree(data_dir / name, ignore_errors=True)
+
+    def test_failures(self):
+        """
+        Test that failed runs are yielded with their error, without stopping
+        the others, and that a given executor is left running
+
+        :return: None
+        """
+        with (
+            tempfile.TemporaryDirectory() as tmp_dir,
+            use_archive_config(ArchiveConfig(mode="replay", fixture_dir=tmp_dir)),
+            ThreadPoolExecutor(max_workers=1) as executor,
+        ):
+            # There are no recorded fixtures, so resolving the names fails
+            runs = asyncio.run(
+                collect(NAMES, use_cache=False, executor=executor, max_downloads=1)
+            )
+
+            self.assertEqual(sorted(run.target for run in runs), sorted(NAMES))
+            for run in runs:
+                self.assertFalse(run.ok)
+                self.assertIn("FileNotFoundError", run.error)
+                self.assertIsNone(run.galaxy)
+                self.assertIsNone(run.report)
+                self.assertGreaterEqual(run.total_seconds, run.download_seconds)
+
+            self.assertEqual(executor.submit(sum, [1, 2]).result(), 3)
+
+            self.assertEqual(asyncio.run(collect([], executor=executor)), [])
@@ -0,0 +1,164 @@
+"""
+Module for testing the recorded archive transport
+"""
+
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+import numpy as np
+import requests
+from astropy.table import Table
+
+from galsynthspec.datamodels.archive import ArchiveConfig, ServicePolicy
+from galsynthspec.utils.archive import (
+    ArchiveTransport,
+    make_response,
+    query_archive,
+    use_archive_config,
+)
+
+REQUEST = {"function": "query", "ra": 10.0, "dec": -5.0}
+NO_RETRIES = {"tns": ServicePolicy(max_retries=0)}
+TOKEN = "token 0123456789abcdef"
+
+
+def fail():
+    """
+    Fetch function which would need the network
+    """
+    raise AssertionError("The archive should not be queried")
+
+
+class TestArchive(unittest.TestCase):
+    """
+    Class for testing the recorded archive transport
+    """
+
+    def test_record_replay(self):
+        """
+        Test that a recorded result is replayed without fetching it
+
+        :return: None
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            recorder = ArchiveTransport(
+                ArchiveConfig(mode="record", fixture_dir=tmp_dir)
+            )
+            self.assertEqual(recorder.query("mast", REQUEST, lambda: [1, 2]), [1, 2])
+
+            replayer = ArchiveTransport(
+                ArchiveConfig(mode="replay", fixture_dir=tmp_dir)
+            )
+            self.assertEqual(replayer.query("mast", REQUEST, fail), [1, 2])
+
+            with self.assertRaises(FileNotFoundError):
+                replayer.query("irsa", REQUEST, fail)
+            with self.assertRaises(ValueError):
+                replayer.query("not_a_service", REQUEST, fail)
+
+    def test_simulation(self):
+        """
+        Test the simulated latency, errors and throttling of replayed queries
+
+        :return: None
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            ArchiveTransport(ArchiveConfig(mode="record", fixture_dir=tmp_dir)).query(
+                "tns", REQUEST, lambda: "result"
+            )
+
+            config = ArchiveConfig(
+                mode="replay",
+                fixture_dir=tmp_dir,
+                latency=0.05,
+                services={"tns": ArchiveConfig(max_rate=2)},
+                policies=NO_RETRIES,
+            )
+            transport = ArchiveTransport(config)
+            start = time.monotonic()
+            for _ in range(2):
+                transport.query("tns", REQUEST, fail)
+            self.assertGreaterEqual(time.monotonic() - start, 0.1)
+
+            with self.assertRaises(requests.HTTPError) as err:
+                transport.query("tns", REQUEST, fail)
+            self.assertEqual(err.exception.response.status_code, 429)
+
+            transport = ArchiveTransport(
+                ArchiveConfig(
+                    mode="replay",
+                    fixture_dir=tmp_dir,
+                    error_rate=1.0,
+                    policies=NO_RETRIES,
+                )
+            )
+            with self.assertRaises(requests.HTTPError) as err:
+                transport.query("tns", REQUEST, fail)
+            self.assertEqual(err.exception.response.status_code, 503)
+
+    def test_table(self):
+        """
+        Test that a masked catalogue table is replayed unchanged
+        through the configured transport
+
+        :return: None
+        """
+        table = Table({"w1mpro": [10.0, 11.0], "w1sigmpro": [0.1, 0.2]}, masked=True)
+        table["w1sigmpro"].mask = [False, True]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with use_archive_config(ArchiveConfig(mode="record", fixture_dir=tmp_dir)):
+                query_archive("irsa", REQUEST, lambda: table)
+            with use_archive_config(ArchiveConfig(mode="replay", fixture_dir=tmp_dir)):
+                replayed = query_archive("irsa", REQUEST, fail)
+
+        self.assertEqual(replayed.colnames, table.colnames)
+        np.testing.assert_array_equal(replayed["w1mpro"], table["w1mpro"])
+        self.assertTrue(np.ma.is_masked(replayed[1]["w1sigmpro"]))
+
+    def test_response(self):
+        """
+        Test that an HTTP response is replayed without recording the request,
+        so the token sent with it is never saved to the fixture
+
+        :return: None
+        """
+        request = requests.Request(
+            "GET",
+            "https://skyportal.example/api/sources",
+            headers={"Authorization": TOKEN},
+        ).prepare()
+        response = make_response(
+            200,
+            b'{"status": "success", "data": [1, 2]}',
+            url=request.url,
+            headers={"Content-Type": "application/json"},
+        )
+        response.request = request
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with use_archive_config(ArchiveConfig(mode="record", fixture_dir=tmp_dir)):
+                query_archive("skyportal", REQUEST, lambda: response)
+            fixtures = list(Path(tmp_dir).rglob("*"))
+            for path in fixtures:
+                if path.is_file():
+                    self.assertNotIn(TOKEN, path.read_text(encoding="utf8"))
+                    self.assertEqual(path.suffix, ".json")
+
+            with use_archive_config(ArchiveConfig(mode="replay", fixture_dir=tmp_dir)):
+                replayed = query_archive("skyportal", REQUEST, fail)
+
+        self.assertEqual(replayed.status_code, 200)
+        self.assertEqual(replayed.url, request.url)
+        self.assertEqual(replayed.headers["content-type"], "application/json")
+        self.assertEqual(replayed.json(), {"status": "success", "data": [1, 2]})
+        self.assertIsNone(replayed.request)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            recorder = ArchiveTransport(
+                ArchiveConfig(mode="record", fixture_dir=tmp_dir)
+            )
+            with self.assertRaises(TypeError):
+                recorder.query("mast", REQUEST, object)
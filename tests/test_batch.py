@@ -0,0 +1,59 @@
+"""
+Module for testing the batch mode
+"""
+
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from galsynthspec.datamodels.archive import ArchiveConfig
+from galsynthspec.datamodels.galaxy import Galaxy
+from galsynthspec.paths import data_dir
+from galsynthspec.run.batch import load_batch_file, run_batch
+from galsynthspec.utils.archive import use_archive_config
+
+NAME = "SN2099zzz"
+HOST = Galaxy(ra_deg=150.0, dec_deg=2.0, redshift=0.05)
+
+
+class TestBatch(unittest.TestCase):
+    """
+    Class for testing the batch mode
+    """
+
+    def tearDown(self):
+        for name in [NAME, HOST.source_name]:
+            shutil.rmtree(data_dir / name, ignore_errors=True)
+
+    def test_bad_name(self):
+        """
+        Test that a name which cannot be resolved is recorded as a failure,
+        without stopping the batch
+
+        :return: None
+        """
+        with (
+            tempfile.TemporaryDirectory() as tmp_dir,
+            use_archive_config(ArchiveConfig(mode="replay", fixture_dir=tmp_dir)),
+        ):
+            batch_path = Path(tmp_dir) / "batch.csv"
+            batch_path.write_text(
+                f"name,ra_deg,dec_deg,redshift\n{NAME},,,\n,150.0,2.0,0.05\n"
+            )
+
+            failed = []
+            galaxies = load_batch_file(batch_path, failed=failed)
+            self.assertEqual(
+                [galaxy.source_name for galaxy in galaxies], [HOST.source_name]
+            )
+            self.assertEqual(failed, [NAME])
+
+            # There are no recorded fixtures, so the download also fails
+            report_path = Path(tmp_dir) / "batch_report.json"
+            report = run_batch(galaxies, report_path=report_path, failed=failed)
+            self.assertEqual(report.failed, [NAME, HOST.source_name])
+            self.assertEqual(
+                json.loads(report_path.read_text())["failed"], [NAME, HOST.source_name]
+            )
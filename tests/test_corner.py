@@ -0,0 +1,56 @@
+"""
+Module for testing the fast corner plot
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from galsynthspec.datamodels.fitresult import (
+    weighted_quantiles,
+    weighted_quantiles_2d,
+)
+from galsynthspec.plotting.corner import (
+    RANGE_QUANTILES,
+    get_weighted_histograms,
+    plot_fast_corner,
+)
+from galsynthspec.utils.summary import SUMMARY_QUANTILES
+
+
+class TestCorner(unittest.TestCase):
+    """
+    Class for testing the fast corner plot
+    """
+
+    def test_fast_corner(self):
+        """
+        Test the quantiles and histograms of the fast corner plot
+
+        :return: None
+        """
+        rng = np.random.default_rng(42)
+        values = rng.normal(size=(5000, 3))
+        weights = rng.random(5000)
+        all_quantiles = SUMMARY_QUANTILES + RANGE_QUANTILES
+
+        quantiles = weighted_quantiles_2d(values, weights, all_quantiles)
+        for j in range(3):
+            np.testing.assert_array_equal(
+                quantiles[:, j],
+                weighted_quantiles(values[:, j], weights, all_quantiles),
+            )
+
+        ranges = np.array([[-10.0, 10.0]] * 3)
+        hist_1d, hist_2d = get_weighted_histograms(values, weights, ranges, n_bins=20)
+        np.testing.assert_allclose(hist_1d.sum(axis=1), weights.sum())
+        np.testing.assert_allclose(hist_2d[2, 0].sum(axis=0), hist_1d[0])
+        np.testing.assert_allclose(hist_2d[2, 0].sum(axis=1), hist_1d[2])
+        self.assertEqual(hist_2d[0, 2].sum(), 0.0)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            out_path = Path(tmp_dir) / "corner.png"
+            plot_fast_corner(values, ["a", "b", "c"], weights, quantiles, out_path)
+            self.assertTrue(out_path.exists())
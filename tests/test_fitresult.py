@@ -0,0 +1,93 @@
+"""
+Module for testing the summary statistics of a fit result
+"""
+
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from galsynthspec.datamodels.fitresult import (
+    BURN_IN,
+    FitResult,
+    get_burn_in,
+    get_posterior_samples,
+    weighted_quantiles,
+)
+
+
+class TestFitResult(unittest.TestCase):
+    """
+    Class for testing the summary statistics of a fit result
+    """
+
+    def test_chain_quantiles(self):
+        """
+        Test that the cached quantiles of all parameters match the 1D quantiles
+
+        :return: None
+        """
+        rng = np.random.default_rng(42)
+        res = FitResult.model_construct(
+            input_path=Path("fit.h5"),
+            fit_parameters=["zred", "mass"],
+            chain=rng.normal(size=(1000, 2)) + [0.05, 10.0],
+            weights=rng.random(1000),
+            redshift=None,
+        )
+
+        quantiles = res.get_chain_quantiles([0.16, 0.5, 0.84])
+        self.assertEqual(quantiles.shape, (3, 2))
+        for j in range(2):
+            np.testing.assert_array_equal(
+                quantiles[:, j],
+                weighted_quantiles(res.chain[:, j], res.weights, [0.16, 0.5, 0.84]),
+            )
+
+        # Modifying the returned array does not change the cache
+        quantiles[:] = 0.0
+        np.testing.assert_array_equal(
+            res.get_chain_quantiles([0.16, 0.5, 0.84])[1], res.get_chain_quantiles(0.5)
+        )
+        self.assertEqual(res.get_redshift(), res.get_chain_quantiles(0.5)[0])
+
+    def test_posterior_samples(self):
+        """
+        Test resampling and weight cuts of the sampler output
+
+        :return: None
+        """
+        rng = np.random.default_rng(42)
+        chain = rng.normal(size=(20000, 2))
+        weights = np.exp(-0.5 * chain[:, 0] ** 2)
+
+        default_chain, default_weights = get_posterior_samples(chain, weights)
+        self.assertEqual(len(default_chain), len(chain) - BURN_IN)
+        self.assertEqual(len(default_weights), len(chain) - BURN_IN)
+
+        # MCMC backends discard their own burn-in, as do files without a sampler
+        self.assertEqual(get_burn_in("dynesty"), BURN_IN)
+        self.assertEqual(get_burn_in(None), BURN_IN)
+        self.assertEqual(get_burn_in("emcee"), 0)
+        mcmc_chain, _ = get_posterior_samples(chain, weights, burn_in=0)
+        self.assertEqual(len(mcmc_chain), len(chain))
+
+        # A chain shorter than the burn-in is kept rather than emptied
+        short_chain, short_weights = get_posterior_samples(
+            chain[: BURN_IN // 2], weights[: BURN_IN // 2]
+        )
+        self.assertEqual(len(short_chain), BURN_IN // 2)
+        self.assertEqual(len(short_weights), BURN_IN // 2)
+
+        new_chain, new_weights = get_posterior_samples(chain, weights, n_resample=5000)
+        self.assertEqual(new_chain.shape, (5000, 2))
+        np.testing.assert_allclose(new_weights, 1.0 / 5000)
+        np.testing.assert_allclose(
+            weighted_quantiles(new_chain[:, 0], new_weights, [0.16, 0.5, 0.84]),
+            weighted_quantiles(chain[:, 0], weights, [0.16, 0.5, 0.84]),
+            atol=0.1,
+        )
+
+        cut_chain, cut_weights = get_posterior_samples(chain, weights, min_weight=0.5)
+        self.assertTrue(np.all(cut_weights >= 0.5 * weights.max()))
+        self.assertEqual(len(cut_chain), len(cut_weights))
@@ -0,0 +1,98 @@
+"""
+Module for testing reading and writing sampler results in HDF5 files
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+import h5py
+import numpy as np
+from prospect.io.write_results import write_obs_to_h5
+
+from galsynthspec.datamodels.output import OutputConfig
+from galsynthspec.utils.hdf5 import read_fit_hdf5, write_group
+
+
+class TestHDF5(unittest.TestCase):
+    """
+    Class for testing reading and writing sampler results in HDF5 files
+    """
+
+    def test_round_trip(self):
+        """
+        Test that only the requested datasets are read back,
+        with the attributes decoded
+
+        :return: None
+        """
+        rng = np.random.default_rng(42)
+        chain = rng.normal(size=(100, 3))
+        weights = rng.random(100)
+        obs = {
+            "maggies": rng.random(2),
+            "filternames": ["sdss_r0", "twomass_J"],
+            "redshift": 0.05,
+        }
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "fit.h5"
+            with h5py.File(path, "w") as hf:
+                write_group(
+                    hf,
+                    "sampling",
+                    {"chain": chain, "weights": weights, "logl": rng.random(100)},
+                    attrs={"theta_labels": ["zred", "mass", "logzsol"]},
+                )
+                write_obs_to_h5(hf, obs)
+
+            out = read_fit_hdf5(
+                path,
+                {"sampling": ["chain", "weights"], "obs": None, "bestfit": None},
+            )
+
+        self.assertEqual(set(out), {"sampling", "obs"})
+        self.assertNotIn("logl", out["sampling"])
+        np.testing.assert_array_equal(out["sampling"]["chain"], chain)
+        np.testing.assert_array_equal(out["sampling"]["weights"], weights)
+        self.assertEqual(out["sampling"]["theta_labels"], ["zred", "mass", "logzsol"])
+        np.testing.assert_array_equal(out["obs"]["maggies"], obs["maggies"])
+        self.assertEqual(out["obs"]["filternames"], obs["filternames"])
+        self.assertEqual(out["obs"]["redshift"], 0.05)
+
+    def test_compressed(self):
+        """
+        Test that compressed and chunked datasets are read back unchanged
+
+        :return: None
+        """
+        rng = np.random.default_rng(42)
+        chain = rng.normal(size=(10000, 3))
+        spectrum = rng.random(5000)
+
+        for compression in ["gzip", "lzf"]:
+            config = OutputConfig(compression=compression, chunk_rows=1000)
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = Path(tmp_dir) / "fit.h5"
+                with h5py.File(path, "w") as hf:
+                    write_group(hf, "sampling", {"chain": chain}, config=config)
+                    write_group(
+                        hf,
+                        "bestfit",
+                        {"spectrum": spectrum.astype("float32")},
+                        attrs={"mfrac": 0.6},
+                        config=config,
+                    )
+                    dataset = hf.get("sampling/chain")
+                    self.assertIsInstance(dataset, h5py.Dataset)
+                    self.assertEqual(dataset.chunks, (1000, 3))
+                    self.assertEqual(dataset.compression, compression)
+
+                out = read_fit_hdf5(path, {"sampling": None, "bestfit": None})
+
+            np.testing.assert_array_equal(out["sampling"]["chain"], chain)
+            np.testing.assert_allclose(out["bestfit"]["spectrum"], spectrum, rtol=1e-6)
+            self.assertEqual(out["bestfit"]["mfrac"], 0.6)
+
+        with self.assertRaises(ValueError):
+            OutputConfig(compression="lzf", compression_level=4)
@@ -0,0 +1,48 @@
+"""
+Module for testing the stage instrumentation
+"""
+
+import unittest
+
+from galsynthspec.datamodels.report import BatchReport
+from galsynthspec.utils.instrumentation import CallCounter, track_run, track_stage
+
+
+class TestInstrumentation(unittest.TestCase):
+    """
+    Class for testing the stage instrumentation
+    """
+
+    def test_track_stage(self):
+        """
+        Test that stages are recorded and aggregated
+
+        :return: None
+        """
+        counter = CallCounter(lambda x: x**2)
+
+        with track_run(source_name="test") as report:
+            for _ in range(2):
+                with track_stage("extinction"):
+                    pass
+            with track_stage("sampling") as stage:
+                for i in range(5):
+                    counter(i)
+                stage.n_likelihood_calls = counter.n_calls
+
+        self.assertEqual(report.source_name, "test")
+        self.assertEqual(report.stages["extinction"].n_calls, 2)
+        self.assertEqual(report.stages["sampling"].n_likelihood_calls, 5)
+        self.assertGreater(report.stages["sampling"].peak_rss_mb, 0.0)
+
+        # Stages outside a run are discarded
+        with track_stage("extinction"):
+            pass
+        self.assertEqual(report.stages["extinction"].n_calls, 2)
+
+        batch = BatchReport()
+        batch.add(report)
+        batch.add(report)
+        self.assertEqual(batch.n_galaxies, 2)
+        self.assertEqual(batch.stages["extinction"].n_calls, 4)
+        self.assertEqual(batch.stages["sampling"].n_likelihood_calls, 10)
@@ -0,0 +1,65 @@
+"""
+Module for testing safe file writing
+"""
+
+import os
+import stat
+import tempfile
+import unittest
+from pathlib import Path
+
+from galsynthspec.utils.io import atomic_write, get_umask
+
+
+class TestAtomicWrite(unittest.TestCase):
+    """
+    Class for testing atomic writes
+    """
+
+    def test_atomic_write(self):
+        """
+        Test that files only appear once completely written
+
+        :return: None
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            out_path = Path(tmp_dir) / "result.json"
+
+            with self.assertRaises(RuntimeError):
+                with atomic_write(out_path) as tmp_path:
+                    tmp_path.write_text("{", encoding="utf8")
+                    raise RuntimeError("Crash while writing")
+
+            self.assertFalse(out_path.exists())
+
+            with atomic_write(out_path) as tmp_path:
+                self.assertEqual(tmp_path.suffix, ".json")
+                tmp_path.write_text("{}", encoding="utf8")
+                self.assertFalse(out_path.exists())
+
+            self.assertEqual(out_path.read_text(encoding="utf8"), "{}")
+            self.assertEqual([x.name for x in Path(tmp_dir).iterdir()], [out_path.name])
+
+    def test_permissions(self):
+        """
+        Test that written files get the permissions of the existing file,
+        or those of a new file, rather than owner-only permissions
+
+        :return: None
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            out_path = Path(tmp_dir) / "result.json"
+
+            umask = os.umask(0o022)
+            try:
+                self.assertEqual(get_umask(), 0o022)
+                with atomic_write(out_path) as tmp_path:
+                    tmp_path.write_text("{}", encoding="utf8")
+            finally:
+                os.umask(umask)
+            self.assertEqual(stat.S_IMODE(out_path.stat().st_mode), 0o644)
+
+            out_path.chmod(0o664)
+            with atomic_write(out_path) as tmp_path:
+                tmp_path.write_text("[]", encoding="utf8")
+            self.assertEqual(stat.S_IMODE(out_path.stat().st_mode), 0o664)
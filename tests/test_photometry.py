@@ -0,0 +1,64 @@
+"""
+Module for testing the photometry containers
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from galsynthspec.datamodels.photometry import Photometry, PhotometrySet
+
+
+class TestPhotometrySet(unittest.TestCase):
+    """
+    Class for testing the array-backed PhotometrySet
+    """
+
+    def test_matches_photometry(self):
+        """
+        Test that PhotometrySet gives the same values as a list of Photometry
+
+        :return: None
+        """
+        photometry = [
+            Photometry(
+                filter_name="sdss_r0", observed_mag=16.3, extinction=0.2, mag_err=0.05
+            ),
+            Photometry(
+                filter_name="twomass_J",
+                observed_mag=15.2,
+                extinction=0.07,
+                vega_mag=14.3,
+                mag_err=0.06,
+                systematic_error=0.1,
+            ),
+            # Non-detection, as in the WISE download
+            Photometry(
+                filter_name="wise_w4", observed_mag=np.nan, extinction=0.0, mag_err=9.0
+            ),
+        ]
+
+        for phot_set in [
+            PhotometrySet.from_list(photometry),
+            PhotometrySet.from_dataframe(
+                pd.DataFrame([p.model_dump() for p in photometry])
+            ),
+        ]:
+            self.assertEqual(len(phot_set), 3)
+            np.testing.assert_allclose(
+                phot_set.maggies, [p.maggies for p in photometry], rtol=1e-12
+            )
+            np.testing.assert_allclose(
+                phot_set.mag_err_combined,
+                [p.mag_err_combined for p in photometry],
+                rtol=1e-12,
+            )
+            self.assertEqual(phot_set.maggies_unc[2], 0.0)
+            self.assertEqual(
+                [f.name for f in phot_set.filters], ["sdss_r0", "twomass_J", "wise_w4"]
+            )
+            self.assertEqual(phot_set.to_list()[1], photometry[1])
+
+        with self.assertRaises(ValueError):
+            PhotometrySet(["not_a_filter"], [1.0], [0.0], [0.1])
@@ -0,0 +1,83 @@
+"""
+Module for testing the profiling of pipeline stages
+"""
+
+import pstats
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import nullcontext
+from pathlib import Path
+
+from galsynthspec.utils.profiling import StackSampler, profile_stage
+
+
+def busy_loop(duration_s: float) -> int:
+    """
+    Loop for a while, as the hot function to profile
+    """
+    total = 0
+    end = time.perf_counter() + duration_s
+    while time.perf_counter() < end:
+        total += sum(range(100))
+    return total
+
+
+class TestProfiling(unittest.TestCase):
+    """
+    Class for testing the profiling of pipeline stages
+    """
+
+    def test_profile_stage(self):
+        """
+        Test that a selected stage is profiled, with the hot function
+        in both the cProfile output and the collapsed stacks
+
+        :return: None
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            out_dir = Path(tmp_dir)
+
+            with profile_stage(out_dir, "analyse", profile="fit"):
+                busy_loop(0.01)
+            self.assertEqual(list(out_dir.iterdir()), [])
+
+            with profile_stage(out_dir, "fit", profile="fit"):
+                busy_loop(0.3)
+
+            stats = pstats.Stats(str(out_dir / "profile_fit.prof"))
+            functions = [func[2] for func in stats.stats]  # pylint: disable=no-member
+            self.assertIn("busy_loop", functions)
+
+            collapsed = (out_dir / "profile_fit.collapsed.txt").read_text()
+            self.assertIn("busy_loop (test_profiling.py:", collapsed)
+            for line in collapsed.splitlines():
+                self.assertTrue(line.rsplit(" ", 1)[1].isdigit())
+
+    def test_profile_options(self):
+        """
+        Test that stages are only profiled when selected,
+        and that unknown stages are rejected
+
+        :return: None
+        """
+        out_dir = Path(tempfile.gettempdir())
+        self.assertIsInstance(profile_stage(out_dir, "fit", None), nullcontext)
+        self.assertIsInstance(profile_stage(out_dir, "fit", "all"), nullcontext)
+        self.assertNotIsInstance(profile_stage(out_dir, "all", "all"), nullcontext)
+        with self.assertRaises(ValueError):
+            profile_stage(out_dir, "fit", "plots")
+
+    def test_stack_sampler(self):
+        """
+        Test that the sampler records the stacks of another thread
+
+        :return: None
+        """
+        sampler = StackSampler(threading.get_ident(), interval_s=0.001)
+        sampler.start()
+        busy_loop(0.2)
+        sampler.stop()
+        self.assertGreater(sum(sampler.stacks.values()), 0)
+        self.assertTrue(any("busy_loop" in stack for stack in sampler.stacks))
@@ -0,0 +1,53 @@
+"""
+Module for testing the progress status files
+"""
+
+import unittest
+
+from galsynthspec.utils.progress import (
+    DONE,
+    RUNNING,
+    ProgressStatus,
+    summarise_progress,
+)
+
+
+class TestProgress(unittest.TestCase):
+    """
+    Class for testing the progress status files
+    """
+
+    def test_summary(self):
+        """
+        Test the throughput and ETA of a batch
+
+        :return: None
+        """
+        statuses = [
+            ProgressStatus(
+                sampler="dynesty",
+                state=DONE,
+                time=1000.0 + 1800.0 * i,
+                elapsed=1800.0,
+                iteration=1000,
+                ncall=10000,
+            )
+            for i in range(2)
+        ] + [
+            ProgressStatus(
+                sampler="dynesty",
+                state=RUNNING,
+                time=3600.0,
+                elapsed=100.0,
+                iteration=10,
+                ncall=100,
+            )
+        ]
+
+        summary = summarise_progress(statuses, n_total=6)
+        self.assertEqual(summary["n_done"], 2)
+        self.assertEqual(summary["n_running"], 1)
+        # Two fits done in the hour since the first one started
+        self.assertAlmostEqual(summary["fits_per_hour"], 2.0)
+        self.assertAlmostEqual(summary["eta_seconds"], 2.0 * 3600.0)
+        self.assertAlmostEqual(statuses[0].calls_per_second, 10000 / 1800.0)
@@ -0,0 +1,122 @@
+"""
+Module for testing synthetic photometry with projection matrices
+"""
+
+import unittest
+from unittest import mock
+
+import numpy as np
+from prospect.sources.constants import jansky_cgs, lightspeed
+from sedpy.observate import getSED, load_filters
+
+from galsynthspec.utils import projection
+from galsynthspec.utils.projection import (
+    clear_projection_cache,
+    get_projection_cache_info,
+    get_projection_matrix,
+    project_maggies,
+)
+
+FILTERS = ["galex_NUV", "sdss_r0", "twomass_J", "wise_w1"]
+
+
+class TestProjection(unittest.TestCase):
+    """
+    Class for testing synthetic photometry with projection matrices
+    """
+
+    def test_matches_sedpy(self):
+        """
+        Test that projecting a matrix of SEDs matches sedpy filter by filter
+
+        :return: None
+        """
+        rng = np.random.default_rng(42)
+        wavelengths = np.geomspace(500.0, 1.0e5, 3000)
+        seds = (
+            1.0e-8
+            * (wavelengths / 5000.0) ** 0.5
+            * rng.lognormal(sigma=0.1, size=(50, len(wavelengths)))
+        )
+        redshift = 0.05
+
+        maggies = project_maggies(seds, wavelengths, redshift, FILTERS)
+        self.assertEqual(maggies.shape, (50, len(FILTERS)))
+
+        obs_wave = wavelengths * (1.0 + redshift)
+        f_lambda = seds * lightspeed / obs_wave**2 * (3631 * jansky_cgs)
+        expected = getSED(
+            obs_wave, f_lambda, filterlist=load_filters(FILTERS), linear_flux=True
+        )
+        np.testing.assert_allclose(maggies, expected, rtol=1e-10)
+
+        # A single SED gives the same result as a row of the matrix
+        np.testing.assert_allclose(
+            project_maggies(seds[0], wavelengths, redshift, FILTERS),
+            maggies[0],
+            rtol=1e-12,
+        )
+
+        # The matrix is cached for the same grid, redshift and filters
+        self.assertIs(
+            get_projection_matrix(wavelengths, redshift, tuple(FILTERS)),
+            get_projection_matrix(wavelengths.copy(), redshift, tuple(FILTERS)),
+        )
+        self.assertIsNot(
+            get_projection_matrix(wavelengths, redshift, tuple(FILTERS)),
+            get_projection_matrix(wavelengths, 0.1, tuple(FILTERS)),
+        )
+
+    def test_free_redshift(self):
+        """
+        Test that projecting without the matrix cache matches the cached
+        matrix, and does not add to the cache
+
+        :return: None
+        """
+        rng = np.random.default_rng(1)
+        wavelengths = np.geomspace(500.0, 2.0e4, 2000)
+        seds = 1.0e-8 * rng.lognormal(sigma=0.1, size=(5, len(wavelengths)))
+        filters = FILTERS + ["wise_w4"]
+
+        n_cached = get_projection_cache_info()["n_matrices"]
+        for redshift in rng.uniform(0.0, 2.0, size=10):
+            maggies = project_maggies(seds, wavelengths, redshift, filters, cache=False)
+            expected = seds @ projection.ProjectionGrid(wavelengths).get_row(
+                projection.get_filter("sdss_r0"), redshift
+            )
+            np.testing.assert_allclose(maggies[:, 1], expected, rtol=1e-12)
+            # The filter does not overlap the grid
+            self.assertTrue(np.all(np.isnan(maggies[:, -1])))
+        self.assertEqual(get_projection_cache_info()["n_matrices"], n_cached)
+
+        np.testing.assert_allclose(
+            project_maggies(seds, wavelengths, 0.3, FILTERS, cache=False),
+            project_maggies(seds, wavelengths, 0.3, FILTERS),
+            rtol=1e-12,
+        )
+
+    def test_cache_bytes(self):
+        """
+        Test that the matrix cache is bounded by its size in bytes
+
+        :return: None
+        """
+        wavelengths = np.geomspace(500.0, 1.0e5, 1000)
+        matrix_bytes = len(FILTERS) * len(wavelengths) * 8
+        clear_projection_cache()
+        with mock.patch.object(projection, "MAX_CACHE_BYTES", 3 * matrix_bytes):
+            for redshift in np.linspace(0.0, 1.0, 10):
+                get_projection_matrix(wavelengths, redshift, tuple(FILTERS))
+                self.assertLessEqual(
+                    get_projection_cache_info()["n_bytes"], 3 * matrix_bytes
+                )
+        self.assertEqual(
+            get_projection_cache_info(),
+            {"n_grids": 1, "n_matrices": 3, "n_bytes": 3 * matrix_bytes},
+        )
+
+        clear_projection_cache()
+        self.assertEqual(
+            get_projection_cache_info(), {"n_grids": 0, "n_matrices": 0, "n_bytes": 0}
+        )
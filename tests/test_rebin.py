@@ -0,0 +1,66 @@
+"""
+Module for testing rebinning SEDs onto a coarser wavelength grid
+"""
+
+import unittest
+
+import numpy as np
+
+from galsynthspec.datamodels.sed import SEDConfig
+from galsynthspec.utils.rebin import SEDRebinner, get_bin_edges
+
+
+class TestRebin(unittest.TestCase):
+    """
+    Class for testing rebinning SEDs
+    """
+
+    def test_flux_conservation(self):
+        """
+        Test that rebinning conserves the integral of f_nu over frequency
+
+        :return: None
+        """
+        wavelengths = np.geomspace(1.0e2, 1.0e6, 4000)
+        seds = np.vstack([np.ones_like(wavelengths), np.sqrt(wavelengths)])
+
+        rebinner = SEDRebinner(wavelengths, n_wavelength=50)
+        rebinned = rebinner(seds.astype(np.float32))
+
+        self.assertEqual(rebinned.shape, (2, 50))
+        self.assertEqual(rebinned.dtype, np.float32)
+        np.testing.assert_allclose(rebinned[0], 1.0, rtol=1e-5)
+
+        old_edges = get_bin_edges(wavelengths)
+        new_edges = np.geomspace(wavelengths[0], wavelengths[-1], 51)
+        old_total = np.sum(seds[1] * (1.0 / old_edges[:-1] - 1.0 / old_edges[1:]))
+        new_total = np.sum(rebinned[1] * (1.0 / new_edges[:-1] - 1.0 / new_edges[1:]))
+        # The outer half of the first and last original bins is outside the new grid
+        self.assertLess(abs(new_total / old_total - 1.0), 1.0e-3)
+
+    def test_restrict(self):
+        """
+        Test restricting SEDs to an observed-frame wavelength range
+
+        :return: None
+        """
+        wavelengths = np.geomspace(1.0e2, 1.0e6, 4000)
+        config = SEDConfig(min_wavelength=1.0e3, max_wavelength=5.0e5)
+        rebinner = config.get_rebinner(wavelengths, redshift=1.0)
+
+        self.assertGreaterEqual(rebinner.wavelengths.min(), 5.0e2)
+        self.assertLessEqual(rebinner.wavelengths.max(), 2.5e5)
+        np.testing.assert_array_equal(
+            rebinner(wavelengths[None, :])[0], rebinner.wavelengths
+        )
+
+        self.assertIsNone(SEDConfig().get_rebinner(wavelengths, redshift=1.0))
+
+        # Photometry is always predicted from the full model SED
+        full_config = config.model_copy(update={"n_wavelength": 10}).full_resolution()
+        self.assertTrue(full_config.is_full_resolution)
+        self.assertFalse(config.is_full_resolution)
+        self.assertEqual(full_config.n_sample, config.n_sample)
+        self.assertIsNone(full_config.get_rebinner(wavelengths, redshift=1.0))
+        with self.assertRaises(ValueError):
+            SEDConfig(min_wavelength=5.0e5, max_wavelength=1.0e3)
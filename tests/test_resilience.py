@@ -0,0 +1,237 @@
+"""
+Module for testing the rate limiter, retry budget and circuit breaker
+"""
+
+import json
+import shutil
+import time
+import unittest
+from unittest.mock import patch
+
+import requests
+from pyvo.dal.exceptions import DALServiceError
+
+from galsynthspec.datamodels.archive import ServicePolicy
+from galsynthspec.datamodels.galaxy import Galaxy
+from galsynthspec.datamodels.photometry import Photometry
+from galsynthspec.paths import data_dir
+from galsynthspec.utils.archive import get_simulated_error
+from galsynthspec.utils.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    RetryBudget,
+    ServiceGuard,
+    ServiceUnavailableError,
+    TokenBucket,
+    is_retryable,
+)
+
+GALAXY = Galaxy(ra_deg=150.0, dec_deg=2.0, redshift=None)
+
+
+def make_photometry(*filter_names: str, mag: float = 16.0) -> list[Photometry]:
+    """
+    Make photometry in some filters, as returned by a survey download
+    """
+    return [
+        Photometry(filter_name=name, observed_mag=mag, extinction=0.0, mag_err=0.1)
+        for name in filter_names
+    ]
+
+
+class FlakyFetch:  # pylint: disable=too-few-public-methods
+    """
+    Fetch function which fails with a server error a number of times
+    """
+
+    def __init__(self, n_failures: int):
+        self.n_failures = n_failures
+        self.n_calls = 0
+
+    def __call__(self):
+        self.n_calls += 1
+        if self.n_calls <= self.n_failures:
+            raise get_simulated_error("irsa", 503)
+        return "result"
+
+
+class TestResilience(unittest.TestCase):
+    """
+    Class for testing the rate limiter, retry budget and circuit breaker
+    """
+
+    def tearDown(self):
+        shutil.rmtree(data_dir / GALAXY.source_name, ignore_errors=True)
+
+    def test_token_bucket(self):
+        """
+        Test that the bucket allows a burst, then limits the rate
+
+        :return: None
+        """
+        bucket = TokenBucket(rate=20.0, burst=2)
+        start = time.monotonic()
+        for _ in range(6):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+    def test_retry_budget(self):
+        """
+        Test that retries are limited relative to the number of queries
+
+        :return: None
+        """
+        budget = RetryBudget(ratio=0.5, min_retries=1, window=60.0)
+        for _ in range(4):
+            budget.record_query()
+        self.assertEqual(sum(budget.try_retry() for _ in range(5)), 3)
+
+    def test_circuit_breaker(self):
+        """
+        Test that the breaker opens after consecutive failures,
+        and closes after a successful trial query
+
+        :return: None
+        """
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        self.assertFalse(breaker.record_failure())
+        self.assertTrue(breaker.record_failure())
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        # Only one trial query is let through
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_guard(self):
+        """
+        Test that the guard retries transient failures, and skips queries
+        once the breaker is open
+
+        :return: None
+        """
+        policy = ServicePolicy(
+            rate=100.0, backoff=0.001, max_retries=2, failure_threshold=3
+        )
+        guard = ServiceGuard("irsa", policy, seed=42)
+
+        fetch = FlakyFetch(2)
+        self.assertEqual(guard.call(fetch), "result")
+        self.assertEqual(fetch.n_calls, 3)
+
+        with self.assertRaises(ValueError):
+            guard.call(lambda: int("not a number"))
+
+        fetch = FlakyFetch(10)
+        with self.assertRaises(requests.HTTPError):
+            guard.call(fetch)
+        self.assertEqual(fetch.n_calls, 3)
+        self.assertEqual(guard.breaker.state, OPEN)
+
+        fetch = FlakyFetch(0)
+        with self.assertRaises(ServiceUnavailableError):
+            guard.call(fetch)
+        self.assertEqual(fetch.n_calls, 0)
+
+    def test_is_retryable(self):
+        """
+        Test that the errors raised by failing services are transient
+
+        :return: None
+        """
+        self.assertTrue(is_retryable(get_simulated_error("irsa", 503)))
+        self.assertFalse(is_retryable(get_simulated_error("irsa", 404)))
+        # Gaia raises HTTPError without a response
+        self.assertTrue(is_retryable(requests.HTTPError("Error 500")))
+        # IRSA raises the errors of pyvo
+        self.assertTrue(is_retryable(DALServiceError("Service down")))
+        self.assertTrue(is_retryable(DALServiceError("Service down", code=503)))
+        self.assertFalse(is_retryable(DALServiceError("Bad query", code=400)))
+        self.assertFalse(is_retryable(ValueError("Bad query")))
+
+    def test_non_retryable(self):
+        """
+        Test that a query failing with a non-retryable error
+        neither closes nor holds open the breaker
+
+        :return: None
+        """
+        policy = ServicePolicy(
+            rate=100.0, reset_timeout=0.05, max_retries=0, failure_threshold=1
+        )
+        guard = ServiceGuard("irsa", policy, seed=42)
+        with self.assertRaises(requests.HTTPError):
+            guard.call(FlakyFetch(1))
+        self.assertEqual(guard.breaker.state, OPEN)
+
+        time.sleep(0.06)
+        with self.assertRaises(ValueError):
+            guard.call(lambda: int("not a number"))
+        self.assertEqual(guard.breaker.state, OPEN)
+
+        # The next query is let through as the trial
+        self.assertEqual(guard.call(FlakyFetch(0)), "result")
+        self.assertEqual(guard.breaker.state, CLOSED)
+
+        guard.breaker.state = HALF_OPEN
+        guard.breaker.release()
+        self.assertEqual(guard.breaker.state, OPEN)
+
+    def test_skipped_surveys(self):
+        """
+        Test that surveys skipped in the cached photometry are queried again,
+        and merged into the cache
+
+        :return: None
+        """
+        downloads = {
+            name: patch(f"galsynthspec.download.all.download_{name}_data")
+            for name in ["sdss", "ps1", "galex", "twomass", "wise"]
+        }
+        mocks = {name: download.start() for name, download in downloads.items()}
+        for download in downloads.values():
+            self.addCleanup(download.stop)
+
+        unavailable = ServiceUnavailableError("Circuit breaker is open")
+        mocks["sdss"].side_effect = unavailable
+        mocks["ps1"].return_value = make_photometry("sdss_g0", mag=17.0)
+        mocks["galex"].return_value = make_photometry("galex_FUV")
+        mocks["twomass"].side_effect = unavailable
+        mocks["wise"].return_value = make_photometry("wise_w1")
+
+        photometry = GALAXY.get_photometry()
+        self.assertEqual(len(photometry), 3)
+        skipped = json.loads(GALAXY.skipped_surveys_file.read_text(encoding="utf8"))
+        self.assertEqual(skipped, ["sdss", "twomass"])
+
+        # The skipped surveys are still unavailable
+        photometry = GALAXY.get_photometry()
+        self.assertEqual(len(photometry), 3)
+        self.assertEqual(mocks["sdss"].call_count, 2)
+        self.assertEqual(mocks["ps1"].call_count, 1)
+        self.assertTrue(GALAXY.skipped_surveys_file.is_file())
+
+        mocks["sdss"].side_effect = None
+        mocks["sdss"].return_value = make_photometry("sdss_g0", "sdss_r0")
+        mocks["twomass"].side_effect = None
+        mocks["twomass"].return_value = make_photometry("twomass_J")
+
+        photometry = GALAXY.get_photometry_set()
+        self.assertEqual(
+            sorted(photometry.filter_names),
+            ["galex_FUV", "sdss_g0", "sdss_r0", "twomass_J", "wise_w1"],
+        )
+        # SDSS replaces the PS1 photometry
+        self.assertEqual(photometry.observed_mag.tolist(), [16.0] * 5)
+        self.assertFalse(GALAXY.skipped_surveys_file.is_file())
+        for name in ["ps1", "galex", "wise"]:
+            self.assertEqual(mocks[name].call_count, 1)
+
+        # The complete photometry is loaded from the cache
+        self.assertEqual(len(GALAXY.get_photometry()), 5)
+        self.assertEqual(mocks["sdss"].call_count, 3)
@@ -0,0 +1,258 @@
+"""
+Module for testing importance reweighting of an existing fit
+"""
+
+import shutil
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import h5py
+import numpy as np
+from prospect.io.write_results import write_obs_to_h5
+from prospect.utils.obsutils import fix_obs
+
+from galsynthspec.datamodels.fitresult import FitResult
+from galsynthspec.datamodels.galaxy import Galaxy
+from galsynthspec.datamodels.photometry import Photometry, PhotometrySet, get_filter
+from galsynthspec.paths import data_dir
+from galsynthspec.run import reweight
+from galsynthspec.run.config import FitConfig
+from galsynthspec.run.reweight import (
+    get_cached_model_photometry,
+    get_photometry_lnlike,
+    get_reweighted_results,
+    merge_model_photometry,
+)
+from galsynthspec.utils.hdf5 import read_fit_hdf5, write_group
+from galsynthspec.utils.progress import get_effective_sample_size
+
+FILTERNAMES = ["sdss_g0", "sdss_r0", "wise_w1"]
+
+NAME = "SN2099zzz"
+N_SAMPLES = 300
+N_STORED = 100
+
+
+class ToyModel:
+    """
+    Linear stand-in for the prospector model, which counts its predictions
+    """
+
+    def __init__(self):
+        self.n_predict = 0
+
+    @staticmethod
+    def theta_labels() -> list[str]:
+        """
+        Get the names of the parameters
+        """
+        return ["mass", "logzsol", "dust2", "tage", "tau"]
+
+    def predict(self, theta, obs, sps):
+        """
+        Predict the spectrum, photometry and mass fraction
+        """
+        self.n_predict += 1
+        slope = 1.0 + 0.1 * theta[2] * np.arange(len(obs["filters"]))
+        return np.ones(len(sps.wavelengths)), 1.0e-9 * theta[0] * slope, 0.5
+
+
+def get_photometry(mags: list[float], mag_err: float) -> list[Photometry]:
+    """
+    Get photometry in the sdss_g0 and sdss_r0 filters
+    """
+    return [
+        Photometry(filter_name=name, observed_mag=mag, extinction=0.0, mag_err=mag_err)
+        for name, mag in zip(FILTERNAMES[:2], mags)
+    ]
+
+
+def write_toy_fit(galaxy: Galaxy, model: ToyModel) -> np.ndarray:
+    """
+    Write a fit of the toy model, with the model photometry stored
+    for only some of the samples
+
+    :param galaxy: Galaxy to write the fit for
+    :param model: Toy model
+    :return: Posterior chain
+    """
+    rng = np.random.default_rng(3)
+    chain = rng.uniform(0.0, 1.0, size=(N_SAMPLES, 5))
+    chain[:, 0] = rng.normal(1.0, 0.05, size=N_SAMPLES)
+    obs = fix_obs(
+        PhotometrySet.from_list(get_photometry([22.5, 22.5], 0.1)).to_obs(
+            redshift=galaxy.redshift
+        )
+    )
+    obs["filters"] = obs["filters"] + [get_filter(FILTERNAMES[2])]
+    stored = [model.predict(theta, obs, SPS)[1] for theta in chain[:N_STORED]]
+    model.n_predict = 0
+
+    with h5py.File(galaxy.mcmc_cache_file, "w") as hf:
+        write_group(
+            hf,
+            "sampling",
+            {
+                "chain": chain,
+                "weights": np.full(N_SAMPLES, 1.0 / N_SAMPLES),
+                "lnlikelihood": np.zeros(N_SAMPLES),
+                "lnprobability": np.zeros(N_SAMPLES),
+            },
+        )
+        del obs["filters"]
+        write_obs_to_h5(hf, obs)
+        write_group(
+            hf,
+            "model_photometry",
+            {"index": np.arange(N_STORED)[::-1], "maggies": np.array(stored[::-1])},
+            attrs={"filternames": FILTERNAMES},
+        )
+    return chain
+
+
+SPS = SimpleNamespace(wavelengths=np.geomspace(1.0e3, 1.0e5, 10))
+
+
+class TestReweight(unittest.TestCase):
+    """
+    Class for testing importance reweighting of an existing fit
+    """
+
+    def tearDown(self):
+        shutil.rmtree(data_dir / NAME, ignore_errors=True)
+
+    def test_photometry_lnlike(self):
+        """
+        Test the photometric log-likelihood, with filters in a different order
+        to the model photometry and a masked band
+
+        :return: None
+        """
+        model_maggies = np.array([[1.0, 2.0, 3.0], [1.5, 2.0, 2.0]])
+        obs = {
+            "filternames": ["wise_w1", "sdss_g0"],
+            "maggies": np.array([3.0, 1.0]),
+            "maggies_unc": np.array([0.5, 0.1]),
+            "phot_mask": np.array([True, True]),
+        }
+        np.testing.assert_allclose(
+            get_photometry_lnlike(obs, FILTERNAMES, model_maggies),
+            [0.0, -0.5 * (2.0**2 + 5.0**2)],
+        )
+
+        obs["phot_mask"] = np.array([True, False])
+        np.testing.assert_allclose(
+            get_photometry_lnlike(obs, FILTERNAMES, model_maggies), [0.0, -2.0]
+        )
+
+    def test_cached_model_photometry(self):
+        """
+        Test that stored model photometry is only reused if it covers
+        the samples and filters needed
+
+        :return: None
+        """
+        stored = {
+            "index": np.array([5, 0, 2]),
+            "maggies": np.arange(9.0).reshape(3, 3),
+            "filternames": FILTERNAMES,
+        }
+        maggies, found = get_cached_model_photometry(
+            stored, np.array([0, 2, 5]), ["wise_w1", "sdss_g0"]
+        )
+        np.testing.assert_array_equal(maggies, [[5.0, 3.0], [8.0, 6.0], [2.0, 0.0]])
+        self.assertTrue(np.all(found))
+
+        # Samples are looked up by their chain index
+        maggies, found = get_cached_model_photometry(
+            stored, np.array([2, 3, 7]), FILTERNAMES
+        )
+        np.testing.assert_array_equal(found, [True, False, False])
+        np.testing.assert_array_equal(maggies[0], [6.0, 7.0, 8.0])
+        self.assertTrue(np.all(np.isnan(maggies[1:])))
+
+        for missing in [
+            get_cached_model_photometry(None, np.array([0, 2]), FILTERNAMES),
+            get_cached_model_photometry(
+                stored, np.array([0, 2]), FILTERNAMES + ["twomass_J"]
+            ),
+        ]:
+            self.assertFalse(np.any(missing[1]))
+
+        merged = merge_model_photometry(
+            stored, np.array([7, 2]), ["sdss_r0"], np.array([[10.0], [11.0]])
+        )
+        np.testing.assert_array_equal(merged["index"], [0, 2, 5, 7])
+        np.testing.assert_array_equal(merged["maggies"][:, 0], [4.0, 11.0, 1.0, 10.0])
+
+    def test_reweight_galaxy(self):
+        """
+        Test reweighting a fit to new photometry, predicting only the samples
+        without stored model photometry, and refitting once the effective
+        sample size collapses
+
+        :return: None
+        """
+        galaxy = Galaxy(source_name=NAME, ra_deg=150.0, dec_deg=2.0, redshift=0.1)
+        model = ToyModel()
+        chain = write_toy_fit(galaxy, model)
+
+        with (
+            mock.patch.object(reweight, "get_model", return_value=model),
+            mock.patch.object(reweight, "get_sps", return_value=SPS),
+            mock.patch.object(
+                FitResult, "from_samples", side_effect=lambda *args, **kwargs: kwargs
+            ),
+            mock.patch.object(reweight, "fit_galaxy") as fit_galaxy,
+        ):
+            galaxy.export_photometry_to_cache(get_photometry([22.5, 22.45], 0.1))
+            res = get_reweighted_results(galaxy, fit_config=FitConfig(min_ess=50.0))
+
+            fit_galaxy.assert_not_called()
+            # Only the samples without stored photometry, and the best fit
+            self.assertEqual(model.n_predict, N_SAMPLES - N_STORED + 1)
+            self.assertAlmostEqual(res["weights"].sum(), 1.0)
+
+            out = read_fit_hdf5(
+                galaxy.mcmc_cache_file,
+                {"sampling": ["weights"], "obs": None, "model_photometry": None},
+            )
+            np.testing.assert_allclose(out["sampling"]["weights"], res["weights"])
+            self.assertGreaterEqual(out["sampling"]["reweighted_ess"], 50.0)
+            np.testing.assert_allclose(out["obs"]["maggies"][1], 10.0 ** (-0.4 * 22.45))
+            stored = out["model_photometry"]
+            np.testing.assert_array_equal(stored["index"], np.arange(N_SAMPLES))
+            np.testing.assert_allclose(
+                stored["maggies"][:, 0], 1.0e-9 * chain[:, 0], rtol=1e-12
+            )
+
+            # Everything is stored now, so nothing is predicted but the best fit
+            model.n_predict = 0
+            galaxy.export_photometry_to_cache(get_photometry([22.5, 22.4], 0.1))
+            get_reweighted_results(galaxy, fit_config=FitConfig(min_ess=50.0))
+            self.assertEqual(model.n_predict, 1)
+
+            # Photometry far from every sample collapses the effective sample size
+            galaxy.export_photometry_to_cache(get_photometry([21.0, 20.0], 0.01))
+            fit_config = FitConfig(min_ess=50.0, sampler="emcee")
+            res = get_reweighted_results(galaxy, fit_config=fit_config)
+            self.assertIs(res, fit_galaxy.return_value)
+            fit_galaxy.assert_called_once_with(
+                galaxy,
+                use_cache=True,
+                fit_config=fit_config,
+                n_resample=None,
+                min_weight=None,
+            )
+
+    def test_effective_sample_size(self):
+        """
+        Test the effective sample size of equal and degenerate weights
+
+        :return: None
+        """
+        self.assertAlmostEqual(get_effective_sample_size(np.zeros(100)), 100.0)
+        self.assertAlmostEqual(
+            get_effective_sample_size(np.array([0.0, -1000.0, -1000.0])), 1.0
+        )
@@ -0,0 +1,114 @@
+"""
+Module for testing the sampler backends
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from galsynthspec.run.samplers import (
+    DynestyBackend,
+    EmceeBackend,
+    get_sampler_backend,
+)
+from galsynthspec.utils.progress import DONE, ProgressWriter, read_last_status
+
+MEAN = np.array([1.0, -2.0])
+SIGMA = np.array([0.5, 0.2])
+
+
+class GaussianModel:
+    """
+    Minimal model with a uniform prior, exposing the interface used by the samplers
+    """
+
+    ndim = 2
+    low = np.array([-5.0, -5.0])
+    high = np.array([5.0, 5.0])
+
+    def prior_transform(self, unit_coords: np.ndarray) -> np.ndarray:
+        """
+        Transform the unit cube to the prior
+        """
+        return self.low + unit_coords * (self.high - self.low)
+
+    def prior_product(self, theta: np.ndarray) -> np.ndarray:
+        """
+        Log prior probability
+        """
+        inside = np.all((theta >= self.low) & (theta <= self.high), axis=-1)
+        return np.where(inside, -np.log(np.prod(self.high - self.low)), -np.inf)
+
+
+def gaussian_lnprobfn(theta, model=None, **_):
+    """
+    Log posterior of a Gaussian likelihood
+    """
+    return model.prior_product(theta) - 0.5 * np.sum(((theta - MEAN) / SIGMA) ** 2)
+
+
+class TestSamplers(unittest.TestCase):
+    """
+    Class for testing the sampler backends
+    """
+
+    def test_emcee(self):
+        """
+        Test that emcee recovers a Gaussian posterior, in the dynesty layout
+
+        :return: None
+        """
+        model = GaussianModel()
+        backend = EmceeBackend(walker_factor=8, check_interval=50, seed=42)
+        out, duration = backend.run({}, model, None, gaussian_lnprobfn)
+
+        self.assertGreater(duration, 0.0)
+        self.assertLess(out["niter"], backend.max_iterations)
+        n_samples = len(out["samples"])
+        for key in ["logl", "logwt", "logz", "logvol", "samples_id", "ncall"]:
+            self.assertEqual(len(out[key]), n_samples)
+
+        weights = np.exp(out["logwt"] - out["logz"][-1])
+        np.testing.assert_allclose(np.sum(weights), 1.0)
+        np.testing.assert_allclose(
+            np.average(out["samples"], axis=0, weights=weights), MEAN, atol=0.1
+        )
+        np.testing.assert_allclose(np.std(out["samples"], axis=0), SIGMA, rtol=0.2)
+
+    def test_dynesty(self):
+        """
+        Test that dynesty recovers a Gaussian posterior, and writes its progress
+
+        :return: None
+        """
+        model = GaussianModel()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            progress = ProgressWriter(
+                Path(tmp_dir) / "progress.jsonl", sampler="dynesty", interval=0.0
+            )
+            out, _ = DynestyBackend().run({}, model, None, gaussian_lnprobfn, progress)
+            n_lines = len(progress.path.read_text(encoding="utf-8").splitlines())
+            status = read_last_status(progress.path)
+
+        self.assertGreater(n_lines, 10)
+        self.assertEqual(status.state, DONE)
+        self.assertEqual(status.iteration, out["niter"])
+        self.assertGreater(status.ess, 500.0)
+
+        weights = np.exp(out["logwt"] - out["logz"][-1])
+        np.testing.assert_allclose(
+            np.average(out["samples"], axis=0, weights=weights), MEAN, atol=0.1
+        )
+
+    def test_get_backend(self):
+        """
+        Test getting a backend by name
+
+        :return: None
+        """
+        self.assertIsInstance(get_sampler_backend("dynesty"), DynestyBackend)
+        self.assertIsInstance(get_sampler_backend("emcee"), EmceeBackend)
+        with self.assertRaises(ValueError):
+            get_sampler_backend("not_a_sampler")
@@ -0,0 +1,94 @@
+"""
+Module for testing the fitting service
+"""
+
+import multiprocessing
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from galsynthspec.datamodels.archive import ArchiveConfig
+from galsynthspec.paths import data_dir
+from galsynthspec.run.serve import FAILED, ServeClient, get_worker_pool, serve
+from galsynthspec.utils.archive import get_archive_transport, use_archive_config
+
+
+def get_worker_state() -> tuple[str, str]:
+    """
+    Get the start method and archive mode of a worker process
+    """
+    return multiprocessing.get_start_method(), get_archive_transport().config.mode
+
+
+class TestServe(unittest.TestCase):
+    """
+    Class for testing the fitting service
+    """
+
+    def tearDown(self):
+        shutil.rmtree(data_dir / "SN2099zzz", ignore_errors=True)
+
+    def test_serve(self):
+        """
+        Test queuing jobs on the service over a Unix socket
+
+        :return: None
+        """
+        with (
+            tempfile.TemporaryDirectory() as tmp_dir,
+            use_archive_config(ArchiveConfig(mode="replay", fixture_dir=tmp_dir)),
+        ):
+            socket_path = Path(tmp_dir) / "serve.sock"
+            ready, stop = threading.Event(), threading.Event()
+            thread = threading.Thread(
+                target=serve,
+                kwargs={
+                    "socket_path": socket_path,
+                    "n_workers": 1,
+                    "warm": False,
+                    "ready": ready,
+                    "stop": stop,
+                },
+            )
+            thread.start()
+            try:
+                self.assertTrue(ready.wait(timeout=30.0))
+                client = ServeClient(socket_path=socket_path, timeout=60.0)
+
+                health = client.health()
+                self.assertEqual(health["status"], "ok")
+                self.assertEqual(health["n_workers"], 1)
+
+                # Exactly one of the galaxy and the name must be given
+                with self.assertRaises(ValueError):
+                    client.request("POST", "/jobs", {"action": "fit"})
+                with self.assertRaises(ValueError):
+                    client.get("not_a_job")
+
+                # There are no recorded fixtures, so resolving the name fails
+                job = client.submit("fit", wait=True, name="SN2099zzz", use_cache=False)
+                self.assertEqual(job.status, FAILED)
+                self.assertIsNotNone(job.error)
+                self.assertIsNotNone(job.finished)
+                self.assertEqual(client.get(job.job_id).status, FAILED)
+                self.assertEqual(client.health()[FAILED], 1)
+            finally:
+                stop.set()
+                thread.join(timeout=30.0)
+            self.assertFalse(socket_path.exists())
+
+    def test_worker_pool(self):
+        """
+        Test that workers are spawned, with the archive options of the parent
+
+        :return: None
+        """
+        with (
+            tempfile.TemporaryDirectory() as tmp_dir,
+            use_archive_config(ArchiveConfig(mode="replay", fixture_dir=tmp_dir)),
+        ):
+            with get_worker_pool(1, warm=False) as executor:
+                state = executor.submit(get_worker_state).result()
+        self.assertEqual(state, ("spawn", "replay"))
@@ -0,0 +1,113 @@
+"""
+Module for testing sharing arrays with worker processes
+"""
+
+import multiprocessing
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from galsynthspec.utils.shared import (
+    SharedArray,
+    SharedArrays,
+    open_shared_memory,
+    save_memmap,
+)
+
+
+def _double_in_place(handle: SharedArray):
+    """
+    Double a shared array in place, in a worker process
+
+    :param handle: Handle to the shared array
+    :return: Sum of the array before doubling
+    """
+    array = handle.attach(writeable=True)
+    total = float(array.sum())
+    array *= 2.0
+    return total
+
+
+def _count_unregistered(handle: SharedArray) -> int:
+    """
+    Open the segment of a shared array in a worker process, counting the
+    segments unregistered from the resource tracker
+
+    :param handle: Handle to the shared array
+    :return: Number of segments unregistered
+    """
+    with mock.patch.object(resource_tracker, "unregister") as unregister:
+        shm = open_shared_memory(handle.shm_name, tracker_id=handle.tracker_id)
+        shm.close()
+    return unregister.call_count
+
+
+class TestShared(unittest.TestCase):
+    """
+    Class for testing shared arrays
+    """
+
+    def test_shared_memory(self):
+        """
+        Test that workers can read and write arrays in shared memory
+
+        :return: None
+        """
+        chain = np.arange(12.0).reshape(4, 3)
+
+        with SharedArrays(arrays={"chain": chain}) as handles:
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                total = executor.submit(_double_in_place, handles["chain"]).result()
+
+            self.assertEqual(total, chain.sum())
+            np.testing.assert_array_equal(handles["chain"].attach(), 2.0 * chain)
+
+    def test_resource_tracker(self):
+        """
+        Test that workers sharing the resource tracker of the creator leave
+        the segment registered, so it is still unlinked if the creator crashes
+
+        :return: None
+        """
+        with SharedArrays(arrays={"chain": np.ones(3)}) as handles:
+            self.assertIsNotNone(handles["chain"].tracker_id)
+
+            for method in ["fork", "spawn"]:
+                with ProcessPoolExecutor(
+                    max_workers=1, mp_context=multiprocessing.get_context(method)
+                ) as executor:
+                    n_unregistered = executor.submit(
+                        _count_unregistered, handles["chain"]
+                    ).result()
+                self.assertEqual(n_unregistered, 0, method)
+
+            # A process with its own tracker must not unlink the segment
+            unrelated = handles["chain"].model_copy(update={"tracker_id": -1})
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                n_unregistered = executor.submit(
+                    _count_unregistered, unrelated
+                ).result()
+            self.assertEqual(n_unregistered, 1)
+
+    def test_memmap(self):
+        """
+        Test that arrays saved as .npy files are memory-mapped by workers
+
+        :return: None
+        """
+        weights = np.linspace(0.0, 1.0, 5)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            handles = save_memmap({"weights": weights}, prefix=Path(tmp_dir) / "fit")
+            self.assertEqual(handles["weights"].path, Path(tmp_dir) / "fit_weights.npy")
+
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                total = executor.submit(_double_in_place, handles["weights"]).result()
+
+            self.assertAlmostEqual(total, weights.sum())
+            np.testing.assert_allclose(np.load(handles["weights"].path), 2.0 * weights)
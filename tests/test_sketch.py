@@ -0,0 +1,50 @@
+"""
+Module for testing the SED quantile sketch
+"""
+
+import unittest
+
+import numpy as np
+
+from galsynthspec.utils.sketch import SEDQuantileSketch
+
+
+class TestSketch(unittest.TestCase):
+    """
+    Class for testing the SED quantile sketch
+    """
+
+    def test_quantiles(self):
+        """
+        Test that quantiles from chunked updates match exact quantiles
+
+        :return: None
+        """
+        rng = np.random.default_rng(42)
+        seds = 10.0 ** rng.normal(np.linspace(-9.0, -6.0, 30), 0.3, size=(4000, 30))
+
+        sketch = SEDQuantileSketch(n_wave=30)
+        for chunk in np.array_split(seds, 40):
+            sketch.update(chunk.astype(np.float32))
+
+        self.assertEqual(sketch.n_sample, 4000)
+
+        quantiles = [0.16, 0.5, 0.84]
+        estimate = sketch.quantile(quantiles)
+        self.assertEqual(estimate.shape, (3, 30))
+
+        exact = np.quantile(seds, quantiles, axis=0)
+        np.testing.assert_allclose(np.log10(estimate), np.log10(exact), atol=0.01)
+        np.testing.assert_allclose(sketch.quantile(0.5), estimate[1])
+
+    def test_wrong_shape(self):
+        """
+        Test that SEDs with the wrong number of wavelengths are rejected
+
+        :return: None
+        """
+        sketch = SEDQuantileSketch(n_wave=10)
+        with self.assertRaises(ValueError):
+            sketch.quantile(0.5)
+        with self.assertRaises(ValueError):
+            sketch.update(np.ones((5, 11)))
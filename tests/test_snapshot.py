@@ -0,0 +1,152 @@
+"""
+Module for testing catalogue snapshots
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from astropy import units as u
+from astropy.coordinates import SkyCoord
+
+from galsynthspec.datamodels.archive import ArchiveConfig
+from galsynthspec.utils.archive import (
+    get_cone_request,
+    query_archive,
+    use_archive_config,
+)
+from galsynthspec.utils.snapshot import (
+    SNAPSHOT_CATALOGUES,
+    CatalogueSnapshot,
+    write_catalogue_snapshot,
+)
+
+RADIUS_ARCSEC = 20.0
+
+
+def fail():
+    """
+    Fetch function which would need the network
+    """
+    raise AssertionError("The archive should not be queried")
+
+
+def get_catalogue(n_rows: int = 20000) -> pd.DataFrame:
+    """
+    Get a random catalogue in a small patch of sky, with some missing values
+    """
+    rng = np.random.default_rng(42)
+    df = pd.DataFrame(
+        {
+            "ra": rng.uniform(150.0, 151.0, n_rows),
+            "dec": rng.uniform(2.0, 3.0, n_rows),
+            "w1mpro": rng.uniform(10.0, 18.0, n_rows),
+            "w1sigmpro": rng.uniform(0.01, 0.2, n_rows),
+        }
+    )
+    df.loc[::7, "w1sigmpro"] = np.nan
+    return df
+
+
+class TestSnapshot(unittest.TestCase):
+    """
+    Class for testing catalogue snapshots
+    """
+
+    def test_cone_search(self):
+        """
+        Test that single and batch cone searches match a brute-force search
+
+        :return: None
+        """
+        df = get_catalogue()
+        rng = np.random.default_rng(1)
+        positions = SkyCoord(
+            rng.uniform(150.1, 150.9, 50), rng.uniform(2.1, 2.9, 50), unit="deg"
+        )
+        coords = SkyCoord(df["ra"], df["dec"], unit="deg")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            write_catalogue_snapshot(df, Path(tmp_dir), nside=256)
+            snapshot = CatalogueSnapshot(Path(tmp_dir), SNAPSHOT_CATALOGUES["allwise"])
+            batch = snapshot.cone_search_many(positions, RADIUS_ARCSEC)
+
+            for position, result in zip(positions, batch):
+                separation = position.separation(coords).arcsec
+                expected = np.flatnonzero(separation < RADIUS_ARCSEC)
+                expected = expected[np.argsort(separation[expected])]
+
+                single = snapshot.cone_search(position, RADIUS_ARCSEC)
+                np.testing.assert_allclose(single["ra"], df["ra"].iloc[expected])
+                np.testing.assert_allclose(result["ra"], single["ra"])
+                np.testing.assert_allclose(
+                    single["distance_arcsec"], separation[expected], rtol=1e-6
+                )
+                np.testing.assert_array_equal(
+                    single["w1sigmpro"].mask, df["w1sigmpro"].iloc[expected].isna()
+                )
+
+    def test_transport(self):
+        """
+        Test that the archive transport answers covered cone searches
+        from the snapshot, and only those
+
+        :return: None
+        """
+        df = get_catalogue()
+        inside = SkyCoord(150.5, 2.5, unit="deg")
+        outside = SkyCoord(10.0, -30.0, unit="deg")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            write_catalogue_snapshot(df, Path(tmp_dir) / "allwise", nside=256)
+            write_catalogue_snapshot(df.iloc[:0], Path(tmp_dir) / "sdss", footprint=[0])
+
+            with use_archive_config(ArchiveConfig(snapshot_dir=tmp_dir)):
+                result = query_archive(
+                    "irsa",
+                    get_cone_request(
+                        "Irsa.query_region",
+                        inside,
+                        RADIUS_ARCSEC,
+                        catalog="allwise_p3as_psd",
+                    ),
+                    fail,
+                )
+                self.assertGreater(len(result), 0)
+                self.assertTrue(
+                    np.all(np.diff(np.asarray(result["distance_arcsec"])) >= 0.0)
+                )
+                self.assertLess(
+                    inside.separation(
+                        SkyCoord(result["ra"][0], result["dec"][0], unit="deg")
+                    ),
+                    RADIUS_ARCSEC * u.arcsec,  # pylint: disable=no-member
+                )
+
+                # Outside the footprint, the archive is queried
+                self.assertEqual(
+                    query_archive(
+                        "irsa",
+                        get_cone_request(
+                            "Irsa.query_region",
+                            outside,
+                            RADIUS_ARCSEC,
+                            catalog="allwise_p3as_psd",
+                        ),
+                        lambda: "queried",
+                    ),
+                    "queried",
+                )
+
+                # An empty SDSS match is None, as from SDSS.query_crossid
+                self.assertIsNone(
+                    query_archive(
+                        "sdss",
+                        get_cone_request(
+                            "SDSS.query_crossid", SkyCoord(45.0, 0.5, unit="deg"), 3.0
+                        ),
+                        fail,
+                    )
+                )
@@ -0,0 +1,169 @@
+"""
+Module for testing the watch mode
+"""
+
+import json
+import shutil
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from galsynthspec.datamodels.archive import ArchiveConfig
+from galsynthspec.datamodels.galaxy import Galaxy
+from galsynthspec.paths import data_dir
+from galsynthspec.run.watch import (
+    DONE,
+    DUPLICATE,
+    FAILED,
+    JsonlSource,
+    SpoolSource,
+    WatchItem,
+    WatchLedger,
+    WatchRecord,
+    get_host_key,
+    watch,
+)
+from galsynthspec.utils.archive import use_archive_config
+
+NAME = "SN2099zzz"
+NEW_HOST = Galaxy(ra_deg=150.0, dec_deg=2.0, redshift=None)
+DONE_HOST = Galaxy(ra_deg=151.0, dec_deg=3.0, redshift=None)
+
+
+class TestWatch(unittest.TestCase):
+    """
+    Class for testing the watch mode
+    """
+
+    def tearDown(self):
+        for name in [NAME, NEW_HOST.source_name]:
+            shutil.rmtree(data_dir / name, ignore_errors=True)
+
+    def test_sources(self):
+        """
+        Test reading items from a JSON-lines file and a spool directory
+
+        :return: None
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "alerts.jsonl"
+            path.write_text(f'"{NAME}"\n{{"ra_deg": 150.0, "dec_deg": 2.0}}\n{{"na')
+            source = JsonlSource(path)
+            items = source.poll()
+            self.assertEqual([item.name for item in items], [NAME, None])
+            self.assertEqual(items[1].ra_deg, 150.0)
+
+            # Lines are read again until they are committed
+            self.assertEqual(len(JsonlSource(path).poll()), 2)
+            source.commit()
+
+            # The incomplete line is read once it is finished,
+            # by a restarted watcher
+            with open(path, "a", encoding="utf8") as f:
+                f.write('me": "SN2099zzy", "redshift": 0.1}\nnot json\n\n')
+            source = JsonlSource(path)
+            items = source.poll()
+            self.assertEqual([item.name for item in items], ["SN2099zzy", "not json"])
+            self.assertEqual(items[0].redshift, 0.1)
+            source.commit()
+            self.assertEqual(JsonlSource(path).poll(), [])
+
+            spool_dir = Path(tmp_dir) / "spool"
+            spool_dir.mkdir()
+            (spool_dir / "a.txt").write_text(f"{NAME}\n{{}}\n")
+            (spool_dir / ".b.txt").write_text("SN2099zzy\n")
+            source = SpoolSource(spool_dir)
+            items = source.poll()
+            self.assertEqual([item.name for item in items], [NAME])
+            self.assertEqual(len(source.poll()), 1)
+            source.commit()
+            self.assertAlmostEqual(
+                items[0].received, (source.processed_dir / "a.txt").stat().st_mtime
+            )
+            self.assertEqual(source.poll(), [])
+
+    def test_watch(self):
+        """
+        Test that items are deduplicated, and recorded with their latency
+
+        :return: None
+        """
+        with (
+            tempfile.TemporaryDirectory() as tmp_dir,
+            use_archive_config(ArchiveConfig(mode="replay", fixture_dir=tmp_dir)),
+        ):
+            ledger = WatchLedger(Path(tmp_dir) / "watch.sqlite")
+            now = time.time()
+            ledger.record(
+                WatchRecord(
+                    target="old",
+                    host=get_host_key(DONE_HOST),
+                    status=DONE,
+                    received=now - 10.0,
+                    finished=now,
+                )
+            )
+
+            path = Path(tmp_dir) / "alerts.jsonl"
+            lines = [
+                NAME,
+                NAME,
+                {"ra_deg": NEW_HOST.ra_deg, "dec_deg": NEW_HOST.dec_deg},
+                {
+                    "name": "new",
+                    "ra_deg": DONE_HOST.ra_deg,
+                    "dec_deg": DONE_HOST.dec_deg,
+                },
+            ]
+            path.write_text("".join(f"{json.dumps(line)}\n" for line in lines))
+
+            summary = watch(
+                path, ledger_path=ledger.db_path, n_workers=1, once=True, warm=False
+            )
+
+            records = {record.target: record for record in ledger.records()}
+            self.assertEqual(len(list(ledger.records())), 5)
+
+            # There are no recorded fixtures, so the downloads fail
+            self.assertEqual(records[NAME].status, FAILED)
+            self.assertIn("FileNotFoundError", records[NAME].error)
+            new_host = records[f"{NEW_HOST.ra_deg:.6f} {NEW_HOST.dec_deg:+.6f}"]
+            self.assertEqual(new_host.status, FAILED)
+            self.assertEqual(new_host.host, NEW_HOST.source_name)
+            self.assertIsNotNone(new_host.download_s)
+
+            self.assertEqual(records["new"].status, DUPLICATE)
+            self.assertEqual(summary, {**summary, DONE: 1, FAILED: 2, DUPLICATE: 2})
+            self.assertEqual(summary["latency_p50_s"], 10.0)
+            for record in ledger.records():
+                self.assertGreaterEqual(record.latency_s, 0.0)
+
+            # Every received item is finished, and the lines are consumed
+            self.assertEqual(ledger.pending(), [])
+            self.assertEqual(JsonlSource(path).poll(), [])
+
+    def test_resume(self):
+        """
+        Test that items received but not finished before a restart
+        are processed again
+
+        :return: None
+        """
+        with (
+            tempfile.TemporaryDirectory() as tmp_dir,
+            use_archive_config(ArchiveConfig(mode="replay", fixture_dir=tmp_dir)),
+        ):
+            ledger = WatchLedger(Path(tmp_dir) / "watch.sqlite")
+            ledger.receive([WatchItem(name=NAME, received=time.time() - 10.0)])
+            self.assertEqual([item.name for _, item in ledger.pending()], [NAME])
+
+            path = Path(tmp_dir) / "alerts.jsonl"
+            path.write_text("")
+            summary = watch(
+                path, ledger_path=ledger.db_path, n_workers=1, once=True, warm=False
+            )
+
+            self.assertEqual(summary[FAILED], 1)
+            self.assertEqual([x.target for x in ledger.records()], [NAME])
+            self.assertEqual(ledger.pending(), [])
@@ -0,0 +1,128 @@
+"""
+Module for testing the work queue
+"""
+
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from galsynthspec.datamodels.galaxy import Galaxy
+from galsynthspec.run.workqueue import Heartbeat, WorkQueue, run_worker
+
+GALAXY = Galaxy(ra_deg=10.0, dec_deg=5.0, redshift=0.05)
+RUN_ON_GALAXY = "galsynthspec.run.workqueue.run_on_galaxy"
+
+
+class TestWorkQueue(unittest.TestCase):
+    """
+    Class for testing the work queue
+    """
+
+    def test_claim_and_reclaim(self):
+        """
+        Test that jobs are claimed once, and reclaimed when a lease expires
+
+        :return: None
+        """
+        galaxies = [
+            Galaxy(ra_deg=10.0 * i, dec_deg=5.0, redshift=0.05) for i in range(1, 3)
+        ]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            queue = WorkQueue(Path(tmp_dir) / "queue.sqlite", lease_s=0.2)
+
+            self.assertEqual(queue.add(galaxies), 2)
+            # Duplicate galaxies are ignored
+            self.assertEqual(queue.add(galaxies), 0)
+
+            job_a = queue.claim("worker-a")
+            job_b = queue.claim("worker-b")
+            self.assertEqual(job_a.galaxy, galaxies[0])
+            self.assertEqual(job_b.galaxy, galaxies[1])
+            self.assertIsNone(queue.claim("worker-c"))
+
+            queue.finish(job_a.job_id, "worker-a")
+            self.assertTrue(queue.renew(job_b.job_id, "worker-b"))
+
+            # worker-b dies, so its job is reclaimed after the lease expires
+            time.sleep(0.3)
+            job_c = queue.claim("worker-c")
+            self.assertEqual(job_c.job_id, job_b.job_id)
+            self.assertEqual(job_c.attempts, 2)
+            self.assertFalse(queue.renew(job_b.job_id, "worker-b"))
+
+            queue.finish(job_c.job_id, "worker-c", error="ValueError()")
+            self.assertEqual(
+                queue.counts(), {"pending": 1, "running": 0, "done": 1, "failed": 0}
+            )
+
+    def test_heartbeat(self):
+        """
+        Test that the heartbeat renews the lease, and flags a lost lease
+
+        :return: None
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            queue = WorkQueue(Path(tmp_dir) / "queue.sqlite", lease_s=0.3)
+            queue.add([GALAXY])
+
+            job = queue.claim("worker-a")
+            with Heartbeat(queue, job.job_id, "worker-a") as heartbeat:
+                time.sleep(0.6)
+                self.assertIsNone(queue.claim("worker-b"))
+            self.assertFalse(heartbeat.lost.is_set())
+
+            # The lease expires, and the job is reclaimed by another worker
+            time.sleep(0.4)
+            self.assertEqual(queue.claim("worker-b").job_id, job.job_id)
+            with Heartbeat(queue, job.job_id, "worker-a") as heartbeat:
+                self.assertTrue(heartbeat.lost.wait(timeout=5.0))
+
+    def test_lost_lease(self):
+        """
+        Test that a worker which loses the lease on its job does not finish it
+
+        :return: None
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            queue = WorkQueue(Path(tmp_dir) / "queue.sqlite", lease_s=0.1)
+            queue.add([GALAXY])
+
+            with (
+                patch.object(queue, "renew", return_value=False),
+                patch(RUN_ON_GALAXY, side_effect=lambda *_, **__: time.sleep(0.2)),
+            ):
+                self.assertEqual(run_worker(queue, max_jobs=1), 1)
+
+            self.assertEqual(queue.counts()["running"], 1)
+
+    def test_max_attempts(self):
+        """
+        Test that a job is retried until it has used all its attempts,
+        whether it fails or its lease expires
+
+        :return: None
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            queue = WorkQueue(
+                Path(tmp_dir) / "queue.sqlite", lease_s=60.0, max_attempts=2
+            )
+            queue.add([GALAXY])
+
+            with patch(RUN_ON_GALAXY, side_effect=ValueError("bad fit")) as run:
+                self.assertEqual(run_worker(queue, poll_s=0.01), 2)
+            self.assertEqual(run.call_count, 2)
+            self.assertEqual(
+                queue.counts(), {"pending": 0, "running": 0, "done": 0, "failed": 1}
+            )
+
+            queue = WorkQueue(
+                Path(tmp_dir) / "expiry.sqlite", lease_s=0.1, max_attempts=1
+            )
+            queue.add([GALAXY])
+            self.assertEqual(queue.claim("worker-a").attempts, 1)
+            time.sleep(0.2)
+            self.assertIsNone(queue.claim("worker-b"))
+            self.assertEqual(queue.counts()["failed"], 1)